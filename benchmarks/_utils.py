@@ -0,0 +1,15 @@
+import statistics
+from typing import Dict, List
+
+
+def percentiles(timings: List[float]) -> Dict[str, float]:
+    """Mean and p50/p95/p99 of timings in seconds, as milliseconds"""
+    if len(timings) < 2:
+        timings = timings * 2
+    cuts = statistics.quantiles(timings, n=100, method="inclusive")
+    return {
+        "mean_ms": statistics.mean(timings) * 1000,
+        "p50_ms": cuts[49] * 1000,
+        "p95_ms": cuts[94] * 1000,
+        "p99_ms": cuts[98] * 1000,
+    }
@@ -0,0 +1,55 @@
+"""
+Compare two result files of a benchmark, e.g. of two releases
+
+    python -m benchmarks.compare before.json after.json
+
+Every number found under the same path in both files is printed with its relative change.
+"""
+import argparse
+import json
+from typing import Any, Dict, Iterator, Tuple
+
+
+def numbers(data: Any, path: str = "") -> Iterator[Tuple[str, float]]:
+    """Numeric leaves of nested results by slash separated path"""
+    if isinstance(data, dict):
+        for key, value in data.items():
+            yield from numbers(value, f"{path}/{key}" if path else str(key))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        yield path, data
+
+
+def compare(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """:return: before, after and relative change of every number present in both results"""
+    after_numbers = dict(numbers(after))
+    result = {}
+    for path, value in numbers(before):
+        if path not in after_numbers:
+            continue
+        change = (after_numbers[path] - value) / value if value else None
+        result[path] = {"before": value, "after": after_numbers[path], "change": change}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--output", help="write comparison as JSON into this file")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    result = compare(before, after)
+    for path, values in result.items():
+        change = f"{values['change']:+.1%}" if values["change"] is not None else "-"
+        print(f"{path:>60}: {values['before']:.4g} -> {values['after']:.4g} ({change})")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
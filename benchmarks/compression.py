@@ -0,0 +1,85 @@
+"""
+Size and time of compressing list responses by every coding and level, to choose COMPRESSION_* settings
+
+    python -m benchmarks.compression --rows 1000 --repeat 20
+
+Bodies are candidate lists as served by GET /api/candidates, serialized by the configured JSON backend,
+compressed whole as buffered responses are and in NDJSON lines as exports are. No database is needed.
+"""
+import argparse
+import json
+import random
+import time
+from typing import Callable, Dict, List
+
+from job_storage import compression, serialization
+
+SKILLS = ["Python", "SQL", "Docker", "Kubernetes", "Go", "Rust", "Flask", "PostgreSQL", "Redis", "Kafka"]
+GZIP_LEVELS = (1, 6, 9)
+BROTLI_QUALITIES = (1, 4, 6, 11)
+
+
+def candidates(rows: int) -> List[dict]:
+    rng = random.Random(1)
+    return [
+        {
+            "id": index + 1,
+            "full_name": f"Candidate {rng.randrange(10 ** 6)}",
+            "expected_salary": rng.randrange(20000, 200000, 1000),
+            "skills": [{"id": SKILLS.index(title) + 1, "title": title} for title in sorted(rng.sample(SKILLS, 3))],
+        }
+        for index in range(rows)
+    ]
+
+
+def compress(encoder: compression.Encoder, chunks: List[bytes]) -> bytes:
+    return b"".join([*(encoder.compress(chunk) for chunk in chunks), encoder.finish()])
+
+
+def measure(make_encoder: Callable[[], compression.Encoder], chunks: List[bytes], repeat: int) -> Dict[str, float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = len(compress(make_encoder(), chunks))
+        timings.append(time.perf_counter() - start)
+    raw = sum(len(chunk) for chunk in chunks)
+    return {"bytes": size, "ratio": raw / size, "ms": min(timings) * 1000}
+
+
+def run(rows: int, repeat: int) -> dict:
+    data = candidates(rows)
+    bodies = {
+        "list": [serialization.dumps({"data": data, "next_cursor": None})],
+        "ndjson": list(serialization.ndjson(data)),
+    }
+    encoders = {f"gzip-{level}": lambda level=level: compression.GzipEncoder(level) for level in GZIP_LEVELS}
+    if compression.brotli is not None:
+        for quality in BROTLI_QUALITIES:
+            encoders[f"br-{quality}"] = lambda quality=quality: compression.BrotliEncoder(quality)
+    return {"rows": rows, "repeat": repeat, "bodies": {
+        name: {"raw_bytes": sum(len(chunk) for chunk in chunks), **{
+            coding: measure(make_encoder, chunks, repeat) for coding, make_encoder in encoders.items()}}
+        for name, chunks in bodies.items()
+    }}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000, help="candidates in every body")
+    parser.add_argument("--repeat", type=int, default=20, help="compressions of every body per coding")
+    parser.add_argument("--output", help="write results as JSON into this file")
+    args = parser.parse_args()
+
+    results = run(args.rows, args.repeat)
+    for name, result in results["bodies"].items():
+        print(f"{name}: {result['raw_bytes']} bytes")
+        for coding, timing in result.items():
+            if coding != "raw_bytes":
+                print(f"{coding:>12}: {timing['bytes']:>9} bytes, {timing['ratio']:5.1f}x, {timing['ms']:7.2f} ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
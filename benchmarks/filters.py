@@ -0,0 +1,106 @@
+"""
+Explain filtered list queries on the configured database, to see plans and timings on realistic data
+
+    python -m benchmarks.filters --seed-candidates 200000 --seed-jobs 50000
+
+Seeding adds synthetic rows to the database, use it on a scratch database only.
+That every filter can be served by its index is asserted by tests/test_filter_plans.py.
+"""
+import argparse
+import json
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+from job_storage import app
+from job_storage import validators as v
+from job_storage.db import paging
+
+SEED_SQL = [
+    "INSERT INTO skills (title) SELECT 'Skill ' || i FROM generate_series(1, :skills) i ON CONFLICT DO NOTHING",
+    "INSERT INTO candidates (full_name, expected_salary) "
+    "SELECT 'Candidate ' || i, 20000 + (random() * 180000)::int FROM generate_series(1, :candidates) i",
+    "INSERT INTO candidates_skills (candidate_id, skill_id) "
+    "SELECT DISTINCT l.candidate_id, s.id FROM ("
+    "SELECT c.id AS candidate_id, 'Skill ' || (1 + (random() * random() * (:skills - 1))::int) AS title "
+    "FROM candidates c CROSS JOIN generate_series(1, 4) n"
+    ") l JOIN skills s ON s.title = l.title ON CONFLICT DO NOTHING",
+    "INSERT INTO jobs (title, salary, description) "
+    "SELECT (ARRAY['Python', 'Go', 'Rust', 'Java'])[1 + i % 4] || ' developer ' || md5(random()::text), "
+    "20000 + (random() * 180000)::int, 'Synthetic job' FROM generate_series(1, :jobs) i",
+]
+
+CASES = {
+    "jobs_salary_range": ("jobs", {"salary_min": 50000, "salary_max": 51000}),
+    "jobs_title_prefix": ("jobs", {"title_prefix": "Rust developer 0a"}),
+    "candidates_salary_max": ("candidates", {"expected_salary_max": 20500}),
+    "candidates_all_skills": ("candidates", {"skill": ["Skill 50", "Skill 60"]}),
+    "candidates_any_skill": ("candidates", {"skill": ["Skill 900", "Skill 901"], "skill_match": "any"}),
+}
+
+
+def seed(candidates: int, jobs: int, skills: int) -> None:
+    with app.db.connect() as con:
+        for sql in SEED_SQL:
+            con.execute(text(sql), candidates=candidates, jobs=jobs, skills=skills)
+    # vacuum fills visibility maps as well, so index only scans skip the heap as they would on a settled database
+    with app.db.connect() as con:
+        con.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM ANALYZE"))
+
+
+def statement(namespace: str, args: dict, limit: int):
+    storage = app.db
+    if namespace == "jobs":
+        stm = storage._filter_jobs(storage.jobs_stm, v.jobs.JobFiltersSchema().load(args))
+        return paging.page_statement(stm, storage.jobs.c.id, limit)
+    filters = v.candidates.CandidateFiltersSchema().load(args)
+    with storage.connect() as con:
+        skill_ids = storage._find_skill_ids(filters.skill, con)
+    stm = storage._filter_candidates(storage.candidates_skills_stm, filters, skill_ids)
+    return paging.page_statement(stm, storage.candidates.c.id, limit)
+
+
+def plan_nodes(node: dict):
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def explain(stm) -> dict:
+    sql = str(stm.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    with app.db.connect() as con:
+        plan, = con.execute(text("EXPLAIN (ANALYZE, FORMAT JSON) " + sql.replace("%", "%%"))).scalar()
+    nodes = list(plan_nodes(plan["Plan"]))
+    return {
+        "execution_ms": plan["Execution Time"],
+        "indexes": sorted({node["Index Name"] for node in nodes if "Index Name" in node}),
+        "seq_scans": sorted({node["Relation Name"] for node in nodes if node["Node Type"] == "Seq Scan"}),
+    }
+
+
+def run(limit: int) -> dict:
+    return {name: explain(statement(namespace, args, limit)) for name, (namespace, args) in CASES.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed-candidates", type=int, default=0)
+    parser.add_argument("--seed-jobs", type=int, default=0)
+    parser.add_argument("--seed-skills", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--output", help="write results as JSON into this file")
+    args = parser.parse_args()
+
+    if args.seed_candidates or args.seed_jobs:
+        seed(args.seed_candidates, args.seed_jobs, args.seed_skills)
+    results = run(args.limit)
+    for name, result in results.items():
+        print(f"{name:>22}: {result['execution_ms']:.2f} ms, indexes {', '.join(result['indexes']) or '-'}, "
+              f"seq scans {', '.join(result['seq_scans']) or '-'}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+HTTP load on every API route of a running server, reporting throughput, latency percentiles and SQL statements
+per request
+
+    python -m benchmarks.seed --jobs 10000 --candidates 100000
+    uwsgi --ini uwsgi.ini   # or uvicorn job_storage.asgi:app --port 2000
+    python -m benchmarks.load --url http://localhost:2000 --requests 500 --concurrency 8
+
+Statements and database time per request are read from X-DB-Queries and Server-Timing headers when the server
+runs with QUERY_TRACKING on, its log names the repeated and slow statements. Otherwise statements per request are
+the difference of SQL statement counts at /metrics before and after every route, exact with one worker or with
+PROMETHEUS_MULTIPROC_DIR set, and missing where /metrics is not served (the ASGI app).
+Writes add their own rows, use it on a scratch database only.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+from urllib.parse import urlsplit, quote
+
+from ._utils import percentiles
+
+SQL_COUNT = re.compile(r"^job_storage_sql_duration_seconds_count\{.*\} ([0-9.e+]+)$", re.MULTILINE)
+DB_TIMING = re.compile(r"\bdb;dur=([0-9.]+)")
+WORDS = ["python", "postgres", "remote", "docker", "senior", "api"]
+
+
+class Route(NamedTuple):
+    name: str
+    method: str
+    path: Callable[[int], str]
+    body: Optional[Callable[[int], Any]] = None
+
+
+class Client(object):
+    """Keep-alive connection per thread"""
+
+    def __init__(self, url: str, headers: Dict[str, str]) -> None:
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.headers = headers
+        self._local = threading.local()
+
+    def request(self, method: str, path: str, body: Any = None):
+        """:return: status code, decoded JSON body or None if body is not JSON, response headers"""
+        headers = dict(self.headers)
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+        for attempt in range(2):
+            connection = getattr(self._local, "connection", None)
+            if connection is None:
+                connection = self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                connection.request(method, path, payload, headers)
+                response = connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                # server closed a kept-alive connection, retry once on a new one
+                connection.close()
+                self._local.connection = None
+                if attempt == 1:
+                    raise
+        if response.getheader("Content-Type", "").startswith("application/json"):
+            return response.status, json.loads(data), response.headers
+        return response.status, None, response.headers
+
+    def sql_statements(self) -> Optional[float]:
+        """Statements executed by the server so far, None if it does not serve /metrics"""
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        try:
+            connection.request("GET", "/metrics")
+            response = connection.getresponse()
+            text = response.read().decode()
+        finally:
+            connection.close()
+        if response.status != 200:
+            return None
+        return sum(float(count) for count in SQL_COUNT.findall(text))
+
+
+def fixtures(client: Client, requests: int) -> Dict[str, Any]:
+    """Ids of existing rows for reads, and rows created for writes, so every write request has its own row"""
+    _, jobs, _ = client.request("GET", "/api/jobs?limit=1000")
+    _, candidates, _ = client.request("GET", "/api/candidates?limit=1000")
+    if not jobs["data"] or not candidates["data"]:
+        raise SystemExit("No jobs or candidates, run python -m benchmarks.seed first")
+    token = uuid.uuid4().hex[:8]
+    for purpose, i in itertools.product(("update", "delete", "apply", "assign"), range(requests)):
+        client.request("POST", "/api/jobs", {
+            "title": f"Load {token} {purpose} {i:06d}", "salary": 50000, "description": "Load test job",
+            "skills": ["Skill 1", "Skill 2"]})
+    fresh_jobs = {}
+    cursor = None
+    while True:
+        path = f"/api/jobs?limit=1000&title_prefix={quote(f'Load {token} ')}" + (f"&cursor={cursor}" if cursor else "")
+        _, page, _ = client.request("GET", path)
+        for job in page["data"]:
+            fresh_jobs.setdefault(job["title"].split()[2], []).append(job["id"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    _, bulk, _ = client.request("POST", "/api/candidates/bulk", [
+        {"full_name": f"Load {token} {i}", "expected_salary": 40000, "skills": ["Skill 1"]} for i in range(requests)])
+    return {
+        "jobs": [job["id"] for job in jobs["data"]],
+        "candidates": [candidate["id"] for candidate in candidates["data"]],
+        "token": token,
+        "deleted_candidates": [row["id"] for row in bulk["inserted"]],
+        **{f"{purpose}_jobs": job_ids for purpose, job_ids in fresh_jobs.items()},
+    }
+
+
+def routes(ids: Dict[str, Any]) -> List[Route]:
+    rng = random.Random(1)
+    token = ids["token"]
+
+    def job_id(i):
+        return rng.choice(ids["jobs"])
+
+    def candidate_id(i):
+        return rng.choice(ids["candidates"])
+
+    def candidate(i):
+        return {"full_name": f"Load {token} candidate {i}", "expected_salary": 50000, "skills": ["Skill 1", "Skill 3"]}
+
+    def job(i):
+        return {"title": f"Load {token} job {i}", "salary": 60000, "description": "Remote python job",
+                "skills": ["Skill 1", "Skill 2"]}
+
+    return [
+        Route("list_jobs", "GET", lambda i: "/api/jobs?limit=100"),
+        Route("list_jobs_filtered", "GET", lambda i: "/api/jobs?limit=100&salary_min=50000&salary_max=60000"),
+        Route("insert_job", "POST", lambda i: "/api/jobs", job),
+        Route("export_jobs", "GET", lambda i: "/api/jobs/export"),
+        Route("search_jobs", "GET", lambda i: f"/api/jobs/search?limit=20&q={rng.choice(WORDS)}"),
+        Route("find_job", "GET", lambda i: f"/api/jobs/{job_id(i)}"),
+        Route("force_insert_job", "PUT", lambda i: f"/api/jobs/{ids['update_jobs'][i]}",
+              lambda i: {**job(i), "title": f"Load {token} updated {i}"}),
+        Route("delete_job", "DELETE", lambda i: f"/api/jobs/{ids['delete_jobs'][i]}"),
+        Route("match_candidates", "GET", lambda i: f"/api/jobs/{job_id(i)}/matches"),
+        Route("assign_candidates", "POST", lambda i: f"/api/jobs/{ids['assign_jobs'][i]}/candidates",
+              lambda i: {"candidate_ids": rng.sample(ids["candidates"], min(50, len(ids["candidates"])))}),
+        Route("list_candidates", "GET", lambda i: "/api/candidates?limit=100"),
+        Route("list_candidates_by_skill", "GET", lambda i: "/api/candidates?limit=100&skill=Skill%201&skill=Skill%202"),
+        Route("insert_candidate", "POST", lambda i: "/api/candidates", candidate),
+        Route("bulk_insert_candidates", "POST", lambda i: "/api/candidates/bulk",
+              lambda i: [candidate(f"{i}-{row}") for row in range(100)]),
+        Route("export_candidates", "GET", lambda i: "/api/candidates/export"),
+        Route("find_candidate", "GET", lambda i: f"/api/candidates/{candidate_id(i)}"),
+        Route("force_insert_candidate", "PUT", lambda i: f"/api/candidates/{candidate_id(i)}", candidate),
+        Route("delete_candidate", "DELETE", lambda i: f"/api/candidates/{ids['deleted_candidates'][i]}"),
+        Route("apply_candidate", "POST",
+              lambda i: f"/api/candidates/{candidate_id(i)}/apply/jobs/{ids['apply_jobs'][i]}"),
+        Route("list_skills", "GET", lambda i: "/api/skills?limit=100"),
+        Route("stats_skill_cache", "GET", lambda i: "/api/stats/skill-cache"),
+        Route("stats_skill_index", "GET", lambda i: "/api/stats/skill-index"),
+        Route("stats_pool", "GET", lambda i: "/api/stats/pool"),
+        Route("stats_response_cache", "GET", lambda i: "/api/stats/response-cache"),
+    ]
+
+
+def load(client: Client, route: Route, requests: int, concurrency: int) -> dict:
+    """Send requests of one route from concurrency threads at once"""
+    numbers = iter(range(requests))
+    numbers_lock = threading.Lock()
+    timings = []
+    errors = []
+    tracked = []  # statements and database seconds of requests answered with query tracking headers
+
+    def worker():
+        while True:
+            with numbers_lock:
+                i = next(numbers, None)
+            if i is None:
+                return
+            # paths and bodies are made before the clock starts
+            path, body = route.path(i), route.body(i) if route.body else None
+            start = time.perf_counter()
+            status, _, headers = client.request(route.method, path, body)
+            timings.append(time.perf_counter() - start)
+            queries, db_timing = headers.get("X-DB-Queries"), DB_TIMING.search(headers.get("Server-Timing", ""))
+            if queries is not None and db_timing is not None:
+                tracked.append((int(queries), float(db_timing.group(1)) / 1000))
+            if status >= 400:
+                errors.append(status)
+
+    statements = client.sql_statements()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        for future in [executor.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - start
+    result = {
+        "requests": requests,
+        "errors": len(errors),
+        "throughput_rps": requests / elapsed,
+        **percentiles(timings),
+    }
+    if len(tracked) == requests:
+        result["queries_per_request"] = sum(queries for queries, _ in tracked) / requests
+        result["max_queries_per_request"] = max(queries for queries, _ in tracked)
+        result["db_ms_per_request"] = sum(seconds for _, seconds in tracked) * 1000 / requests
+    elif statements is not None:
+        result["queries_per_request"] = (client.sql_statements() - statements) / requests
+    return result
+
+
+def run(url: str, requests: int, concurrency: int, only: List[str] = (), read_primary: bool = False) -> dict:
+    client = Client(url, {"X-Read-Primary": "true"} if read_primary else {})
+    ids = fixtures(client, requests)
+    results = {"url": url, "requests": requests, "concurrency": concurrency, "read_primary": read_primary,
+               "routes": {}}
+    for route in routes(ids):
+        if only and route.name not in only:
+            continue
+        results["routes"][route.name] = load(client, route, requests, concurrency)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:2000")
+    parser.add_argument("--requests", type=int, default=500, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight at once")
+    parser.add_argument("--only", nargs="*", default=[], help="names of loaded routes, all by default")
+    parser.add_argument("--read-primary", action="store_true",
+                        help="send X-Read-Primary, reads skip replicas and the response cache")
+    parser.add_argument("--output", help="write results as JSON into this file")
+    args = parser.parse_args()
+
+    results = run(args.url, args.requests, args.concurrency, args.only, args.read_primary)
+    for name, result in results["routes"].items():
+        queries = f", {result['queries_per_request']:.1f} queries" if "queries_per_request" in result else ""
+        if "db_ms_per_request" in result:
+            queries += f" (max {result['max_queries_per_request']}), {result['db_ms_per_request']:.1f} ms in db"
+        print(f"{name:>26}: {result['throughput_rps']:.1f} req/s, p50 {result['p50_ms']:.1f} ms, "
+              f"p95 {result['p95_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms, {result['errors']} errors{queries}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Time skill index loading and candidate matching on synthetic candidates
+
+    python -m benchmarks.matching --candidates 1000000
+"""
+import argparse
+import itertools
+import json
+import random
+import statistics
+import time
+import timeit
+
+from job_storage.db import matching
+
+
+def build_index(candidates: int, skills: int, skills_per_candidate: int, seed: int = 1):
+    """
+    Index of candidates with random salaries and skills, popular skills are more frequent
+    :return: index, seconds spent in index methods only
+    """
+    rng = random.Random(seed)
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(skills)))
+    skill_ids = range(1, skills + 1)
+    index = matching.SkillIndex()
+    index.start_loading()
+    fresh = matching.SkillIndex()
+    elapsed = 0.0
+    batch_size = 10000
+    for start in range(1, candidates + 1, batch_size):
+        candidate_ids = range(start, min(start + batch_size, candidates + 1))
+        salary_rows = [(candidate_id, rng.randint(20000, 200000)) for candidate_id in candidate_ids]
+        link_rows = [
+            (candidate_id, skill_id)
+            for candidate_id in candidate_ids
+            for skill_id in set(rng.choices(skill_ids, cum_weights=cum_weights, k=skills_per_candidate))
+        ]
+        batch_start = time.perf_counter()
+        fresh.add_candidates(salary_rows)
+        fresh.add_links(link_rows)
+        elapsed += time.perf_counter() - batch_start
+    index.replace(fresh)
+    return index, elapsed
+
+
+def run(candidates: int, skills: int, skills_per_candidate: int, job_skills: int, repeat: int) -> dict:
+    index, build_s = build_index(candidates, skills, skills_per_candidate)
+    results = {
+        "candidates": candidates,
+        "skills": skills,
+        "skills_per_candidate": skills_per_candidate,
+        "job_skills": job_skills,
+        "build_s": build_s,
+        "queries": {},
+    }
+    job = list(range(1, job_skills * 3, 3))
+    queries = {
+        "top_100": dict(),
+        "min_overlap_2": dict(min_overlap=2),
+        "max_salary_50000": dict(max_salary=50000),
+    }
+    for name, kwargs in queries.items():
+        timings = timeit.repeat(lambda: index.match(job, **kwargs), number=1, repeat=repeat)
+        results["queries"][name] = {"best_ms": min(timings) * 1000, "median_ms": statistics.median(timings) * 1000}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidates", type=int, default=1000000)
+    parser.add_argument("--skills", type=int, default=2000)
+    parser.add_argument("--skills-per-candidate", type=int, default=6)
+    parser.add_argument("--job-skills", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", help="write results as JSON into this file")
+    args = parser.parse_args()
+
+    results = run(args.candidates, args.skills, args.skills_per_candidate, args.job_skills, args.repeat)
+    print(f"bitmaps: {matching.Bitmap.__module__}.{matching.Bitmap.__name__}, build {results['build_s']:.1f} s")
+    for name, result in results["queries"].items():
+        print(f"{name:>18}: best {result['best_ms']:.2f} ms, median {result['median_ms']:.2f} ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
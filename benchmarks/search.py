@@ -0,0 +1,91 @@
+"""
+Time full-text job search on the configured database, by how many jobs match the query
+
+    python -m benchmarks.search --seed-jobs 1000000
+
+Seeding adds synthetic jobs to the database, use it on a scratch database only.
+Words of seeded descriptions are skewed, w1 is in most jobs, w4000 and above in very few.
+"""
+import argparse
+import json
+import statistics
+import timeit
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+from job_storage import app
+
+SEED_SQL = (
+    "INSERT INTO jobs (title, salary, description) "
+    "SELECT 'Search job ' || md5(random()::text), 20000 + (random() * 180000)::int, "
+    "array_to_string(ARRAY(SELECT 'w' || (1 + power(random(), 3) * 4999)::int "
+    "FROM generate_series(1, :words) WHERE i > 0), ' ') "
+    "FROM generate_series(1, :jobs) i"
+)
+
+QUERIES = {
+    "rare_word": "w4500",
+    "medium_word": "w300",
+    "common_word": "w1",
+    "phrase": '"w2 w3"',
+    "rare_and_not_common": "w4500 -w1",
+}
+
+
+def seed(jobs: int, words: int) -> None:
+    with app.db.connect() as con:
+        con.execute(text(SEED_SQL), jobs=jobs, words=words)
+    with app.db.connect() as con:
+        con.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM ANALYZE jobs"))
+
+
+def explain(query: str, limit: int) -> dict:
+    stm = app.db._search_jobs_statement(limit=limit).params(q=query)
+    sql = str(stm.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    with app.db.connect() as con:
+        plan, = con.execute(text("EXPLAIN (ANALYZE, FORMAT JSON) " + sql.replace("%", "%%"))).scalar()
+    nodes = [plan["Plan"]]
+    for node in nodes:
+        nodes.extend(node.get("Plans", []))
+    return {
+        "matched": sum(node["Actual Rows"] for node in nodes if node.get("Relation Name") == "jobs"),
+        "indexes": sorted({node["Index Name"] for node in nodes if "Index Name" in node}),
+    }
+
+
+def run(limit: int, repeat: int) -> dict:
+    results = {"limit": limit, "queries": {}}
+    for name, query in QUERIES.items():
+        timings = timeit.repeat(lambda: app.db.search_jobs(query, limit, primary=True), number=1, repeat=repeat)
+        results["queries"][name] = {
+            "query": query,
+            "best_ms": min(timings) * 1000,
+            "median_ms": statistics.median(timings) * 1000,
+            **explain(query, limit),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed-jobs", type=int, default=0)
+    parser.add_argument("--seed-words", type=int, default=60, help="words per seeded description")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", help="write results as JSON into this file")
+    args = parser.parse_args()
+
+    if args.seed_jobs:
+        seed(args.seed_jobs, args.seed_words)
+    results = run(args.limit, args.repeat)
+    for name, result in results["queries"].items():
+        print(f"{name:>20}: best {result['best_ms']:.1f} ms, median {result['median_ms']:.1f} ms, "
+              f"{result['matched']} matched, indexes {', '.join(result['indexes']) or '-'}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
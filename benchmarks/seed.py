@@ -0,0 +1,156 @@
+"""
+Fill the configured database with synthetic skills, jobs, candidates and applications
+
+    python -m benchmarks.seed --jobs 10000 --candidates 100000 --applications 20
+
+Data is generated from --seed, so runs with equal arguments on empty databases produce equal data.
+Use it on a scratch database only, e.g. the postgres-jobs service of docker-compose.
+"""
+import argparse
+import itertools
+import json
+import random
+import time
+from typing import List
+
+from sqlalchemy import func, select
+
+from job_storage import app
+from job_storage import validators as v
+
+ROLES = ["Python developer", "Data engineer", "Frontend developer", "DevOps engineer", "QA engineer", "Go developer"]
+WORDS = [
+    "python", "flask", "postgres", "sql", "docker", "kubernetes", "react", "typescript", "aws", "remote",
+    "team", "api", "microservices", "testing", "linux", "spark", "kafka", "redis", "security", "mentoring",
+    "startup", "fintech", "healthcare", "analytics", "cloud", "monitoring", "agile", "senior", "junior", "lead",
+]
+
+
+class Generator(object):
+    """Deterministic random data, popular skills and words are more frequent"""
+
+    def __init__(self, skills: int, seed: int = 1) -> None:
+        self.rng = random.Random(seed)
+        self.skill_titles = [f"Skill {rank}" for rank in range(1, skills + 1)]
+        self.skill_weights = list(itertools.accumulate(1 / rank for rank in range(1, skills + 1)))
+
+    def skills(self, count: int) -> List[str]:
+        return list(dict.fromkeys(self.rng.choices(self.skill_titles, cum_weights=self.skill_weights, k=count)))
+
+    def description(self, words: int = 40) -> str:
+        return " ".join(self.rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+    def candidate(self, number: int) -> v.candidates.InsertCandidate:
+        return v.candidates.InsertCandidate(
+            full_name=f"Candidate {number}",
+            expected_salary=self.rng.randrange(20000, 200000, 500),
+            skills=self.skills(self.rng.randint(2, 10)),
+        )
+
+    def job(self) -> v.jobs.InsertJob:
+        return v.jobs.InsertJob(
+            title=self.rng.choice(ROLES),
+            salary=self.rng.randrange(20000, 200000, 1000),
+            description=self.description(),
+            skills=self.skills(self.rng.randint(3, 8)),
+        )
+
+
+def seed_candidates(generator: Generator, count: int, chunk_size: int = 5000) -> List[int]:
+    """Insert candidates by Storage.bulk_insert_candidates, the path of /api/candidates/bulk"""
+    candidate_ids = []
+    for start in range(0, count, chunk_size):
+        payloads = [generator.candidate(number) for number in range(start, min(start + chunk_size, count))]
+        candidate_ids.extend(app.db.bulk_insert_candidates(payloads))
+    return candidate_ids
+
+
+def seed_jobs(generator: Generator, count: int, chunk_size: int = 5000) -> List[int]:
+    """
+    Insert jobs in chunks, one multi-row insert of jobs and of their skill links per chunk
+    Titles are unique, every one ends with id of its job.
+    """
+    storage = app.db
+    job_ids = []
+    for start in range(0, count, chunk_size):
+        payloads = [generator.job() for _ in range(min(chunk_size, count - start))]
+        with storage.connect() as con:
+            with con.begin():
+                skill_ids = storage._resolve_skill_ids(
+                    [skill_title for payload in payloads for skill_title in payload.skills], con)
+                chunk_ids = [row.id for row in con.execute(
+                    select([func.nextval(f"{storage.jobs.name}_id_seq").label("id")]).
+                    select_from(func.generate_series(1, len(payloads))))]
+                con.execute(storage.jobs.table.insert(), [
+                    {"id": job_id, "title": f"{payload.title} #{job_id}", "salary": payload.salary,
+                     "description": payload.description}
+                    for job_id, payload in zip(chunk_ids, payloads)])
+                con.execute(storage.jobs_skills.table.insert(), [
+                    {"job_id": job_id, "skill_id": skill_ids[skill_title]}
+                    for job_id, payload in zip(chunk_ids, payloads) for skill_title in payload.skills])
+        job_ids.extend(chunk_ids)
+    return job_ids
+
+
+def seed_applications(
+        generator: Generator, job_ids: List[int], candidate_ids: List[int], per_job: int, chunk_size: int = 50000
+) -> int:
+    """Assign random candidates to every job, in chunks of links inserted at once"""
+    storage = app.db
+    links = (
+        {"job_id": job_id, "candidate_id": candidate_id}
+        for job_id in job_ids
+        for candidate_id in generator.rng.sample(candidate_ids, min(per_job, len(candidate_ids)))
+    )
+    inserted = 0
+    while True:
+        chunk = list(itertools.islice(links, chunk_size))
+        if not chunk:
+            return inserted
+        with storage.connect() as con:
+            with con.begin():
+                con.execute(storage.jobs_candidates.table.insert(), chunk)
+        inserted += len(chunk)
+
+
+def seed(jobs: int, candidates: int, skills: int, applications: int, seed_value: int = 1) -> dict:
+    """
+    Insert generated data, timing every kind of rows
+    :param applications: candidates assigned to every job
+    :return: counts of inserted rows, seconds spent inserting them
+    """
+    generator = Generator(skills, seed_value)
+    results = {"jobs": jobs, "candidates": candidates, "skills": skills, "applications_per_job": applications}
+    start = time.perf_counter()
+    candidate_ids = seed_candidates(generator, candidates)
+    results["candidates_s"] = time.perf_counter() - start
+    start = time.perf_counter()
+    job_ids = seed_jobs(generator, jobs)
+    results["jobs_s"] = time.perf_counter() - start
+    start = time.perf_counter()
+    results["applications"] = seed_applications(generator, job_ids, candidate_ids, applications)
+    results["applications_s"] = time.perf_counter() - start
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=10000)
+    parser.add_argument("--candidates", type=int, default=100000)
+    parser.add_argument("--skills", type=int, default=2000, help="size of skill vocabulary")
+    parser.add_argument("--applications", type=int, default=20, help="candidates assigned to every job")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results as JSON into this file")
+    args = parser.parse_args()
+
+    results = seed(args.jobs, args.candidates, args.skills, args.applications, args.seed)
+    print(f"{results['candidates']} candidates in {results['candidates_s']:.1f} s, "
+          f"{results['jobs']} jobs in {results['jobs_s']:.1f} s, "
+          f"{results['applications']} applications in {results['applications_s']:.1f} s")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
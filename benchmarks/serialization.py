@@ -0,0 +1,77 @@
+"""
+Compare JSON backends on a list_candidates payload
+
+    python -m benchmarks.serialization --rows 100000
+"""
+import argparse
+import json
+import statistics
+import timeit
+
+from job_storage import serialization
+
+
+def candidates_payload(rows: int) -> dict:
+    """Response body of GET /api/candidates with given number of candidates, three skills each"""
+    return {
+        "data": [
+            {
+                "id": candidate_id,
+                "full_name": f"Candidate {candidate_id}",
+                "expected_salary": 30000 + candidate_id % 70000,
+                "skills": [
+                    {"id": skill_id, "title": f"Skill {skill_id}"}
+                    for skill_id in (candidate_id % 50, candidate_id % 50 + 50, candidate_id % 50 + 100)
+                ],
+            }
+            for candidate_id in range(1, rows + 1)
+        ],
+        "next_cursor": None,
+    }
+
+
+def run(rows: int, repeat: int) -> dict:
+    payload = candidates_payload(rows)
+    results = {"rows": rows, "repeat": repeat, "backends": {}}
+    for name in serialization.BACKENDS:
+        try:
+            serialization.set_backend(name)
+        except ValueError as e:
+            results["backends"][name] = {"error": str(e)}
+            continue
+        timings = timeit.repeat(lambda: serialization.dumps(payload), number=1, repeat=repeat)
+        results["backends"][name] = {
+            "best_s": min(timings),
+            "median_s": statistics.median(timings),
+            "bytes": len(serialization.dumps(payload)),
+        }
+    serialization.set_backend("auto")
+    backends = results["backends"]
+    if "best_s" in backends.get("json", {}) and "best_s" in backends.get("orjson", {}):
+        results["speedup"] = backends["json"]["median_s"] / backends["orjson"]["median_s"]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON into this file")
+    args = parser.parse_args()
+
+    results = run(args.rows, args.repeat)
+    for name, result in results["backends"].items():
+        if "error" in result:
+            print(f"{name:>8}: {result['error']}")
+        else:
+            print(f"{name:>8}: best {result['best_s'] * 1000:.1f} ms, "
+                  f"median {result['median_s'] * 1000:.1f} ms, {result['bytes']} bytes")
+    if "speedup" in results:
+        print(f"orjson speedup: {results['speedup']:.1f}x")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
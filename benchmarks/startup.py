@@ -0,0 +1,85 @@
+"""
+Cold start of a worker: import of the app and its first request, each run in a fresh interpreter
+
+    python -m job_storage.migrate
+    python -m benchmarks.startup --repeat 10
+
+Import is what uwsgi pays on every worker (re)spawn, it must not touch the database. The first request opens
+connections, starts the change listener and warms the skill cache. Interpreter start is measured alone and
+subtracted from neither, compare against it.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+INTERPRETER = "import json, time; print(json.dumps({}))"
+
+WSGI = """
+import json, time
+start = time.perf_counter()
+from job_storage import app
+imported = time.perf_counter()
+checkouts = sum(engine.checkouts for engine in app.db.engines)
+response = app.test_client().get("/api/skills?limit=1", headers={"X-Read-Primary": "true"})
+assert response.status_code == 200, response.status_code
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "first_request_ms": (time.perf_counter() - imported) * 1000,
+    "checkouts_on_import": checkouts,
+}))
+"""
+
+ASGI = """
+import json, time
+start = time.perf_counter()
+from job_storage.asgi import app
+print(json.dumps({"import_ms": (time.perf_counter() - start) * 1000}))
+"""
+
+
+def measure(code: str) -> dict:
+    """Run code in a new interpreter and time the whole process, code prints its own timings as JSON"""
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    return {"process_ms": (time.perf_counter() - start) * 1000, **json.loads(output.strip().splitlines()[-1])}
+
+
+def summary(samples: List[dict]) -> Dict[str, Dict[str, float]]:
+    """Median and maximum of every measured value"""
+    result = {}
+    for key in samples[0]:
+        values = [sample[key] for sample in samples]
+        result[key] = {"median": statistics.median(values), "max": max(values)}
+    return result
+
+
+def run(repeat: int, asgi: bool = False) -> dict:
+    cases = {"interpreter": INTERPRETER, "wsgi": WSGI}
+    if asgi:
+        cases["asgi"] = ASGI
+    return {"repeat": repeat, "cases": {
+        name: summary([measure(code) for _ in range(repeat)]) for name, code in cases.items()}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10, help="fresh interpreters started per case")
+    parser.add_argument("--asgi", action="store_true", help="import the ASGI app as well, needs requirements-async.txt")
+    parser.add_argument("--output", help="write results as JSON into this file")
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.asgi)
+    for name, result in results["cases"].items():
+        print(f"{name:>12}: " + ", ".join(
+            f"{key} {values['median']:g} (max {values['max']:g})" for key, values in result.items()))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Per call overhead of ad hoc statements against statements built once, with and without compiled cache
+
+    python -m job_storage.migrate
+    python -m benchmarks.statements --repeat 2000 --asyncpg
+
+Every case runs the statement the way Storage did before (composed for the call, values inlined into it)
+and the way it does now (built once in _define_statements, values bound as parameters), on an engine with
+the compiled cache of DB_QUERY_CACHE_SIZE and on one without cache. Database work is the same in all four,
+differences are what SQLAlchemy spends per call. Writes run in a transaction rolled back after every case,
+deletes target ids which do not exist, so the database is left as it was.
+With --asyncpg, the built statements are timed on asyncpg with and without its prepared statement cache,
+needs requirements-async.txt.
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Callable, Dict, Tuple
+
+from sqlalchemy import create_engine
+
+from job_storage import app
+
+TITLES = ["Python", "SQL", "Docker", "Kubernetes", "Go"]
+JOB = {"salary": 50000, "description": "Rolled back"}
+
+
+def cases(storage) -> Dict[str, Tuple[Callable[[int], tuple], Callable[[int], tuple]]]:
+    """(ad hoc, built) by name, both take the number of the call and return statement and parameters"""
+    return {
+        "skills_by_titles": (
+            lambda i: (storage.skills_stm.where(storage.skills.c.title.in_(TITLES)), {}),
+            lambda i: (storage.skills_by_titles_stm, {"titles": TITLES}),
+        ),
+        "insert_job": (
+            lambda i: (storage.jobs.table.insert().values(**JOB, title=f"Benchmark job {i}"), {}),
+            lambda i: (storage.insert_job_stm, dict(JOB, title=f"Benchmark job {i}")),
+        ),
+        "delete_job": (
+            lambda i: (storage.jobs.table.delete().where(storage.jobs.c.id == -i).returning(storage.jobs.c.id), {}),
+            lambda i: (storage.delete_job_stm, {"job_id": -i}),
+        ),
+        "delete_candidate_skills": (
+            lambda i: (storage.candidates_skills.table.delete().where(
+                storage.candidates_skills.c.candidate_id == -i), {}),
+            lambda i: (storage.delete_candidate_skills_stm, {"candidate_id": -i}),
+        ),
+    }
+
+
+def per_call_us(engine, make: Callable[[int], tuple], repeat: int) -> float:
+    """Best of three runs of repeat calls, in microseconds per call"""
+    timings = []
+    with engine.connect() as con:
+        for _ in range(3):
+            trans = con.begin()
+            start = time.perf_counter()
+            for i in range(1, repeat + 1):
+                stm, params = make(i)
+                con.execute(stm, **params)
+            timings.append(time.perf_counter() - start)
+            trans.rollback()
+    return min(timings) * 1e6 / repeat
+
+
+async def async_per_call_us(storage, make: Callable[[int], tuple], repeat: int, prepared_cache_size: int) -> float:
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    engine = create_async_engine(
+        storage.uri.replace("postgresql://", "postgresql+asyncpg://", 1),
+        connect_args={"prepared_statement_cache_size": prepared_cache_size})
+    timings = []
+    try:
+        async with engine.connect() as con:
+            for _ in range(3):
+                trans = await con.begin()
+                start = time.perf_counter()
+                for i in range(1, repeat + 1):
+                    stm, params = make(i)
+                    await con.execute(stm, params)
+                timings.append(time.perf_counter() - start)
+                await trans.rollback()
+    finally:
+        await engine.dispose()
+    return min(timings) * 1e6 / repeat
+
+
+def run(repeat: int, use_asyncpg: bool = False) -> dict:
+    storage = app.db
+    engines = {
+        "cached": create_engine(storage.uri, query_cache_size=app.config["DB_QUERY_CACHE_SIZE"]),
+        "uncached": create_engine(storage.uri, query_cache_size=0),
+    }
+    # pays connection setup and first compilation outside of timings
+    for engine in engines.values():
+        for ad_hoc, built in cases(storage).values():
+            per_call_us(engine, ad_hoc, 1)
+            per_call_us(engine, built, 1)
+
+    results = {"repeat": repeat, "statements": {}}
+    for name, (ad_hoc, built) in cases(storage).items():
+        timings = {
+            f"{kind}_{cache}_us": per_call_us(engine, make, repeat)
+            for kind, make in (("ad_hoc", ad_hoc), ("built", built))
+            for cache, engine in engines.items()
+        }
+        # before: ad hoc statements on the default engine, after: built statements on the same engine
+        timings["saved_us"] = timings["ad_hoc_cached_us"] - timings["built_cached_us"]
+        if use_asyncpg:
+            for size, key in ((0, "asyncpg_unprepared_us"), (100, "asyncpg_prepared_us")):
+                timings[key] = asyncio.run(async_per_call_us(storage, built, repeat, size))
+        results["statements"][name] = timings
+    for engine in engines.values():
+        engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000, help="calls of every statement per timing")
+    parser.add_argument("--asyncpg", action="store_true", help="time prepared statements of asyncpg as well")
+    parser.add_argument("--output", help="write results as JSON into this file")
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.asyncpg)
+    for name, result in results["statements"].items():
+        print(f"{name:>24}: " + ", ".join(f"{key[:-3]} {value:.1f} us" for key, value in result.items()))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
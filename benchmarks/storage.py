@@ -0,0 +1,136 @@
+"""
+Time every Storage method in process against the configured database, with SQL statements per call
+
+    python -m benchmarks.seed --jobs 10000 --candidates 100000
+    python -m benchmarks.storage --repeat 200
+
+Reads pick random seeded jobs and candidates, writes add their own rows, so seed data is left intact
+apart from applications and candidates added to it. Use it on a scratch database only.
+"""
+import argparse
+import itertools
+import json
+import random
+import time
+import uuid
+from typing import Callable, Dict, List
+
+from sqlalchemy import select
+
+from job_storage import app
+from job_storage import validators as v
+from . import seed
+from ._utils import percentiles
+
+
+class QueryCounter(object):
+    """Count SQL statements executed by all engines of storage"""
+
+    def __init__(self, storage) -> None:
+        self.count = 0
+        for lazy_engine in storage.engines:
+            lazy_engine.listen("before_cursor_execute", self._count)
+
+    def _count(self, *args) -> None:
+        self.count += 1
+
+
+def seeded_ids(table, limit: int = 100000) -> List[int]:
+    with app.db.connect() as con:
+        return [row.id for row in con.execute(select([table.c.id]).order_by(table.c.id).limit(limit))]
+
+
+def drain(rows, count: int = 1000) -> int:
+    """Read first rows of a stream and close it"""
+    read = len(list(itertools.islice(rows, count)))
+    rows.close()
+    return read
+
+
+def cases(repeat: int, generator: seed.Generator) -> Dict[str, Callable[[int], object]]:
+    """
+    Benchmarked calls by name, every one takes the number of the call
+    Rows needed by writes are created upfront, so every call of a write has its own rows.
+    """
+    storage = app.db
+    rng = random.Random(1)
+    job_ids = seeded_ids(storage.jobs.table)
+    candidate_ids = seeded_ids(storage.candidates.table)
+    if not job_ids or not candidate_ids:
+        raise SystemExit("No jobs or candidates, run python -m benchmarks.seed first")
+    token = uuid.uuid4().hex[:8]
+    fresh_jobs = seed.seed_jobs(generator, 3 * repeat)
+    updated_jobs, applied_jobs, deleted_jobs = (fresh_jobs[i::3] for i in range(3))
+    deleted_candidates = seed.seed_candidates(generator, repeat)
+    job_filters = v.jobs.JobFiltersSchema().load({"salary_min": 50000, "salary_max": 60000})
+    skill_filters = v.candidates.CandidateFiltersSchema().load({"skill": ["Skill 1", "Skill 2"]})
+
+    def job(i):
+        payload = generator.job()
+        return v.jobs.InsertJob(f"{payload.title} {token}-{i}", payload.salary, payload.description, payload.skills)
+
+    return {
+        "list_jobs": lambda i: storage.list_jobs(100, primary=True),
+        "list_jobs_filtered": lambda i: storage.list_jobs(100, primary=True, filters=job_filters),
+        "list_candidates": lambda i: storage.list_candidates(100, primary=True),
+        "list_candidates_by_skill": lambda i: storage.list_candidates(100, primary=True, filters=skill_filters),
+        "list_skills": lambda i: storage.list_skills(100, primary=True),
+        "find_job": lambda i: storage.find_job(rng.choice(job_ids), primary=True),
+        "find_candidate": lambda i: storage.find_candidate(rng.choice(candidate_ids), primary=True),
+        "search_jobs": lambda i: storage.search_jobs(rng.choice(seed.WORDS), 20, primary=True),
+        "match_candidates": lambda i: storage.match_candidates(rng.choice(job_ids), primary=True),
+        "stream_jobs": lambda i: drain(storage.stream_jobs(primary=True)),
+        "stream_candidates": lambda i: drain(storage.stream_candidates(primary=True)),
+        "insert_job": lambda i: storage.insert_job(job(i)),
+        "force_insert_job": lambda i: storage.force_insert_job(updated_jobs[i], job(f"updated-{i}")),
+        "insert_candidate": lambda i: storage.insert_candidate(generator.candidate(i)),
+        "force_insert_candidate": lambda i: storage.force_insert_candidate(
+            rng.choice(candidate_ids), generator.candidate(i)),
+        "bulk_insert_candidates_100": lambda i: storage.bulk_insert_candidates(
+            [generator.candidate(i) for _ in range(100)]),
+        "assign_candidates_50": lambda i: storage.assign_candidates(applied_jobs[i], rng.sample(candidate_ids, 50)),
+        "apply_candidate": lambda i: storage.apply_candidate(rng.choice(candidate_ids), updated_jobs[i]),
+        "delete_candidate": lambda i: storage.delete_candidate(deleted_candidates[i]),
+        "delete_job": lambda i: storage.delete_job(deleted_jobs[i]),
+    }
+
+
+def run(repeat: int, only: List[str] = ()) -> dict:
+    generator = seed.Generator(skills=2000, seed=int(time.time()))
+    counter = QueryCounter(app.db)
+    results = {"repeat": repeat, "methods": {}}
+    with app.app_context():
+        for name, call in cases(repeat, generator).items():
+            if only and name not in only:
+                continue
+            timings = []
+            queries = counter.count
+            for i in range(repeat):
+                start = time.perf_counter()
+                call(i)
+                timings.append(time.perf_counter() - start)
+            results["methods"][name] = {
+                **percentiles(timings),
+                "queries_per_call": (counter.count - queries) / repeat,
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200, help="calls of every method")
+    parser.add_argument("--only", nargs="*", default=[], help="names of benchmarked methods, all by default")
+    parser.add_argument("--output", help="write results as JSON into this file")
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.only)
+    for name, result in results["methods"].items():
+        print(f"{name:>26}: p50 {result['p50_ms']:.2f} ms, p95 {result['p95_ms']:.2f} ms, "
+              f"p99 {result['p99_ms']:.2f} ms, {result['queries_per_call']:.1f} queries")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Time payload validation by marshmallow schemas and by validators compiled from them
+
+    python -m benchmarks.validation --repeat 20000 --rows 10000
+
+Before timing, every payload of CASES is loaded both ways and results or error messages are compared,
+a difference stops the benchmark. No database is needed.
+"""
+import argparse
+import json
+import timeit
+
+from marshmallow import ValidationError
+from werkzeug.datastructures import MultiDict
+
+from job_storage import validators as v
+
+JOB = {"title": "Python developer", "salary": 50000, "description": "Remote job", "skills": ["Python", "Flask"]}
+CANDIDATE = {"full_name": "John Smith", "expected_salary": 54321, "skills": ["Python", "SQL", "Docker"]}
+
+CASES = {
+    "insert_job": (v.jobs.InsertJobSchema, [
+        JOB,
+        {**JOB, "skills": None},
+        {k: value for k, value in JOB.items() if k != "skills"},
+        {**JOB, "salary": "50000"},
+        {**JOB, "salary": True},
+        {**JOB, "salary": 1.5},
+        {**JOB, "title": None},
+        {**JOB, "skills": ["Python", 3]},
+        {**JOB, "skills": "Python"},
+        {**JOB, "extra": 1},
+        {"title": "Only title"},
+        [],
+        "job",
+    ]),
+    "insert_candidate": (v.candidates.InsertCandidateSchema, [
+        CANDIDATE,
+        {**CANDIDATE, "expected_salary": "abc"},
+        {**CANDIDATE, "full_name": 7, "skills": [None]},
+        {},
+    ]),
+    "assign_candidates": (v.jobs.AssignCandidatesSchema, [
+        {"candidate_ids": [1, 2, 3]},
+        {"candidate_ids": []},
+        {"candidate_ids": ["1"]},
+    ]),
+    "job_filters": (v.jobs.JobFiltersSchema, [
+        MultiDict([("salary_min", "50000"), ("salary_max", "60000"), ("limit", "5")]),
+        MultiDict([("salary_min", "70000"), ("salary_max", "60000")]),
+        MultiDict([("title_prefix", "")]),
+    ]),
+    "candidate_filters": (v.candidates.CandidateFiltersSchema, [
+        MultiDict([("skill", "Python"), ("skill", "SQL"), ("skill_match", "any")]),
+        MultiDict([("skill", ""), ("skill_match", "some")]),
+    ]),
+    "job_projection": (v.jobs.JobProjectionSchema, [
+        MultiDict([("fields", "id,title,candidates.full_name"), ("expand", "candidates.skills")]),
+        MultiDict([("fields", " , ")]),
+        MultiDict([("fields", "title,bogus"), ("expand", "candidates.jobs")]),
+    ]),
+    "paging": (v.paging.PagingSchema, [
+        MultiDict([("limit", "20"), ("cursor", "abc")]),
+        MultiDict([("limit", "0")]),
+    ]),
+}
+
+
+def outcome(load, payload):
+    try:
+        return "loaded", load(payload)
+    except ValidationError as e:
+        return "error", e.messages
+
+
+def check() -> None:
+    for name, (schema, payloads) in CASES.items():
+        compiled = schema.compiled()
+        for payload in payloads:
+            expected, actual = outcome(schema().load, payload), outcome(compiled.load, payload)
+            if expected != actual:
+                raise SystemExit(f"{name}: {payload!r} loaded as {actual!r} instead of {expected!r}")
+
+
+def run(repeat: int, rows: int) -> dict:
+    check()
+    results = {"repeat": repeat, "rows": rows, "payloads": {}}
+    for name, (schema, payloads) in CASES.items():
+        payload = payloads[0]
+        compiled = schema.compiled()
+        shared = schema()
+        timings = {
+            # a new schema per request, as routes did before
+            "schema_per_call_us": min(timeit.repeat(lambda: schema().load(payload), number=repeat, repeat=3)),
+            "shared_schema_us": min(timeit.repeat(lambda: shared.load(payload), number=repeat, repeat=3)),
+            "compiled_us": min(timeit.repeat(lambda: compiled.load(payload), number=repeat, repeat=3)),
+        }
+        timings = {key: seconds * 1e6 / repeat for key, seconds in timings.items()}
+        timings["speedup"] = timings["schema_per_call_us"] / timings["compiled_us"]
+        results["payloads"][name] = timings
+
+    bulk = [dict(CANDIDATE, full_name=f"Candidate {i}") for i in range(rows)]
+    schema = v.candidates.InsertCandidateSchema
+    before = min(timeit.repeat(lambda: schema().load_many(bulk), number=1, repeat=3))
+    after = min(timeit.repeat(lambda: schema.compiled().load_many(bulk), number=1, repeat=3))
+    results["bulk_candidates"] = {"schema_ms": before * 1000, "compiled_ms": after * 1000, "speedup": before / after}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20000, help="loads of every payload per timing")
+    parser.add_argument("--rows", type=int, default=10000, help="rows of the bulk candidate payload")
+    parser.add_argument("--output", help="write results as JSON into this file")
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.rows)
+    for name, result in results["payloads"].items():
+        print(f"{name:>20}: schema per call {result['schema_per_call_us']:.1f} us, "
+              f"shared schema {result['shared_schema_us']:.1f} us, compiled {result['compiled_us']:.1f} us, "
+              f"{result['speedup']:.1f}x")
+    bulk = results["bulk_candidates"]
+    print(f"{'bulk_candidates':>20}: schema {bulk['schema_ms']:.1f} ms, compiled {bulk['compiled_ms']:.1f} ms, "
+          f"{bulk['speedup']:.1f}x")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
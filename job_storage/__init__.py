@@ -1,14 +1,12 @@
 import os
-import arrow
 import logging
 import logging.config
 import typing
-import datetime as dt
-import decimal
+import time
 import uuid
-from json import JSONEncoder
+from urllib.parse import urlencode
 
-from flask import Flask, request
+from flask import Flask, request, Response, make_response
 # Restx monkey patch start
 #import flask.scaffold
 #flask.helpers._endpoint_from_view_func = flask.scaffold._endpoint_from_view_func
@@ -18,17 +16,32 @@ from flask_restx import Api
 from marshmallow.exceptions import ValidationError
 
 from . import db
-from .log import RequestFilter
+from .log import RequestFilter, BackgroundHandler, log_in_background
 from . import routes
+from . import metrics
+from . import query_tracking
 from .custom_exceptions import JobStorageException
+from . import serialization
+from . import compression
+from .serialization import ExtendedJSONEncoder
+from .response_cache import ResponseCache, CachedResponse
+from .routes._utils import read_primary
 
 
 class JobStorage(Flask):
     db: db.Storage
     api: Api
+    log_handler: typing.Optional[BackgroundHandler]
 
     LOG_NAME = "flask.app"
 
+    # tables holding data served by GET endpoints of each cached namespace
+    CACHED_NAMESPACES = {
+        "jobs": ("jobs", "jobs_skills", "jobs_candidates", "candidates", "candidates_skills", "skills"),
+        "candidates": ("candidates", "candidates_skills", "skills"),
+        "skills": ("skills",),
+    }
+
     def __init__(self, *args, **kwargs) -> None:
         super(JobStorage, self).__init__(*args, **kwargs)
         # parse config
@@ -38,6 +51,20 @@ class JobStorage(Flask):
         self.logger = logging.getLogger(self.LOG_NAME)
         self.set_logger()
 
+        self.json_backend = serialization.set_backend(self.config["JSON_BACKEND"])
+        self.logger.info(f'JSON backend - {self.json_backend}')
+
+        # compress responses of the whole app, Api and metrics alike
+        codings = compression.encoders(
+            self.config["COMPRESSION_ENCODINGS"],
+            self.config["COMPRESSION_GZIP_LEVEL"],
+            self.config["COMPRESSION_BROTLI_QUALITY"],
+        )
+        if codings:
+            self.wsgi_app = compression.CompressionMiddleware(
+                self.wsgi_app, codings, self.config["COMPRESSION_MIN_SIZE"], self.config["COMPRESSION_MIMETYPES"])
+        self.logger.info(f'Compression - {", ".join(codings) or "disabled"}')
+
         # set up db
         self.logger.info('DB - verifying ...')
         self.db = db.Storage(
@@ -46,6 +73,25 @@ class JobStorage(Flask):
             host=self.config["DB_HOST"],
             port=self.config["DB_PORT"],
             path=self.config["DB_PATH"],
+            pool_size=self.config["DB_POOL_SIZE"],
+            max_overflow=self.config["DB_POOL_MAX_OVERFLOW"],
+            pool_timeout=self.config["DB_POOL_TIMEOUT"],
+            pool_pre_ping=self.config["DB_POOL_PRE_PING"],
+            pool_recycle=self.config["DB_POOL_RECYCLE"],
+            isolation_level=self.config["DB_ISOLATION_LEVEL"],
+            query_cache_size=self.config["DB_QUERY_CACHE_SIZE"],
+            skill_cache_size=self.config["SKILL_CACHE_SIZE"],
+            replica_uris=self.config["DB_REPLICA_URIS"],
+            replica_selection=self.config["DB_REPLICA_SELECTION"],
+            notify_channel=self.config["DB_NOTIFY_CHANNEL"],
+        )
+        metrics.instrument_storage(self.db)
+        if self.config.get("QUERY_TRACKING"):
+            query_tracking.instrument_storage(self.db)
+
+        self.response_cache = ResponseCache(
+            max_bytes=self.config["RESPONSE_CACHE_MAX_BYTES"],
+            ttl=self.config["RESPONSE_CACHE_TTL"],
         )
 
         # create REST Api
@@ -61,11 +107,12 @@ class JobStorage(Flask):
         self.api.add_namespace(routes.jobs.api, path='/jobs')
         self.api.add_namespace(routes.candidates.api, path='/candidates')
         self.api.add_namespace(routes.skills.api, path='/skills')
+        self.api.add_namespace(routes.stats.api, path='/stats')
 
     def set_logger(self):
         """
         Set up logging from current app config
-        Uses LOG_CONF setting
+        Uses LOG_CONF, LOG_ASYNC, LOG_QUEUE_SIZE and LOG_SAMPLING settings
         """
 
         self.logger.addFilter(RequestFilter())
@@ -79,40 +126,50 @@ class JobStorage(Flask):
         else:
             print('using default flask logger set up')
             self.logger.info('using default flask logger set up')
+        self.log_handler = None
+        # without handlers of its own records propagate to the root logger, which is left as it is
+        if self.config.get('LOG_ASYNC') and self.logger.handlers:
+            self.log_handler = log_in_background(
+                self.logger, self.config['LOG_QUEUE_SIZE'], self.config.get('LOG_SAMPLING'))
         self.logger.info('App logger bound')
 
-    def dispose(self) -> None:
-        """This has the effect of fully closing all **currently checked in** connections to outer world"""
-        self.db.client.dispose()
+    def namespace_of(self, path: str) -> typing.Optional[str]:
+        """Name of REST Api namespace path belongs to, None for paths outside of the Api"""
+        if not path.startswith(f"{self.api.prefix}/"):
+            return None
+        return path[len(self.api.prefix) + 1:].split("/")[0]
 
+    def cached_tables(self, path: str) -> typing.Optional[typing.Tuple[str, ...]]:
+        """Tables the response of path depends on, None if the path is not cached"""
+        return self.CACHED_NAMESPACES.get(self.namespace_of(path))
 
-class ExtendedJSONEncoder(JSONEncoder):
-    """
-    JSON encoder capable to convert datetime object into iso-string
-    """
+    def dispose(self) -> None:
+        """This has the effect of fully closing all **currently checked in** connections to outer world"""
+        self.db.dispose()
 
-    def default(self, obj):
-        if isinstance(obj, dt.datetime):
-            return arrow.get(obj).isoformat().replace("+00:00", "Z")
 
-        if isinstance(obj, dt.date):
-            return arrow.get(obj).isoformat().replace("+00:00", "Z")
+app = JobStorage(
+    __name__,
+)
 
-        if isinstance(obj, decimal.Decimal):
-            return float(obj)
+@app.api.representation('application/json')
+def output_json(data, code, headers=None):
+    """Serialize Api responses by JSON backend selected in config"""
+    response = make_response(serialization.dumps(data), code)
+    response.headers.extend(headers or {})
+    response.content_type = 'application/json'
+    return response
 
-        return JSONEncoder.default(self, obj)
 
+@app.before_request
+def start_request_timer():
+    request.start_time = time.perf_counter()
 
-app = JobStorage(
-    __name__,
-)
 
-app.config['RESTX_JSON'] = {
-    'separators': (',', ':'),
-    'indent': 0,
-    'cls': ExtendedJSONEncoder
-}
+@app.before_request
+def start_query_tracking():
+    if app.config.get("QUERY_TRACKING"):
+        request.tracked_queries = query_tracking.start()
 
 
 @app.before_request
@@ -122,6 +179,101 @@ def get_request_id():
     app.logger.info(f"Requested - {request.path}")
 
 
+@app.before_request
+def start_change_listener():
+    app.db.start_change_listener()
+
+
+@app.before_request
+def warm_skill_cache():
+    if app.config.get("SKILL_CACHE_WARM"):
+        app.db.warm_skill_cache_once()
+
+
+@app.before_request
+def serve_cached_response():
+    """Answer from response cache if data did not change since the response was stored"""
+    tables = app.cached_tables(request.path)
+    if request.method != "GET" or tables is None or read_primary():
+        return None
+    request.cache_key = f"{request.path}?{urlencode(sorted(request.args.items(multi=True)))}"
+    request.cache_tables = tables
+    request.cache_version = ResponseCache.make_version(app.db.versions.token, app.db.versions.get(tables))
+    cached = app.response_cache.get(request.cache_key, request.cache_version)
+    if cached is None:
+        return None
+    if request.if_none_match.contains_weak(cached.etag):
+        response = Response(status=304)
+    else:
+        response = Response(cached.body, content_type=cached.content_type)
+    response.set_etag(cached.etag)
+    return response
+
+
+@app.after_request
+def store_cached_response(response):
+    """
+    Cache the response and tag it by a hash of its body
+    Worker without the response in its cache reads the data, an unchanged body is still answered by 304.
+    Shortly after a change, bodies read from replicas are not cached, a lagging replica may have missed it and
+    the stale body would be served until the next change.
+    """
+    cache_key = getattr(request, "cache_key", None)
+    if cache_key is None or response.status_code != 200 or response.is_streamed or response.get_etag()[0]:
+        return response
+    body = response.get_data()
+    etag = ResponseCache.make_etag(body)
+    age = app.db.versions.age(request.cache_tables) if app.db.replicas else None
+    if age is None or age >= app.config["RESPONSE_CACHE_REPLICA_LAG"]:
+        app.response_cache.put(cache_key, CachedResponse(
+            body=body,
+            content_type=response.content_type,
+            etag=etag,
+            version=request.cache_version,
+            created=time.monotonic(),
+        ))
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+
+@app.after_request
+def observe_request(response):
+    start_time = getattr(request, "start_time", None)
+    if start_time is not None:
+        metrics.observe_request(
+            namespace=app.namespace_of(request.path) or "",
+            route=request.url_rule.rule if request.url_rule else "",
+            method=request.method,
+            status=response.status_code,
+            duration=time.perf_counter() - start_time,
+        )
+    return response
+
+
+@app.after_request
+def report_queries(response):
+    """Summarize statements of the request in headers, log N+1 and slow ones once the response is sent"""
+    queries = getattr(request, "tracked_queries", None)
+    if queries is None:
+        return response
+    query_tracking.stop(queries)
+    response.headers.extend(queries.headers())
+    request_name = f"{request.method} {request.path}"
+    response.call_on_close(lambda: query_tracking.report(
+        queries, request_name,
+        threshold=app.config["QUERY_REPEAT_THRESHOLD"],
+        slow_ms=app.config["SLOW_QUERY_MS"],
+        explain_slow=app.config["SLOW_QUERY_EXPLAIN"],
+        logger=app.logger,
+    ))
+    return response
+
+
+@app.route("/metrics")
+def export_metrics():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
 @app.api.errorhandler(JobStorageException)
 def handle_data_server_exception(error):
     """Return a custom message"""
@@ -137,5 +289,3 @@ def handle_data_server_exception(error):
                   "fields": error.messages}
     return error.data, 400
 
-
-app.dispose()
@@ -0,0 +1,388 @@
+"""
+ASGI app serving jobs, candidates and skills namespaces from AsyncStorage
+
+    uvicorn job_storage.asgi:app --host 0.0.0.0 --port 2000 --workers 2
+
+Requests, validation, errors and responses are the same as of the WSGI app, config is shared with it.
+Needs packages of requirements-async.txt.
+"""
+import contextlib
+import json
+
+from marshmallow.exceptions import ValidationError
+from starlette.applications import Starlette
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.exceptions import HTTPException
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route, Mount
+
+from . import app as wsgi_app
+from . import validators as v
+from . import custom_exceptions as j_exc
+from . import serialization
+from . import compression
+from . import query_tracking
+from .custom_exceptions import JobStorageException
+from .db.async_storage import AsyncStorage
+from .routes._utils import read_primary
+
+config = wsgi_app.config
+logger = wsgi_app.logger
+
+storage = AsyncStorage(
+    user=config["DB_USER"],
+    password=config["DB_PASS"],
+    host=config["DB_HOST"],
+    port=config["DB_PORT"],
+    path=config["DB_PATH"],
+    pool_size=config["DB_ASYNC_POOL_SIZE"],
+    max_overflow=config["DB_ASYNC_POOL_MAX_OVERFLOW"],
+    pool_timeout=config["DB_POOL_TIMEOUT"],
+    pool_pre_ping=config["DB_POOL_PRE_PING"],
+    pool_recycle=config["DB_POOL_RECYCLE"],
+    isolation_level=config["DB_ISOLATION_LEVEL"],
+    query_cache_size=config["DB_QUERY_CACHE_SIZE"],
+    prepared_statement_cache_size=config["DB_ASYNC_PREPARED_STATEMENT_CACHE_SIZE"],
+    skill_cache_size=config["SKILL_CACHE_SIZE"],
+    replica_uris=config["DB_REPLICA_URIS"],
+    replica_selection=config["DB_REPLICA_SELECTION"],
+    notify_channel=config["DB_NOTIFY_CHANNEL"],
+)
+if config.get("QUERY_TRACKING"):
+    query_tracking.instrument_async_storage(storage)
+
+
+def json_response(data, status_code=200) -> Response:
+    return Response(serialization.dumps(data), status_code, media_type="application/json")
+
+
+async def ndjson_response(rows) -> StreamingResponse:
+    async def lines():
+        async for row in rows:
+            yield serialization.dumps(row) + b"\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+async def json_payload(request: Request):
+    """Decoded JSON body, None if body is empty"""
+    body = await request.body()
+    if not body:
+        return None
+    try:
+        return json.loads(body)
+    except ValueError:
+        raise HTTPException(400, "The browser (or proxy) sent a request that this server could not understand.")
+
+
+# JOBS
+async def list_jobs(request: Request):
+    paging = v.paging.PagingSchema.compiled().load(request.query_params)
+    filters = v.jobs.JobFiltersSchema.compiled().load(request.query_params)
+    projection = v.jobs.JobProjectionSchema.compiled().load(request.query_params)
+    data, next_cursor = await storage.list_jobs(
+        paging.limit, paging.cursor, read_primary(request.headers), filters, projection)
+    return json_response({"data": data, "next_cursor": next_cursor})
+
+
+async def insert_job(request: Request):
+    payload = v.jobs.InsertJobSchema.compiled().load(await json_payload(request) or {})
+    await storage.insert_job(payload)
+    return json_response({"message": "Job added successfully"}, 201)
+
+
+async def export_jobs(request: Request):
+    return await ndjson_response(storage.stream_jobs(config["EXPORT_BATCH_SIZE"], read_primary(request.headers)))
+
+
+async def search_jobs(request: Request):
+    query = v.jobs.SearchQuerySchema.compiled().load(request.query_params)
+    paging = v.paging.PagingSchema.compiled().load(request.query_params)
+    filters = v.jobs.JobFiltersSchema.compiled().load(request.query_params)
+    data, next_cursor = await storage.search_jobs(
+        query.q, paging.limit, paging.cursor, read_primary(request.headers), filters)
+    return json_response({"data": data, "next_cursor": next_cursor})
+
+
+async def find_job(request: Request):
+    job_id = request.path_params["job_id"]
+    projection = v.jobs.JobProjectionSchema.compiled().load(request.query_params)
+    return json_response({"data": await storage.find_job(job_id, read_primary(request.headers), projection)})
+
+
+async def match_candidates(request: Request):
+    query = v.jobs.MatchQuerySchema.compiled().load(request.query_params)
+    data = await storage.match_candidates(
+        request.path_params["job_id"], query.min_overlap, query.max_salary, query.limit, read_primary(request.headers))
+    return json_response({"data": data})
+
+
+async def assign_candidates(request: Request):
+    payload = v.jobs.AssignCandidatesSchema.compiled().load(await json_payload(request) or {})
+    if len(payload.candidate_ids) > config["BULK_MAX_ROWS"]:
+        raise j_exc.PayloadTooLargeError(f"At most {config['BULK_MAX_ROWS']} candidates can be assigned at once")
+    outcome = await storage.assign_candidates(request.path_params["job_id"], payload.candidate_ids)
+    return json_response({
+        "message": f"{len(outcome['added'])} candidates assigned successfully",
+        **outcome,
+    }, 201 if outcome["added"] else 200)
+
+
+async def force_insert_job(request: Request):
+    payload = v.jobs.InsertJobSchema.compiled().load(await json_payload(request) or {})
+    await storage.force_insert_job(request.path_params["job_id"], payload)
+    return json_response({"message": "Job updated/added successfully"}, 201)
+
+
+async def delete_job(request: Request):
+    await storage.delete_job(request.path_params["job_id"])
+    return json_response({"message": "Job deleted successfully"}, 202)
+
+
+# CANDIDATES
+async def list_candidates(request: Request):
+    paging = v.paging.PagingSchema.compiled().load(request.query_params)
+    filters = v.candidates.CandidateFiltersSchema.compiled().load(request.query_params)
+    projection = v.candidates.CandidateProjectionSchema.compiled().load(request.query_params)
+    data, next_cursor = await storage.list_candidates(
+        paging.limit, paging.cursor, read_primary(request.headers), filters, projection)
+    return json_response({"data": data, "next_cursor": next_cursor})
+
+
+async def insert_candidate(request: Request):
+    payload = v.candidates.InsertCandidateSchema.compiled().load(await json_payload(request) or {})
+    await storage.insert_candidate(payload)
+    return json_response({"message": "Candidate added successfully"}, 201)
+
+
+async def bulk_insert_candidates(request: Request):
+    if request.headers.get("content-type", "").split(";")[0].strip() == "application/x-ndjson":
+        rows = list(serialization.loads_ndjson((await request.body()).decode()))
+    else:
+        rows = await json_payload(request)
+    if not isinstance(rows, list):
+        raise ValidationError({"_schema": ["Expected a list of candidates."]})
+    if len(rows) > config["BULK_MAX_ROWS"]:
+        raise j_exc.PayloadTooLargeError(f"At most {config['BULK_MAX_ROWS']} candidates can be added at once")
+
+    loaded, errors = v.candidates.InsertCandidateSchema.compiled().load_many(rows)
+    candidate_ids = await storage.bulk_insert_candidates([payload for _, payload in loaded]) if loaded else []
+    inserted = [{"index": index, "id": candidate_id} for (index, _), candidate_id in zip(loaded, candidate_ids)]
+    return json_response({
+        "message": f"{len(inserted)} candidates added successfully",
+        "inserted": inserted,
+        "errors": errors,
+    }, 201 if inserted or not errors else 400)
+
+
+async def export_candidates(request: Request):
+    return await ndjson_response(
+        storage.stream_candidates(config["EXPORT_BATCH_SIZE"], read_primary(request.headers)))
+
+
+async def find_candidate(request: Request):
+    candidate_id = request.path_params["candidate_id"]
+    projection = v.candidates.CandidateProjectionSchema.compiled().load(request.query_params)
+    return json_response(
+        {"data": await storage.find_candidate(candidate_id, read_primary(request.headers), projection)})
+
+
+async def force_insert_candidate(request: Request):
+    payload = v.candidates.InsertCandidateSchema.compiled().load(await json_payload(request) or {})
+    await storage.force_insert_candidate(request.path_params["candidate_id"], payload)
+    return json_response({"message": "Candidate updated/added successfully"}, 201)
+
+
+async def delete_candidate(request: Request):
+    await storage.delete_candidate(request.path_params["candidate_id"])
+    return json_response({"message": "Candidate deleted successfully"}, 202)
+
+
+async def apply_candidate(request: Request):
+    await storage.apply_candidate(request.path_params["candidate_id"], request.path_params["job_id"])
+    return json_response({"message": "Candidate applied successfully"}, 201)
+
+
+# SKILLS
+async def list_skills(request: Request):
+    paging = v.paging.PagingSchema.compiled().load(request.query_params)
+    data, next_cursor = await storage.list_skills(paging.limit, paging.cursor, read_primary(request.headers))
+    return json_response({"data": data, "next_cursor": next_cursor})
+
+
+# ERRORS
+async def handle_data_server_exception(request: Request, error: JobStorageException):
+    """Return a custom message"""
+    logger.warning(f"{error.response}: {str(error)}")
+    return json_response({'error': error.response}, error.status_code)
+
+
+async def handle_validation_error(request: Request, error: ValidationError):
+    """Return a custom message and 400 status code"""
+    logger.warning(f"Error while validating input data: {error}")
+    return json_response({"error": "Validation error", "fields": error.messages}, 400)
+
+
+async def handle_http_exception(request: Request, error: HTTPException):
+    return json_response({"message": error.detail}, error.status_code)
+
+
+class QueryTrackingMiddleware(object):
+    """Summarize statements of every request in headers, log N+1 and slow ones once the response is sent"""
+
+    def __init__(self, asgi_app) -> None:
+        self.app = asgi_app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        queries = query_tracking.start()
+
+        async def send_with_summary(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                for name, value in queries.headers().items():
+                    headers.append(name, value)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_summary)
+        finally:
+            query_tracking.stop(queries)
+        await query_tracking.report_async(
+            queries, f"{scope['method']} {scope['path']}",
+            threshold=config["QUERY_REPEAT_THRESHOLD"],
+            slow_ms=config["SLOW_QUERY_MS"],
+            explain_slow=config["SLOW_QUERY_EXPLAIN"],
+            logger=logger,
+        )
+
+
+class CompressionMiddleware(object):
+    """Compress response bodies as negotiated by Accept-Encoding, see job_storage.compression"""
+
+    def __init__(self, asgi_app, codings, min_size: int = 1024, mimetypes=("application/json",)) -> None:
+        self.app = asgi_app
+        self.codings = codings
+        self.min_size = min_size
+        self.mimetypes = frozenset(mimetypes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        coding = None
+        if scope["method"] != "HEAD":
+            coding = compression.negotiate(Headers(scope=scope).get("accept-encoding"), self.codings)
+        start = None
+        held = []
+        encoder = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, encoder, passthrough
+            if passthrough:
+                return await send(message)
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if not compression.compressible(
+                        message["status"], headers.get("content-type"), headers.get("content-encoding"),
+                        headers.get("cache-control"), self.mimetypes):
+                    passthrough = True
+                    return await send(message)
+                headers["vary"] = compression.vary_accept_encoding(headers.get("vary"))
+                content_length = headers.get("content-length")
+                if coding is None or (content_length is not None and int(content_length) < self.min_size):
+                    passthrough = True
+                    return await send(message)
+                # sent along with the first body bytes, once it is known whether they are compressed
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                return await send(message)
+
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                held.append(message.get("body", b""))
+                size = sum(len(chunk) for chunk in held)
+                if size < self.min_size:
+                    if more_body:
+                        return
+                    passthrough = True
+                    await send(start)
+                    return await send({"type": "http.response.body", "body": b"".join(held), "more_body": False})
+                encoder = self.codings[coding]()
+                headers = MutableHeaders(scope=start)
+                if "content-length" in headers:
+                    del headers["content-length"]
+                headers["content-encoding"] = coding
+                if "etag" in headers:
+                    headers["etag"] = compression.weak_etag(headers["etag"])
+                await send(start)
+                body = encoder.compress(b"".join(held))
+            else:
+                body = encoder.compress(message.get("body", b""))
+            if not more_body:
+                body += encoder.finish()
+            if body or not more_body:
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(asgi_app):
+    if config.get("SKILL_CACHE_WARM"):
+        await storage.warm_skill_cache()
+    await storage.start_change_listener()
+    yield
+    await storage.dispose()
+
+
+routes = [
+    Mount("/api", routes=[
+        Route("/jobs", list_jobs, methods=["GET"]),
+        Route("/jobs", insert_job, methods=["POST"]),
+        Route("/jobs/export", export_jobs, methods=["GET"]),
+        Route("/jobs/search", search_jobs, methods=["GET"]),
+        Route("/jobs/{job_id:int}", find_job, methods=["GET"]),
+        Route("/jobs/{job_id:int}", force_insert_job, methods=["PUT"]),
+        Route("/jobs/{job_id:int}", delete_job, methods=["DELETE"]),
+        Route("/jobs/{job_id:int}/matches", match_candidates, methods=["GET"]),
+        Route("/jobs/{job_id:int}/candidates", assign_candidates, methods=["POST"]),
+        Route("/candidates", list_candidates, methods=["GET"]),
+        Route("/candidates", insert_candidate, methods=["POST"]),
+        Route("/candidates/bulk", bulk_insert_candidates, methods=["POST"]),
+        Route("/candidates/export", export_candidates, methods=["GET"]),
+        Route("/candidates/{candidate_id:int}", find_candidate, methods=["GET"]),
+        Route("/candidates/{candidate_id:int}", force_insert_candidate, methods=["PUT"]),
+        Route("/candidates/{candidate_id:int}", delete_candidate, methods=["DELETE"]),
+        Route("/candidates/{candidate_id:int}/apply/jobs/{job_id:int}", apply_candidate, methods=["POST"]),
+        Route("/skills", list_skills, methods=["GET"]),
+    ]),
+]
+
+middleware = []
+codings = compression.encoders(
+    config["COMPRESSION_ENCODINGS"], config["COMPRESSION_GZIP_LEVEL"], config["COMPRESSION_BROTLI_QUALITY"])
+if codings:
+    middleware.append(Middleware(
+        CompressionMiddleware,
+        codings=codings,
+        min_size=config["COMPRESSION_MIN_SIZE"],
+        mimetypes=config["COMPRESSION_MIMETYPES"],
+    ))
+if config.get("QUERY_TRACKING"):
+    middleware.append(Middleware(QueryTrackingMiddleware))
+
+app = Starlette(
+    debug=config.get("DEBUG", False),
+    routes=routes,
+    middleware=middleware,
+    exception_handlers={
+        JobStorageException: handle_data_server_exception,
+        ValidationError: handle_validation_error,
+        HTTPException: handle_http_exception,
+    },
+    lifespan=lifespan,
+)
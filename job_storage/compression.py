@@ -0,0 +1,238 @@
+"""
+Compression of response bodies, negotiated by Accept-Encoding
+Bodies are compressed chunk by chunk as they are produced, so streamed exports are compressed without being
+buffered. The first bytes of a body are held back until they reach the minimum size, bodies ending below it are
+sent as they are. Brotli is offered if the brotli package is installed.
+"""
+import zlib
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from werkzeug.wsgi import ClosingIterator
+
+try:
+    import brotli
+except ImportError:  # optional, responses are compressed by gzip only without it
+    brotli = None
+
+
+class Encoder(object):
+    """
+    Compressor of one body, output is flushed every FLUSH_BYTES of input, so streams reach clients steadily
+    Small chunks, e.g. NDJSON lines, are joined into blocks of BLOCK_BYTES first, compressors called per line
+    are slower and brotli of low quality barely compresses them.
+    """
+    BLOCK_BYTES = 16 * 1024
+    FLUSH_BYTES = 64 * 1024
+
+    def __init__(self) -> None:
+        self._block = []
+        self._block_size = 0
+        self._unflushed = 0
+
+    def compress(self, data: bytes) -> bytes:
+        self._block.append(data)
+        self._block_size += len(data)
+        if self._block_size < self.BLOCK_BYTES:
+            return b""
+        output = self._compress_block()
+        if self._unflushed >= self.FLUSH_BYTES:
+            output += self._flush()
+            self._unflushed = 0
+        return output
+
+    def finish(self) -> bytes:
+        return self._compress_block() + self._finish()
+
+    def _compress_block(self) -> bytes:
+        data = b"".join(self._block)
+        self._block = []
+        self._block_size = 0
+        self._unflushed += len(data)
+        return self._compress(data)
+
+    def _finish(self) -> bytes:
+        raise NotImplementedError
+
+    def _compress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def _flush(self) -> bytes:
+        raise NotImplementedError
+
+
+class GzipEncoder(Encoder):
+    def __init__(self, level: int = 6) -> None:
+        super().__init__()
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def _compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def _flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def _finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliEncoder(Encoder):
+    def __init__(self, quality: int = 4) -> None:
+        super().__init__()
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def _compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def _flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def _finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def encoders(names: Sequence[str], gzip_level: int = 6, brotli_quality: int = 4) -> Dict[str, Callable[[], Encoder]]:
+    """
+    Encoder factories by content coding, in order of preference
+    :param names: "br" and "gzip" in order of preference, br is left out if brotli is not installed
+    """
+    available = {
+        "gzip": lambda: GzipEncoder(gzip_level),
+        "br": lambda: BrotliEncoder(brotli_quality),
+    }
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ValueError(f"Unknown content coding {', '.join(unknown)}")
+    return {name: available[name] for name in names if name != "br" or brotli is not None}
+
+
+def negotiate(accept_encoding: Optional[str], codings: Iterable[str]) -> Optional[str]:
+    """
+    Content coding of the response
+    :param accept_encoding: Accept-Encoding header of the request
+    :param codings: codings of the server, in order of preference
+    :return: first coding the client accepts, None to send the body as it is
+    """
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        weight = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name.strip().lower()] = weight
+    for coding in codings:
+        if weights.get(coding, weights.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+
+def compressible(
+        status: int,
+        content_type: Optional[str],
+        content_encoding: Optional[str],
+        cache_control: Optional[str],
+        mimetypes: Iterable[str]) -> bool:
+    """Whether a response is worth compressing and may be, headers are given as sent, None if missing"""
+    if status < 200 or status in (204, 206, 304):
+        return False
+    if content_encoding or "no-transform" in (cache_control or "").lower():
+        return False
+    return (content_type or "").split(";")[0].strip().lower() in mimetypes
+
+
+def vary_accept_encoding(vary: Optional[str]) -> str:
+    """Vary header telling caches the body depends on Accept-Encoding"""
+    values = [value.strip() for value in (vary or "").split(",") if value.strip()]
+    if "*" in values or "accept-encoding" in (value.lower() for value in values):
+        return ", ".join(values)
+    return ", ".join([*values, "Accept-Encoding"])
+
+
+def weak_etag(etag: str) -> str:
+    """Compressed body is not byte for byte the entity of a strong ETag, its weak form still validates"""
+    return etag if etag.startswith("W/") else f"W/{etag}"
+
+
+class CompressionMiddleware(object):
+    """WSGI middleware compressing bodies of responses of mimetypes"""
+
+    def __init__(
+            self,
+            wsgi_app,
+            codings: Dict[str, Callable[[], Encoder]],
+            min_size: int = 1024,
+            mimetypes: Iterable[str] = ("application/json",)) -> None:
+        self.app = wsgi_app
+        self.codings = codings
+        self.min_size = min_size
+        self.mimetypes = frozenset(mimetypes)
+
+    def __call__(self, environ, start_response):
+        coding = None
+        if environ.get("REQUEST_METHOD") != "HEAD":
+            coding = negotiate(environ.get("HTTP_ACCEPT_ENCODING"), self.codings)
+        response = {}
+
+        def capture_start(status, headers, exc_info=None):
+            response.update(status=status, headers=headers, exc_info=exc_info)
+
+        app_iter = self.app(environ, capture_start)
+        return ClosingIterator(self._body(app_iter, coding, response, start_response), getattr(app_iter, "close", None))
+
+    def _body(self, app_iter, coding: Optional[str], response: dict, start_response):
+        chunks = iter(app_iter)
+        held = []
+        if "status" not in response:
+            # an app may start the response along with its first chunk
+            held.append(next(chunks, b""))
+        headers: List[tuple] = response["headers"]
+        header = {name.lower(): value for name, value in headers}
+        if not compressible(
+                int(response["status"].split(" ", 1)[0]), header.get("content-type"), header.get("content-encoding"),
+                header.get("cache-control"), self.mimetypes):
+            start_response(response["status"], headers, response["exc_info"])
+            yield from held
+            yield from chunks
+            return
+        headers = [(name, value) for name, value in headers if name.lower() != "vary"]
+        headers.append(("Vary", vary_accept_encoding(header.get("vary"))))
+        content_length = header.get("content-length")
+        if coding is None or (content_length is not None and int(content_length) < self.min_size):
+            start_response(response["status"], headers, response["exc_info"])
+            yield from held
+            yield from chunks
+            return
+
+        # bodies of unknown length are held back until they are known to reach min_size
+        size = sum(len(chunk) for chunk in held)
+        if size < self.min_size:
+            for chunk in chunks:
+                held.append(chunk)
+                size += len(chunk)
+                if size >= self.min_size:
+                    break
+            else:
+                start_response(response["status"], headers, response["exc_info"])
+                yield b"".join(held)
+                return
+
+        encoder = self.codings[coding]()
+        headers = [(name, value) for name, value in headers if name.lower() not in ("content-length", "etag")]
+        headers.append(("Content-Encoding", coding))
+        if "etag" in header:
+            headers.append(("ETag", weak_etag(header["etag"])))
+        start_response(response["status"], headers, response["exc_info"])
+        output = encoder.compress(b"".join(held))
+        if output:
+            yield output
+        for chunk in chunks:
+            output = encoder.compress(chunk)
+            if output:
+                yield output
+        yield encoder.finish()
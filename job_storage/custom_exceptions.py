@@ -19,3 +19,13 @@ class UniqueViolationError(JobStorageException):
 class ForeignKeyViolationError(JobStorageException):
     RESPONSE = "Referenced data does not exist"
     STATUS_CODE = 400
+
+
+class InvalidCursorError(JobStorageException):
+    RESPONSE = "Invalid cursor"
+    STATUS_CODE = 400
+
+
+class PayloadTooLargeError(JobStorageException):
+    RESPONSE = "Payload too large"
+    STATUS_CODE = 413
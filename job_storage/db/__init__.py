@@ -1,23 +1,18 @@
-from typing import List, Dict, Any
+import itertools
+import os
+import threading
+from typing import List, Dict, Any, Optional, Iterator, Sequence, Callable
 
 from flask import current_app as app
-from sqlalchemy import exc, select, bindparam, MetaData, create_engine
-from sqlalchemy_utils import database_exists, create_database
-from dataclasses import asdict
+from sqlalchemy import exc, MetaData
 
-from . import tables
+from . import cache, pool, notify, matching
+from .base import StorageBase, Change, Steps
 from job_storage import validators as v
 from job_storage import custom_exceptions as j_exc
 
 
-class Storage(object):
-    convention = {
-        "ix": 'ix_%(column_0_label)s',
-        "uq": "uq_%(table_name)s_%(column_0_name)s",
-        "ck": "ck_%(table_name)s_%(constraint_name)s",
-        "fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
-        "pk": "pk_%(table_name)s"}
-
+class Storage(StorageBase):
     def __init__(
             self,
             user,
@@ -27,40 +22,90 @@ class Storage(object):
             path,
             echo=False,
             pool_size=2,
+            max_overflow=10,
+            pool_timeout=30,
+            pool_pre_ping=False,
             pool_recycle=1320,
-            isolation_level='read committed'.upper()
+            isolation_level='read committed'.upper(),
+            query_cache_size=500,
+            skill_cache_size=1024,
+            replica_uris: Sequence[str] = (),
+            replica_selection="round-robin",
+            notify_channel: Optional[str] = None,
     ):
         self.user = user
         self.password = password
         self.host = host
         self.port = port
         self.path = path
-
-        self.client = create_engine(
-            self.uri,
+        self.skill_cache = cache.LRUCache(skill_cache_size)
+        self.skill_index = matching.SkillIndex()
+        self._skill_index_lock = threading.Lock()
+        self.versions = cache.DataVersions()
+        self.notify_channel = notify_channel
+        self._listener = None
+        self._listener_lock = threading.Lock()
+        self._skill_cache_warm_pid = None
+
+        engine_kwargs = dict(
             echo=echo,
             pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_pre_ping=pool_pre_ping,
             pool_recycle=pool_recycle,
-            isolation_level=isolation_level)
-        if not database_exists(self.client.url):
-            create_database(self.client.url)
-        self.metadata = MetaData(
-            bind=self.client,
-            naming_convention=Storage.convention)
-
-        self.candidates = tables.Candidates(self.metadata)
-        self.skills = tables.Skills(self.metadata)
-        self.candidates_skills = tables.CandidatesSkills(self.metadata)
-        self.jobs = tables.Jobs(self.metadata)
-        self.jobs_candidates = tables.JobsCandidates(self.metadata)
-
-        self.metadata.create_all()
+            isolation_level=isolation_level,
+            query_cache_size=query_cache_size)
+        self.primary = pool.LazyEngine(self.uri, "primary", **engine_kwargs)
+        # read only replicas, reads go to primary if there are none
+        self.replicas = [
+            pool.LazyEngine(uri, f"replica-{index}", **engine_kwargs) for index, uri in enumerate(replica_uris)]
+        if replica_selection not in ("round-robin", "least-busy"):
+            raise ValueError(f"Unknown replica selection {replica_selection}")
+        self.replica_selection = replica_selection
+        self._replica_cycle = itertools.cycle(self.replicas)
+        # nothing connects here, schema is managed by migrations (python -m job_storage.migrate)
+        self._define_tables(MetaData(naming_convention=self.convention))
         self._define_statements()
 
     @property
     def uri(self):
         return f"postgresql://{self.user}:{self.password}@{self.host}:{self.port}/{self.path}"
 
+    @property
+    def client(self):
+        """Engine of the current process"""
+        return self.primary.engine
+
+    def connect(self):
+        return self.primary.connect()
+
+    def connect_read(self, primary=False):
+        """
+        Connection for read only statements
+        :param primary: read from primary, e.g. to see own writes which may not be replicated yet
+        """
+        if primary or len(self.replicas) < 1:
+            return self.primary.connect()
+        if self.replica_selection == "least-busy":
+            return min(self.replicas, key=lambda replica: replica.checked_out()).connect()
+        return next(self._replica_cycle).connect()
+
+    @property
+    def engines(self) -> List[pool.LazyEngine]:
+        return [self.primary, *self.replicas]
+
+    def dispose(self):
+        self.primary.dispose()
+        for replica in self.replicas:
+            replica.dispose()
+
+    def pool_stats(self) -> Dict[str, Any]:
+        return {
+            "primary": self.primary.stats(),
+            "replicas": [replica.stats() for replica in self.replicas],
+        }
+
     def execute(self, stm, con=None, **kwargs):
         if con is None:
             con = self.client
@@ -73,6 +118,16 @@ class Storage(object):
     def select_dicts(self, stm, con=None, **kwargs) -> List[Dict[str, Any]]:
         return [dict(row) for row in self.execute(stm, con, **kwargs)]
 
+    def stream_dicts(self, stm, batch_size=1000, primary=False, **kwargs) -> Iterator[Dict[str, Any]]:
+        """
+        Yield rows one by one from a server side cursor
+        Only batch_size rows are held in memory at once, connection is held until the generator is exhausted or closed
+        """
+        with self.connect_read(primary) as con:
+            con = con.execution_options(stream_results=True, max_row_buffer=batch_size)
+            for row in self.execute(stm, con, **kwargs):
+                yield dict(row)
+
     def update(self, stm, con=None, **kwargs):
         cur = self.execute(stm, con, **kwargs)
         return cur.rowcount
@@ -92,270 +147,187 @@ class Storage(object):
         """
         return self.client is not None
 
-    # DB METHODS:
-    def list_candidates(self):
-        with self.client.connect() as con:
-            candidates = self.select_dicts(self.candidates_stm, con)
-            for candidate in candidates:
-                candidate_skills = self.select_dicts(self.candidate_skills_stm, con, candidate_id=candidate["id"])
-                candidate["skills"] = candidate_skills
-        return candidates
-
-    def find_candidate(self, candidate_id):
-        with self.client.connect() as con:
-            try:
-                candidate = self.select_dicts(self.candidates_stm.where(self.candidates.c.id == candidate_id), con)[0]
-                candidate_skills = self.select_dicts(self.candidate_skills_stm, con, candidate_id=candidate["id"])
-                candidate["skills"] = candidate_skills
-            except IndexError:
-                raise j_exc.ForeignKeyViolationError("Candidate does not exist", 404)
-        return candidate
-
-    def list_skills(self):
-        with self.client.connect() as con:
-            data = self.select_dicts(self.skills_stm, con)
-        return data
-
-    def list_jobs(self):
-        with self.client.connect() as con:
-            data = self.select_dicts(self.jobs_stm, con)
-        return data
-
-    def find_job(self, job_id):
-        with self.client.connect() as con:
+    def _run(self, steps: Steps, con):
+        """
+        Execute statements of an operation on con, see StorageBase
+        :return: what the operation returns
+        """
+        result = None
+        while True:
             try:
-                job = self.select_dicts(self.jobs_stm.where(self.jobs.c.id == job_id), con)[0]
-                job_candidates = self.select_dicts(self.job_candidates_stm, con, job_id=job_id)
-                job["candidates"] = job_candidates
-            except IndexError:
-                raise j_exc.ForeignKeyViolationError("Job does not exist", 404)
-        return job
+                stm, params = steps.send(result)
+            except StopIteration as stop:
+                return stop.value
+            result = self.execute(stm, con, **params)
 
-    def insert_job(self, payload: v.jobs.InsertJob):
-        with self.client.connect() as con:
+    def _read(self, steps: Steps, primary=False):
+        with self.connect_read(primary) as con:
+            return self._run(steps, con)
+
+    def _write(self, action: str, operation: Callable[..., Steps], *args,
+               on_integrity_error: Optional[Callable[[], Exception]] = None):
+        """
+        Run a write operation in a transaction, caches of the process are updated once it is committed
+        :param action: what is written, for log messages
+        :param operation: step generator taking Change and args
+        :param on_integrity_error: makes the error raised if a constraint is violated, DatabaseError otherwise
+        :return: what the operation returns
+        """
+        change = Change()
+        with self.connect() as con:
             trans = con.begin()
             try:
-                self.insert(
-                    self.jobs.table.insert().values(asdict(payload)),
-                    con
-                )
+                result = self._run(operation(change, *args), con)
             except exc.SQLAlchemyError as e:
                 trans.rollback()
-                app.logger.warning(f'Insert job error - {e}')
+                self._discard_change(change)
+                app.logger.warning(f'{action} error - {e}')
+                if on_integrity_error is not None and isinstance(e, exc.IntegrityError):
+                    raise on_integrity_error()
                 raise j_exc.DatabaseError
+            except Exception:
+                trans.rollback()
+                self._discard_change(change)
+                raise
             else:
                 trans.commit()
+                self._apply_change(change)
+        return result
 
-    def force_insert_job(self, job_id, payload: v.jobs.InsertJob):
-        with self.client.connect() as con:
-            trans = con.begin()
+    # DB METHODS:
+    def list_candidates(self, limit=None, cursor=None, primary=False, filters=None, projection=None):
+        return self._read(self._list_candidates_steps(limit, cursor, filters, projection), primary)
+
+    def stream_candidates(self, batch_size=1000, primary=False):
+        return self.stream_dicts(self.candidates_skills_stm.order_by(self.candidates.c.id), batch_size, primary)
+
+    def find_candidate(self, candidate_id, primary=False, projection=None):
+        return self._read(self._find_candidate_steps(candidate_id, projection), primary)
+
+    def list_skills(self, limit=None, cursor=None, primary=False):
+        return self._read(self._list_skills_steps(limit, cursor), primary)
+
+    def list_jobs(self, limit=None, cursor=None, primary=False, filters=None, projection=None):
+        return self._read(self._list_jobs_steps(limit, cursor, filters, projection), primary)
+
+    def stream_jobs(self, batch_size=1000, primary=False):
+        return self.stream_dicts(self.jobs_stm.order_by(self.jobs.c.id), batch_size, primary)
+
+    def search_jobs(self, query, limit=None, cursor=None, primary=False, filters=None):
+        """
+        Jobs matching web search style query, most relevant first
+        :param query: words, "quoted phrases", or, -excluded words
+        :return: jobs with rank and highlighted snippet of description, cursor of the next page
+        """
+        return self._read(self._search_jobs_steps(query, limit, cursor, filters), primary)
+
+    def find_job(self, job_id, primary=False, projection=None):
+        return self._read(self._find_job_steps(job_id, projection), primary)
+
+    def match_candidates(self, job_id, min_overlap=1, max_salary=None, limit=100, primary=False):
+        """
+        Candidates sharing most skills with the job, ranked by skill index
+        Index is loaded on first use in every process.
+        :return: candidates with their skills and number of shared skills in overlap, best match first
+        """
+        if not self.skill_index.loaded:
+            self._load_skill_index()
+        return self._read(self._match_candidates_steps(job_id, min_overlap, max_salary, limit), primary)
+
+    def _load_skill_index(self, batch_size=10000):
+        """Build skill index from primary, changes committed meanwhile are applied on top of it"""
+        with self._skill_index_lock:
+            if self.skill_index.loaded:
+                return
+            self.skill_index.start_loading()
+            index = matching.SkillIndex()
             try:
-                found_jobs = self.select_dicts(self.jobs_stm.where(self.jobs.c.id == job_id), con)
-                if len(found_jobs) < 1:
-                    self.insert(
-                        self.jobs.table.insert().values(asdict(payload)),
-                        con
-                    )
-                else:
-                    self.update(
-                        self.update_job_stm,
-                        con,
-                        job_id=job_id,
-                        **asdict(payload)
-                    )
+                rows = self.stream_dicts(self.candidate_salaries_stm, batch_size, primary=True)
+                for batch in iter(lambda: list(itertools.islice(rows, batch_size)), []):
+                    index.add_candidates([(row["id"], row["expected_salary"]) for row in batch])
+                rows = self.stream_dicts(self.skill_links_stm, batch_size, primary=True)
+                for batch in iter(lambda: list(itertools.islice(rows, batch_size)), []):
+                    index.add_links([(row["candidate_id"], row["skill_id"]) for row in batch])
             except exc.SQLAlchemyError as e:
-                trans.rollback()
-                app.logger.warning(f'Force insert job error - {e}')
+                self.skill_index.invalidate()
+                app.logger.warning(f'Load skill index error - {e}')
                 raise j_exc.DatabaseError
-            else:
-                trans.commit()
+            self.skill_index.replace(index)
+
+    def _refresh_skill_index(self, candidate_ids):
+        if not self.skill_index.active:
+            return
+        with self.connect() as con:
+            self._run(self._refresh_skill_index_steps(candidate_ids), con)
+
+    def insert_job(self, payload: v.jobs.InsertJob):
+        self._write('Insert job', self._insert_job_steps, payload)
+
+    def force_insert_job(self, job_id, payload: v.jobs.InsertJob):
+        self._write('Force insert job', self._force_insert_job_steps, job_id, payload)
 
     def delete_job(self, job_id):
-        with self.client.connect() as con:
-            trans = con.begin()
-            try:
-                rowcount = self.delete(
-                    self.jobs.table.delete().where(self.jobs.c.id == job_id).returning(self.jobs.c.id),
-                    con
-                )
-                if rowcount < 1:
-                    trans.rollback()
-                    raise j_exc.ForeignKeyViolationError("Job does not exist", 404)
-            except exc.SQLAlchemyError as e:
-                trans.rollback()
-                app.logger.warning(f'Delete job error - {e}')
-                raise j_exc.DatabaseError
-            else:
-                trans.commit()
+        self._write('Delete job', self._delete_job_steps, job_id)
 
     def insert_candidate(self, payload: v.candidates.InsertCandidate):
-        with self.client.connect() as con:
-            trans = con.begin()
-            try:
-                candidate_dict = asdict(payload)
-                skills = candidate_dict.pop("skills")
-                candidate_id = self.insert(
-                    self.candidates.table.insert().values(**candidate_dict),
-                    con
-                )
-                skill_ids = []
-                for skill_title in skills:
-                    found_skills = self.select_dicts(self.skills_stm.where(self.skills.c.title == skill_title), con)
-                    if len(found_skills) > 0:
-                        skill_id = found_skills[0]["id"]
-                    else:
-                        skill_id = self.insert(self.skills.table.insert().values(title=skill_title), con)
-                    skill_ids.append(skill_id)
-                self.execute(
-                    self.candidates_skills.table.insert().values(
-                        [{"candidate_id": candidate_id, "skill_id": skill_id} for skill_id in skill_ids]
-                    ),
-                    con
-                )
-            except exc.SQLAlchemyError as e:
-                trans.rollback()
-                app.logger.warning(f'Insert candidate error - {e}')
-                raise j_exc.DatabaseError
-            else:
-                trans.commit()
+        self._write('Insert candidate', self._insert_candidate_steps, payload)
 
     def force_insert_candidate(self, candidate_id, payload: v.candidates.InsertCandidate):
-        with self.client.connect() as con:
-            trans = con.begin()
-            try:
-                candidate_dict = asdict(payload)
-                skills = candidate_dict.pop("skills")
-                found_candidates = self.select_dicts(self.candidates_stm.where(self.candidates.c.id == candidate_id), con)
-                if len(found_candidates) < 1:
-                    candidate_id = self.insert(self.candidates.table.insert().values(**candidate_dict), con)
-                else:
-                    self.update(self.update_candidate_stm, con, candidate_id=candidate_id, **candidate_dict)
-
-                skill_ids = []
-                for skill_title in skills:
-                    found_skills = self.select_dicts(self.skills_stm.where(self.skills.c.title == skill_title), con)
-                    if len(found_skills) > 0:
-                        skill_id = found_skills[0]["id"]
-                    else:
-                        skill_id = self.insert(self.skills.table.insert().values(title=skill_title), con)
-                    skill_ids.append(skill_id)
-                self.delete(self.candidates_skills.table.delete().where(
-                    self.candidates_skills.c.candidate_id == candidate_id), con)
-                self.execute(
-                    self.candidates_skills.table.insert().values(
-                        [{"candidate_id": candidate_id, "skill_id": skill_id} for skill_id in skill_ids]
-                    ),
-                    con
-                )
-            except exc.SQLAlchemyError as e:
-                trans.rollback()
-                app.logger.warning(f'Force insert candidate error - {e}')
-                raise j_exc.DatabaseError
-            else:
-                trans.commit()
+        self._write('Force insert candidate', self._force_insert_candidate_steps, candidate_id, payload)
+
+    def bulk_insert_candidates(self, payloads: List[v.candidates.InsertCandidate], chunk_size=1000) -> List[int]:
+        """
+        Insert many candidates in one transaction, see StorageBase._bulk_insert_candidates_steps
+        :return: ids of inserted candidates in order of payloads
+        """
+        return self._write('Bulk insert candidates', self._bulk_insert_candidates_steps, payloads, chunk_size)
+
+    def _find_skill_ids(self, skill_titles, con) -> Dict[str, int]:
+        """Find ids of existing skills by title on con, see StorageBase._find_skill_ids_steps"""
+        return self._run(self._find_skill_ids_steps(skill_titles), con)
+
+    def _resolve_skill_ids(self, skill_titles, con) -> Dict[str, int]:
+        """
+        Find ids of skills by title within a transaction on con, missing skills are created
+        Resolved ids are not cached, see StorageBase._resolve_skill_ids_steps.
+        """
+        return self._run(self._resolve_skill_ids_steps(skill_titles), con)
+
+    def start_change_listener(self):
+        """Start listening to change notifications of other processes, once in every process"""
+        if self.notify_channel is None or (self._listener is not None and self._listener.pid == os.getpid()):
+            return
+        with self._listener_lock:
+            if self._listener is None or self._listener.pid != os.getpid():
+                self._listener = notify.ChangeListener(self.uri, self.notify_channel, self._on_change)
+                self._listener.start()
+
+    def warm_skill_cache(self):
+        """Fill skill cache with existing skills, up to its size"""
+        skills, _ = self.list_skills(limit=self.skill_cache.max_size)
+        self.skill_cache.update({skill["title"]: skill["id"] for skill in skills})
+
+    def warm_skill_cache_once(self):
+        """Warm skill cache on first call in every process"""
+        if self._skill_cache_warm_pid == os.getpid():
+            return
+        with self._listener_lock:
+            if self._skill_cache_warm_pid != os.getpid():
+                self.warm_skill_cache()
+                self._skill_cache_warm_pid = os.getpid()
 
     def delete_candidate(self, candidate_id):
-        with self.client.connect() as con:
-            trans = con.begin()
-            try:
-                found_candidates = self.select_dicts(self.candidates_stm.where(self.candidates.c.id == candidate_id), con)
-                if len(found_candidates) < 1:
-                    trans.rollback()
-                    raise j_exc.ForeignKeyViolationError("Candidate does not exist", 404)
-
-                self.delete(self.candidates_skills.table.delete().where(
-                    self.candidates_skills.c.candidate_id == candidate_id), con)
-                self.delete(
-                    self.candidates.table.delete().where(self.candidates.c.id == candidate_id),
-                    con
-                )
-            except exc.SQLAlchemyError as e:
-                trans.rollback()
-                app.logger.warning(f'Delete candidate error - {e}')
-                raise j_exc.DatabaseError
-            else:
-                trans.commit()
+        self._write('Delete candidate', self._delete_candidate_steps, candidate_id)
 
-    def apply_candidate(self, candidate_id, job_id):
-        with self.client.connect() as con:
-            trans = con.begin()
-            try:
-                found_candidates = self.select_dicts(self.candidates_stm.where(self.candidates.c.id == candidate_id), con)
-                if len(found_candidates) < 1:
-                    raise j_exc.ForeignKeyViolationError("Candidate does not exist", 404)
-                found_jobs = self.select_dicts(self.jobs_stm.where(self.jobs.c.id == job_id), con)
-                if len(found_jobs) < 1:
-                    raise j_exc.ForeignKeyViolationError("Job does not exist", 404)
-                self.execute(
-                    self.jobs_candidates.table.insert().values(
-                        {"job_id": job_id, "candidate_id": candidate_id}
-                    ),
-                    con
-                )
-            except exc.SQLAlchemyError as e:
-                trans.rollback()
-                app.logger.warning(f'Apply candidate error - {e}')
-                if "unique constraint" in e.orig.args[0]:
-                    raise j_exc.UniqueViolationError("Job already has this candidate assigned")
-                else:
-                    raise j_exc.DatabaseError
-            else:
-                trans.commit()
+    def assign_candidates(self, job_id, candidate_ids: List[int]) -> Dict[str, List[int]]:
+        """
+        Assign candidates to a job, see StorageBase._assign_candidates_steps
+        :return: candidate ids by outcome - added, already_assigned, missing
+        :raise ForeignKeyViolationError: if job does not exist
+        """
+        return self._write(
+            'Assign candidates', self._assign_candidates_steps, job_id, candidate_ids,
+            on_integrity_error=lambda: j_exc.ForeignKeyViolationError("Job does not exist", 404))
 
-    # STATEMENT DECLARATIONS
-    def _define_statements(self):
-        # JOINS
-        candidates_skills_join = self.candidates.table. \
-            join(self.candidates_skills.table, self.candidates.c.id == self.candidates_skills.c.candidate_id). \
-            outerjoin(self.skills.table, self.candidates_skills.c.skill_id == self.skills.c.id)
-
-        jobs_candidates_join = self.jobs.table. \
-            join(self.jobs_candidates.table, self.jobs.c.id == self.jobs_candidates.c.job_id). \
-            outerjoin(self.candidates.table, self.jobs_candidates.c.candidate_id == self.candidates.c.id)
-
-        # STATEMENTS
-        self.jobs_stm = select([
-            self.jobs.c.id,
-            self.jobs.c.title,
-            self.jobs.c.salary,
-            self.jobs.c.description,
-        ]).select_from(self.jobs.table)
-
-        self.candidates_stm = select([
-            self.candidates.c.id,
-            self.candidates.c.full_name,
-            self.candidates.c.expected_salary,
-        ]).select_from(self.candidates.table)
-
-        self.skills_stm = select([
-            self.skills.c.id,
-            self.skills.c.title,
-        ]).select_from(self.skills.table)
-
-        self.candidate_skills_stm = select([
-            self.skills.c.id,
-            self.skills.c.title,
-        ]).select_from(candidates_skills_join). \
-            where(self.candidates.c.id == bindparam("candidate_id"))
-
-        self.job_candidates_stm = select([
-            self.candidates.c.id,
-            self.candidates.c.full_name,
-            self.candidates.c.expected_salary,
-        ]).select_from(jobs_candidates_join). \
-            where(self.jobs_candidates.c.job_id == bindparam("job_id"))
-
-        self.update_job_stm = self.jobs.table.update(). \
-            where(self.jobs.c.id == bindparam("job_id")). \
-            values(
-                title=bindparam("title"),
-                salary=bindparam("salary"),
-                description=bindparam("description"),
-        )
-
-        self.update_candidate_stm = self.candidates.table.update(). \
-            where(self.candidates.c.id == bindparam("candidate_id")). \
-            values(
-            full_name=bindparam("full_name"),
-            expected_salary=bindparam("expected_salary"),
-        )
+    def apply_candidate(self, candidate_id, job_id):
+        self._check_application(self.assign_candidates(job_id, [candidate_id]))
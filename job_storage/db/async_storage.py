@@ -0,0 +1,338 @@
+"""
+Storage for asyncio servers, on top of SQLAlchemy asyncio extension and asyncpg
+
+Public methods mirror those of sync Storage and return the same data, they only have to be awaited.
+Both run the operations of StorageBase, only connections, transactions and streaming are their own.
+Schema is not created here, it is left to the sync Storage.
+"""
+import asyncio
+import contextlib
+import itertools
+import json
+import logging
+from typing import List, Dict, Any, Optional, AsyncIterator, Sequence, Callable
+
+import asyncpg
+from sqlalchemy import exc, MetaData
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncConnection, AsyncEngine
+
+from . import cache, matching
+from .base import StorageBase, Change, Steps
+from job_storage import validators as v
+from job_storage import custom_exceptions as j_exc
+
+
+class AsyncStorage(StorageBase):
+    LOG_NAME = "flask.app"
+    DRIVER = "postgresql+asyncpg"
+
+    def __init__(
+            self,
+            user,
+            password,
+            host,
+            port,
+            path,
+            echo=False,
+            pool_size=10,
+            max_overflow=10,
+            pool_timeout=30,
+            pool_pre_ping=False,
+            pool_recycle=1320,
+            isolation_level='read committed'.upper(),
+            query_cache_size=500,
+            prepared_statement_cache_size=100,
+            skill_cache_size=1024,
+            replica_uris: Sequence[str] = (),
+            replica_selection="round-robin",
+            notify_channel: Optional[str] = None,
+    ):
+        self.user = user
+        self.password = password
+        self.host = host
+        self.port = port
+        self.path = path
+        self.skill_cache = cache.LRUCache(skill_cache_size)
+        self.skill_index = matching.SkillIndex()
+        self._skill_index_lock = asyncio.Lock()
+        self.versions = cache.DataVersions()
+        self.notify_channel = notify_channel
+        self._listener_task = None
+        self._tasks = set()
+        self.logger = logging.getLogger(self.LOG_NAME)
+
+        engine_kwargs = dict(
+            echo=echo,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_pre_ping=pool_pre_ping,
+            pool_recycle=pool_recycle,
+            isolation_level=isolation_level,
+            query_cache_size=query_cache_size,
+            # asyncpg prepares every statement on the server, the prepared ones are kept per connection
+            connect_args={"prepared_statement_cache_size": prepared_statement_cache_size})
+        # engines do not connect until first used, so they are bound to the event loop of the server
+        self.primary = create_async_engine(self.uri, **engine_kwargs)
+        self.replicas = [
+            create_async_engine(make_url(uri).set(drivername=self.DRIVER), **engine_kwargs) for uri in replica_uris]
+        if replica_selection not in ("round-robin", "least-busy"):
+            raise ValueError(f"Unknown replica selection {replica_selection}")
+        self.replica_selection = replica_selection
+        self._replica_cycle = itertools.cycle(self.replicas)
+
+        self._define_tables(MetaData(naming_convention=self.convention))
+        self._define_statements()
+
+    @property
+    def uri(self):
+        return f"{self.DRIVER}://{self.user}:{self.password}@{self.host}:{self.port}/{self.path}"
+
+    @property
+    def dsn(self):
+        """URI for plain asyncpg connections"""
+        return f"postgresql://{self.user}:{self.password}@{self.host}:{self.port}/{self.path}"
+
+    def connect(self) -> AsyncConnection:
+        return self.primary.connect()
+
+    def connect_read(self, primary=False) -> AsyncConnection:
+        """
+        Connection for read only statements
+        :param primary: read from primary, e.g. to see own writes which may not be replicated yet
+        """
+        if primary or len(self.replicas) < 1:
+            return self.primary.connect()
+        if self.replica_selection == "least-busy":
+            return min(self.replicas, key=lambda replica: replica.sync_engine.pool.checkedout()).connect()
+        return next(self._replica_cycle).connect()
+
+    @property
+    def engines(self) -> List[AsyncEngine]:
+        return [self.primary, *self.replicas]
+
+    async def dispose(self):
+        await self.stop_change_listener()
+        for engine in self.engines:
+            await engine.dispose()
+
+    def pool_stats(self) -> Dict[str, Any]:
+        def stats(engine: AsyncEngine):
+            pool = engine.sync_engine.pool
+            return {
+                "size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+            }
+        return {
+            "primary": stats(self.primary),
+            "replicas": [stats(replica) for replica in self.replicas],
+        }
+
+    async def execute(self, stm, con: AsyncConnection, **kwargs):
+        return await con.execute(stm, kwargs)
+
+    async def stream_dicts(self, stm, batch_size=1000, primary=False, **kwargs) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield rows one by one from a server side cursor
+        Only batch_size rows are held in memory at once, connection is held until the generator is exhausted or closed
+        """
+        async with self.connect_read(primary) as con:
+            result = await con.stream(stm, kwargs, execution_options={"max_row_buffer": batch_size})
+            async for rows in result.partitions(batch_size):
+                for row in rows:
+                    yield dict(row._mapping)
+
+    async def _run(self, steps: Steps, con: AsyncConnection):
+        """
+        Execute statements of an operation on con, see Storage._run
+        :return: what the operation returns
+        """
+        result = None
+        while True:
+            try:
+                stm, params = steps.send(result)
+            except StopIteration as stop:
+                return stop.value
+            result = await self.execute(stm, con, **params)
+
+    async def _read(self, steps: Steps, primary=False):
+        async with self.connect_read(primary) as con:
+            return await self._run(steps, con)
+
+    async def _write(self, action: str, operation: Callable[..., Steps], *args,
+                     on_integrity_error: Optional[Callable[[], Exception]] = None):
+        """
+        Run a write operation in a transaction, see Storage._write
+        :return: what the operation returns
+        """
+        change = Change()
+        async with self.connect() as con:
+            trans = await con.begin()
+            try:
+                result = await self._run(operation(change, *args), con)
+            except exc.SQLAlchemyError as e:
+                await trans.rollback()
+                self._discard_change(change)
+                self.logger.warning(f'{action} error - {e}')
+                if on_integrity_error is not None and isinstance(e, exc.IntegrityError):
+                    raise on_integrity_error()
+                raise j_exc.DatabaseError
+            except Exception:
+                await trans.rollback()
+                self._discard_change(change)
+                raise
+            else:
+                await trans.commit()
+                self._apply_change(change)
+        return result
+
+    # DB METHODS:
+    async def list_candidates(self, limit=None, cursor=None, primary=False, filters=None, projection=None):
+        return await self._read(self._list_candidates_steps(limit, cursor, filters, projection), primary)
+
+    def stream_candidates(self, batch_size=1000, primary=False):
+        return self.stream_dicts(self.candidates_skills_stm.order_by(self.candidates.c.id), batch_size, primary)
+
+    async def find_candidate(self, candidate_id, primary=False, projection=None):
+        return await self._read(self._find_candidate_steps(candidate_id, projection), primary)
+
+    async def list_skills(self, limit=None, cursor=None, primary=False):
+        return await self._read(self._list_skills_steps(limit, cursor), primary)
+
+    async def list_jobs(self, limit=None, cursor=None, primary=False, filters=None, projection=None):
+        return await self._read(self._list_jobs_steps(limit, cursor, filters, projection), primary)
+
+    def stream_jobs(self, batch_size=1000, primary=False):
+        return self.stream_dicts(self.jobs_stm.order_by(self.jobs.c.id), batch_size, primary)
+
+    async def search_jobs(self, query, limit=None, cursor=None, primary=False, filters=None):
+        """Jobs matching web search style query, see Storage.search_jobs"""
+        return await self._read(self._search_jobs_steps(query, limit, cursor, filters), primary)
+
+    async def find_job(self, job_id, primary=False, projection=None):
+        return await self._read(self._find_job_steps(job_id, projection), primary)
+
+    async def match_candidates(self, job_id, min_overlap=1, max_salary=None, limit=100, primary=False):
+        """
+        Candidates sharing most skills with the job, see Storage.match_candidates
+        """
+        if not self.skill_index.loaded:
+            await self._load_skill_index()
+        return await self._read(self._match_candidates_steps(job_id, min_overlap, max_salary, limit), primary)
+
+    async def _load_skill_index(self, batch_size=10000):
+        """Build skill index from primary, changes committed meanwhile are applied on top of it"""
+        async with self._skill_index_lock:
+            if self.skill_index.loaded:
+                return
+            self.skill_index.start_loading()
+            index = matching.SkillIndex()
+            try:
+                async with self.connect() as con:
+                    result = await con.stream(self.candidate_salaries_stm)
+                    async for batch in result.partitions(batch_size):
+                        index.add_candidates([(row.id, row.expected_salary) for row in batch])
+                    result = await con.stream(self.skill_links_stm)
+                    async for batch in result.partitions(batch_size):
+                        index.add_links([(row.candidate_id, row.skill_id) for row in batch])
+            except exc.SQLAlchemyError as e:
+                self.skill_index.invalidate()
+                self.logger.warning(f'Load skill index error - {e}')
+                raise j_exc.DatabaseError
+            self.skill_index.replace(index)
+
+    def _refresh_skill_index(self, candidate_ids):
+        """Called from change listener, reads changed candidates in a task of its own"""
+        if not self.skill_index.active:
+            return
+        task = asyncio.ensure_future(self._read_into_skill_index(candidate_ids))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _read_into_skill_index(self, candidate_ids):
+        try:
+            async with self.connect() as con:
+                await self._run(self._refresh_skill_index_steps(candidate_ids), con)
+        except exc.SQLAlchemyError as e:
+            self.logger.warning(f'Refresh skill index error - {e}')
+            self.skill_index.invalidate()
+
+    async def start_change_listener(self):
+        """Start listening to change notifications of other processes"""
+        if self.notify_channel is None or self._listener_task is not None:
+            return
+        self._listener_task = asyncio.ensure_future(self._listen())
+
+    async def stop_change_listener(self):
+        if self._listener_task is None:
+            return
+        self._listener_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._listener_task
+        self._listener_task = None
+
+    async def _listen(self, poll_timeout=5.0, reconnect_delay=1.0):
+        """
+        Receive notifications on a connection of its own, outside of the pool
+        Reconnects when the connection is lost, everything is invalidated then as notifications may have been missed.
+        """
+        def notified(connection, pid, channel, payload):
+            self._on_change(json.loads(payload))
+
+        while True:
+            try:
+                con = await asyncpg.connect(self.dsn)
+                try:
+                    await con.add_listener(self.notify_channel, notified)
+                    self._on_change(None)
+                    while not con.is_closed():
+                        await asyncio.sleep(poll_timeout)
+                finally:
+                    await con.close()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.warning(f'Change listener error - {e}')
+            await asyncio.sleep(reconnect_delay)
+
+    async def insert_job(self, payload: v.jobs.InsertJob):
+        await self._write('Insert job', self._insert_job_steps, payload)
+
+    async def force_insert_job(self, job_id, payload: v.jobs.InsertJob):
+        await self._write('Force insert job', self._force_insert_job_steps, job_id, payload)
+
+    async def delete_job(self, job_id):
+        await self._write('Delete job', self._delete_job_steps, job_id)
+
+    async def insert_candidate(self, payload: v.candidates.InsertCandidate):
+        await self._write('Insert candidate', self._insert_candidate_steps, payload)
+
+    async def force_insert_candidate(self, candidate_id, payload: v.candidates.InsertCandidate):
+        await self._write('Force insert candidate', self._force_insert_candidate_steps, candidate_id, payload)
+
+    async def bulk_insert_candidates(self, payloads: List[v.candidates.InsertCandidate], chunk_size=1000) -> List[int]:
+        """
+        Insert many candidates in one transaction, see StorageBase._bulk_insert_candidates_steps
+        :return: ids of inserted candidates in order of payloads
+        """
+        return await self._write('Bulk insert candidates', self._bulk_insert_candidates_steps, payloads, chunk_size)
+
+    async def warm_skill_cache(self):
+        """Fill skill cache with existing skills, up to its size"""
+        skills, _ = await self.list_skills(limit=self.skill_cache.max_size)
+        self.skill_cache.update({skill["title"]: skill["id"] for skill in skills})
+
+    async def delete_candidate(self, candidate_id):
+        await self._write('Delete candidate', self._delete_candidate_steps, candidate_id)
+
+    async def assign_candidates(self, job_id, candidate_ids: List[int]) -> Dict[str, List[int]]:
+        """Assign candidates to a job, see Storage.assign_candidates"""
+        return await self._write(
+            'Assign candidates', self._assign_candidates_steps, job_id, candidate_ids,
+            on_integrity_error=lambda: j_exc.ForeignKeyViolationError("Job does not exist", 404))
+
+    async def apply_candidate(self, candidate_id, job_id):
+        self._check_application(await self.assign_candidates(job_id, [candidate_id]))
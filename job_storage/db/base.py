@@ -0,0 +1,737 @@
+import json
+from dataclasses import asdict, dataclass, field
+from typing import List, Dict, Any, Optional, Tuple, Generator
+
+from sqlalchemy import select, bindparam, func, false, literal_column, all_, any_, cast, Integer, String, MetaData
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert as pg_insert, ARRAY, DOUBLE_PRECISION
+
+from . import tables, paging, cache
+from job_storage import validators as v
+from job_storage import custom_exceptions as j_exc
+
+# operation yielding statements with their parameters, sent back buffered results, see StorageBase
+Steps = Generator[Tuple[Any, Dict[str, Any]], Any, Any]
+
+
+@dataclass
+class Change:
+    """What a write changed, caches of the process are updated by it once the write is committed"""
+    # tables of changed rows, their data versions are bumped
+    tables: List[str] = field(default_factory=list)
+    # skill ids by title resolved by the write, cached once committed, as they may be rolled back
+    skill_ids: Dict[str, int] = field(default_factory=dict)
+    # candidate id, expected salary and skill ids of candidates to be put into skill index
+    indexed: List[Tuple[int, Optional[int], List[int]]] = field(default_factory=list)
+    # ids of candidates to be removed from skill index
+    removed: List[int] = field(default_factory=list)
+
+
+class StorageBase(object):
+    """
+    Tables, statements and operations shared by sync Storage and AsyncStorage
+    Statements are built once, each backend only executes them in its own way. Operations are generators of
+    steps - they yield a statement with its parameters and are sent back its result, buffered, so they read it
+    the same way on both backends. Backends run them on a connection of their own, see Storage._run.
+    """
+    convention = {
+        "ix": 'ix_%(column_0_label)s',
+        "uq": "uq_%(table_name)s_%(column_0_name)s",
+        "ck": "ck_%(table_name)s_%(constraint_name)s",
+        "fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
+        "pk": "pk_%(table_name)s"}
+
+    # notification payload is limited to 8000 bytes
+    NOTIFY_MAX_IDS = 100
+    # statements of distinct field selections kept, see _projection_statement
+    PROJECTION_CACHE_SIZE = 256
+
+    def _define_tables(self, metadata: MetaData):
+        self.metadata = metadata
+        self.candidates = tables.Candidates(self.metadata)
+        self.skills = tables.Skills(self.metadata)
+        self.candidates_skills = tables.CandidatesSkills(self.metadata)
+        self.jobs = tables.Jobs(self.metadata)
+        self.jobs_candidates = tables.JobsCandidates(self.metadata)
+        self.jobs_skills = tables.JobsSkills(self.metadata)
+
+    def _change_payload(self, tables: List[str], ids: Optional[List[int]] = None) -> str:
+        return json.dumps({
+            "origin": self.versions.token,
+            "tables": tables,
+            "ids": ids if ids is not None and len(ids) <= self.NOTIFY_MAX_IDS else None,
+        })
+
+    def _on_change(self, change: Optional[Dict[str, Any]]):
+        """
+        Handle change notification of another process
+        :param change: notification payload, None if notifications may have been missed
+        """
+        if change is None:
+            self.versions.bump(*self.metadata.tables)
+            self.skill_index.invalidate()
+        elif change["origin"] != self.versions.token:
+            self.versions.bump(*change["tables"])
+            if self.candidates.name not in change["tables"]:
+                return
+            if change["ids"] is None:
+                self.skill_index.invalidate()
+            else:
+                self._refresh_skill_index(change["ids"])
+
+    def _refresh_skill_index(self, candidate_ids: List[int]):
+        """Read changed candidates into skill index, implemented by backends"""
+        raise NotImplementedError
+
+    def _update_skill_index(self, candidate_ids: List[int], salary_rows, link_rows):
+        """
+        Put candidates read by candidate_salaries_by_ids_stm and skill_links_by_ids_stm into skill index
+        Candidates which were not found are removed from it.
+        """
+        skill_ids = {}
+        for row in link_rows:
+            skill_ids.setdefault(row.candidate_id, []).append(row.skill_id)
+        salaries = {row.id: row.expected_salary for row in salary_rows}
+        self.skill_index.set_candidates(
+            (candidate_id, salary, skill_ids.get(candidate_id, [])) for candidate_id, salary in salaries.items())
+        self.skill_index.remove_candidates(
+            candidate_id for candidate_id in candidate_ids if candidate_id not in salaries)
+
+    def _apply_change(self, change: Change):
+        """Update caches of the process once a write is committed"""
+        self.versions.bump(*change.tables)
+        self.skill_cache.update(change.skill_ids)
+        if len(change.indexed) > 0:
+            self.skill_index.set_candidates(change.indexed)
+        if len(change.removed) > 0:
+            self.skill_index.remove_candidates(change.removed)
+
+    def _discard_change(self, change: Change):
+        """Forget skill ids resolved by a write which was rolled back"""
+        self.skill_cache.invalidate(change.skill_ids)
+
+    # STEPS
+    def _select_steps(self, stm, **params) -> Steps:
+        result = yield stm, params
+        return result.fetchall()
+
+    def _select_dicts_steps(self, stm, **params) -> Steps:
+        result = yield stm, params
+        return [dict(row._mapping) for row in result]
+
+    def _select_page_steps(self, stm, key, limit: Optional[int] = None, cursor: Optional[str] = None,
+                           **params) -> Steps:
+        """
+        Select one page of rows using keyset pagination
+        :param stm: select statement
+        :param key: unique integer column rows are ordered and paged by
+        :param limit: max number of returned rows, all rows if None
+        :param cursor: cursor returned along with the previous page, first page if None
+        :return: rows, cursor of the next page or None if there are no more rows
+        """
+        rows = yield from self._select_dicts_steps(paging.page_statement(stm, key, limit, cursor), **params)
+        return paging.split_page(rows, key, limit)
+
+    def _find_skill_ids_steps(self, skill_titles) -> Steps:
+        """
+        Find ids of existing skills by title, served from skill cache where possible
+        Found ids are committed, so they are cached right away.
+        :return: skill id by title, titles of missing skills are left out
+        """
+        skill_titles = list(dict.fromkeys(skill_titles))
+        skill_ids = self.skill_cache.get_many(skill_titles)
+        missing_titles = [title for title in skill_titles if title not in skill_ids]
+        if len(missing_titles) > 0:
+            rows = yield from self._select_steps(self.skills_by_titles_stm, titles=missing_titles)
+            found = {row.title: row.id for row in rows}
+            self.skill_cache.update(found)
+            skill_ids.update(found)
+        return skill_ids
+
+    def _resolve_skill_ids_steps(self, skill_titles) -> Steps:
+        """
+        Find ids of skills by title, missing skills are created
+        Cached titles are served from skill cache, the rest is resolved in one batch -
+        one insert of all titles skipping existing ones plus one lookup of those that were skipped.
+        Resolved ids are not cached here as they may be rolled back, they are cached by Change once committed.
+        :return: skill id by title, in order of given titles
+        """
+        skill_titles = list(dict.fromkeys(skill_titles))
+        skill_ids = self.skill_cache.get_many(skill_titles)
+        missing_titles = sorted(title for title in skill_titles if title not in skill_ids)
+        if len(missing_titles) > 0:
+            rows = yield from self._select_steps(self.insert_skills_stm, titles=missing_titles)
+            skill_ids.update((row.title, row.id) for row in rows)
+            existing_titles = [title for title in missing_titles if title not in skill_ids]
+            if len(existing_titles) > 0:
+                rows = yield from self._select_steps(self.skills_by_titles_stm, titles=existing_titles)
+                skill_ids.update((row.title, row.id) for row in rows)
+        return {title: skill_ids[title] for title in skill_titles}
+
+    def _publish_change_steps(self, change: Change, tables: List[str], ids: Optional[List[int]] = None) -> Steps:
+        """
+        Record changed tables and tell other processes about them so they can drop data cached from them
+        Must run within the transaction of the change, notification is delivered once it is committed.
+        :param tables: changed tables
+        :param ids: ids of changed rows, omitted if there are too many
+        """
+        change.tables.extend(tables)
+        if self.notify_channel is not None:
+            yield self.notify_stm, {"channel": self.notify_channel, "payload": self._change_payload(tables, ids)}
+
+    def _refresh_skill_index_steps(self, candidate_ids: List[int]) -> Steps:
+        salary_rows = yield from self._select_steps(self.candidate_salaries_by_ids_stm, candidate_ids=candidate_ids)
+        link_rows = yield from self._select_steps(self.skill_links_by_ids_stm, candidate_ids=candidate_ids)
+        self._update_skill_index(candidate_ids, salary_rows, link_rows)
+
+    # READS
+    def _list_candidates_steps(self, limit, cursor, filters, projection) -> Steps:
+        stm = self._projection_statement(self.candidates_skills_stm, projection, ("skills",))
+        skill_ids = None
+        if filters is not None:
+            skill_ids = yield from self._find_skill_ids_steps(filters.skill)
+        stm = self._filter_candidates(stm, filters, skill_ids)
+        return (yield from self._select_page_steps(stm, self.candidates.c.id, limit, cursor))
+
+    def _find_candidate_steps(self, candidate_id, projection) -> Steps:
+        stm = self._projection_statement(self.candidate_detail_stm, projection, ("skills",), by_id=True)
+        rows = yield from self._select_dicts_steps(stm, candidate_id=candidate_id)
+        if len(rows) < 1:
+            raise j_exc.ForeignKeyViolationError("Candidate does not exist", 404)
+        return rows[0]
+
+    def _list_skills_steps(self, limit, cursor) -> Steps:
+        return (yield from self._select_page_steps(self.skills_stm, self.skills.c.id, limit, cursor))
+
+    def _list_jobs_steps(self, limit, cursor, filters, projection) -> Steps:
+        stm = self._filter_jobs(self._projection_statement(self.jobs_stm, projection), filters)
+        return (yield from self._select_page_steps(stm, self.jobs.c.id, limit, cursor))
+
+    def _search_jobs_steps(self, query, limit, cursor, filters) -> Steps:
+        rows = yield from self._select_dicts_steps(self._search_jobs_statement(filters, limit, cursor), q=query)
+        return paging.split_ranked_page(rows, "rank", self.jobs.c.id.name, limit)
+
+    def _find_job_steps(self, job_id, projection) -> Steps:
+        stm = self._projection_statement(self.job_detail_stm, projection, ("skills", "candidates"), by_id=True)
+        rows = yield from self._select_dicts_steps(stm, job_id=job_id)
+        if len(rows) < 1:
+            raise j_exc.ForeignKeyViolationError("Job does not exist", 404)
+        return rows[0]
+
+    def _match_candidates_steps(self, job_id, min_overlap, max_salary, limit) -> Steps:
+        """Candidates ranked by skill index, which has to be loaded before"""
+        rows = yield from self._select_steps(self.job_skill_ids_stm, job_id=job_id)
+        if len(rows) < 1:
+            raise j_exc.ForeignKeyViolationError("Job does not exist", 404)
+        matches = self.skill_index.match(
+            [row.skill_id for row in rows if row.skill_id is not None], min_overlap, max_salary, limit)
+        if len(matches) < 1:
+            return []
+        rows = yield from self._select_dicts_steps(
+            self.candidates_by_ids_stm, candidate_ids=[candidate_id for candidate_id, _ in matches])
+        candidates = {row["id"]: row for row in rows}
+        return [
+            {**candidates[candidate_id], "overlap": overlap}
+            for candidate_id, overlap in matches if candidate_id in candidates
+        ]
+
+    # WRITES
+    def _insert_job_steps(self, change: Change, payload: v.jobs.InsertJob) -> Steps:
+        job_dict = asdict(payload)
+        skills = job_dict.pop("skills") or []
+        job_id = (yield self.insert_job_stm, job_dict).inserted_primary_key[0]
+        change.skill_ids = yield from self._resolve_skill_ids_steps(skills)
+        yield self.insert_job_skill_links_stm, {"job_id": job_id, "skill_ids": list(change.skill_ids.values())}
+        yield from self._publish_change_steps(
+            change, [self.jobs.name, self.jobs_skills.name, self.skills.name], [job_id])
+
+    def _force_insert_job_steps(self, change: Change, job_id, payload: v.jobs.InsertJob) -> Steps:
+        job_dict = asdict(payload)
+        skills = job_dict.pop("skills") or []
+        rows = yield from self._select_steps(self.upsert_job_stm, job_id=job_id, **job_dict)
+        job_id = rows[0].id
+
+        change.skill_ids = yield from self._resolve_skill_ids_steps(skills)
+        skill_ids = list(change.skill_ids.values())
+        yield self.delete_job_skill_links_stm, {"job_id": job_id, "skill_ids": skill_ids}
+        yield self.insert_job_skill_links_stm, {"job_id": job_id, "skill_ids": skill_ids}
+        yield from self._publish_change_steps(
+            change, [self.jobs.name, self.jobs_skills.name, self.skills.name], [job_id])
+
+    def _delete_job_steps(self, change: Change, job_id) -> Steps:
+        yield self.delete_job_skills_stm, {"job_id": job_id}
+        if (yield self.delete_job_stm, {"job_id": job_id}).rowcount < 1:
+            raise j_exc.ForeignKeyViolationError("Job does not exist", 404)
+        yield from self._publish_change_steps(change, [self.jobs.name, self.jobs_skills.name], [job_id])
+
+    def _insert_candidate_steps(self, change: Change, payload: v.candidates.InsertCandidate) -> Steps:
+        candidate_dict = asdict(payload)
+        skills = candidate_dict.pop("skills") or []
+        candidate_id = (yield self.insert_candidate_stm, candidate_dict).inserted_primary_key[0]
+        change.skill_ids = yield from self._resolve_skill_ids_steps(skills)
+        skill_ids = list(change.skill_ids.values())
+        yield self.insert_skill_links_stm, {"candidate_id": candidate_id, "skill_ids": skill_ids}
+        yield from self._publish_change_steps(
+            change, [self.candidates.name, self.candidates_skills.name, self.skills.name], [candidate_id])
+        change.indexed.append((candidate_id, payload.expected_salary, skill_ids))
+
+    def _force_insert_candidate_steps(
+            self, change: Change, candidate_id, payload: v.candidates.InsertCandidate) -> Steps:
+        candidate_dict = asdict(payload)
+        skills = candidate_dict.pop("skills") or []
+        rows = yield from self._select_steps(self.upsert_candidate_stm, candidate_id=candidate_id, **candidate_dict)
+        candidate_id = rows[0].id
+
+        change.skill_ids = yield from self._resolve_skill_ids_steps(skills)
+        skill_ids = list(change.skill_ids.values())
+        yield self.delete_skill_links_stm, {"candidate_id": candidate_id, "skill_ids": skill_ids}
+        yield self.insert_skill_links_stm, {"candidate_id": candidate_id, "skill_ids": skill_ids}
+        yield from self._publish_change_steps(
+            change, [self.candidates.name, self.candidates_skills.name, self.skills.name], [candidate_id])
+        change.indexed.append((candidate_id, payload.expected_salary, skill_ids))
+
+    def _bulk_insert_candidates_steps(
+            self, change: Change, payloads: List[v.candidates.InsertCandidate], chunk_size: int) -> Steps:
+        """
+        Insert many candidates at once
+        Skills of all candidates are resolved at once, rows are written by multi-row inserts of chunk_size rows
+        :return: ids of inserted candidates in order of payloads
+        """
+        change.skill_ids = yield from self._resolve_skill_ids_steps(
+            [skill_title for payload in payloads for skill_title in payload.skills or []])
+        rows = yield from self._select_steps(self.next_candidate_ids_stm, count=len(payloads))
+        candidate_ids = [row.id for row in rows]
+        candidate_rows = []
+        link_rows = []
+        for candidate_id, payload in zip(candidate_ids, payloads):
+            candidate_rows.append(
+                {"id": candidate_id, "full_name": payload.full_name, "expected_salary": payload.expected_salary})
+            skill_ids = [change.skill_ids[skill_title] for skill_title in dict.fromkeys(payload.skills or [])]
+            link_rows.extend({"candidate_id": candidate_id, "skill_id": skill_id} for skill_id in skill_ids)
+            change.indexed.append((candidate_id, payload.expected_salary, skill_ids))
+        for start in range(0, len(candidate_rows), chunk_size):
+            yield self.candidates.table.insert().values(candidate_rows[start:start + chunk_size]), {}
+        for start in range(0, len(link_rows), chunk_size):
+            yield self.candidates_skills.table.insert().values(link_rows[start:start + chunk_size]), {}
+        yield from self._publish_change_steps(
+            change, [self.candidates.name, self.candidates_skills.name, self.skills.name], candidate_ids)
+        return candidate_ids
+
+    def _delete_candidate_steps(self, change: Change, candidate_id) -> Steps:
+        yield self.delete_candidate_skills_stm, {"candidate_id": candidate_id}
+        if (yield self.delete_candidate_stm, {"candidate_id": candidate_id}).rowcount < 1:
+            raise j_exc.ForeignKeyViolationError("Candidate does not exist", 404)
+        yield from self._publish_change_steps(
+            change, [self.candidates.name, self.candidates_skills.name], [candidate_id])
+        change.removed.append(candidate_id)
+
+    def _assign_candidates_steps(self, change: Change, job_id, candidate_ids: List[int]) -> Steps:
+        """
+        Assign candidates to a job by one statement, ids of missing or already assigned candidates are skipped
+        :return: candidate ids by outcome - added, already_assigned, missing
+        :raise ForeignKeyViolationError: if job does not exist
+        """
+        rows = yield from self._select_steps(
+            self.assign_candidates_stm, job_id=job_id, candidate_ids=list(candidate_ids))
+        if len(rows) > 0 and not rows[0].job_found:
+            raise j_exc.ForeignKeyViolationError("Job does not exist", 404)
+        outcome = self._assignment_outcome(candidate_ids, rows)
+        if len(outcome["added"]) > 0:
+            yield from self._publish_change_steps(change, [self.jobs_candidates.name], [job_id])
+        return outcome
+
+    @staticmethod
+    def _check_application(outcome: Dict[str, List[int]]):
+        """Raise if the only candidate of assign_candidates was not assigned"""
+        if len(outcome["missing"]) > 0:
+            raise j_exc.ForeignKeyViolationError("Candidate does not exist", 404)
+        if len(outcome["already_assigned"]) > 0:
+            raise j_exc.UniqueViolationError("Job already has this candidate assigned")
+
+    # FILTERS
+    def _filter_jobs(self, stm, filters: Optional[v.jobs.JobFilters]):
+        """Compose job filters onto a statement selecting from jobs"""
+        if filters is None:
+            return stm
+        if filters.salary_min is not None:
+            stm = stm.where(self.jobs.c.salary >= filters.salary_min)
+        if filters.salary_max is not None:
+            stm = stm.where(self.jobs.c.salary <= filters.salary_max)
+        if filters.title_prefix is not None:
+            # pattern is passed whole, so the planner sees its constant prefix and can scan the pattern index
+            escaped = filters.title_prefix.replace("/", "//").replace("%", "/%").replace("_", "/_")
+            stm = stm.where(self.jobs.c.title.like(f"{escaped}%", escape="/"))
+        return stm
+
+    def _filter_candidates(
+            self, stm, filters: Optional[v.candidates.CandidateFilters], skill_ids: Optional[Dict[str, int]] = None):
+        """
+        Compose candidate filters onto a statement selecting from candidates
+        :param skill_ids: id by title of existing skills of the skill filter, ids are filtered instead of titles,
+        so the planner estimates the number of candidates of every skill from statistics of candidates_skills
+        """
+        if filters is None:
+            return stm
+        if filters.expected_salary_max is not None:
+            stm = stm.where(self.candidates.c.expected_salary <= filters.expected_salary_max)
+        if len(filters.skill) > 0:
+            titles = list(dict.fromkeys(filters.skill))
+            found_ids = [skill_ids[title] for title in titles if title in (skill_ids or {})]
+            if len(found_ids) == 0 or (filters.skill_match == "all" and len(found_ids) < len(titles)):
+                return stm.where(false())
+            # aliased, so the subquery is not correlated to candidates_skills joined by the enclosing statement
+            links = self.candidates_skills.table.alias("filter_links")
+            with_skills = select([links.c.candidate_id]).where(links.c.skill_id.in_(found_ids))
+            if filters.skill_match == "all":
+                with_skills = with_skills.group_by(links.c.candidate_id).having(func.count() == len(found_ids))
+            stm = stm.where(self.candidates.c.id.in_(with_skills))
+        return stm
+
+    # ASSIGNMENT
+    @staticmethod
+    def _assignment_outcome(candidate_ids: List[int], rows) -> Dict[str, List[int]]:
+        """
+        Sort requested candidates by outcome of assign_candidates_stm
+        :return: candidate ids by outcome, in requested order without duplicates
+        """
+        outcome = {
+            row.candidate_id: "added" if row.added else "already_assigned" if row.found else "missing" for row in rows}
+        result = {"added": [], "already_assigned": [], "missing": []}
+        for candidate_id in dict.fromkeys(candidate_ids):
+            result[outcome[candidate_id]].append(candidate_id)
+        return result
+
+    # SEARCH
+    # snippets are cut from descriptions around matches, matched words are wrapped in mark tags
+    HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxWords=35, MinWords=15, MaxFragments=2"
+
+    def _search_jobs_statement(
+            self, filters: Optional[v.jobs.JobFilters] = None, limit: Optional[int] = None, cursor: Optional[str] = None):
+        """
+        One page of jobs matching web search query bound as q, best ranked first, with highlighted snippet
+        Matches are found by the GIN index of search_vector, snippets are made for rows of the page only,
+        as ts_headline parses the whole description.
+        """
+        query = func.websearch_to_tsquery(literal_column(f"'{tables.Jobs.SEARCH_CONFIG}'"), bindparam("q", type_=String))
+        # ts_rank returns real, as double precision it round trips exactly through JSON of cursors
+        rank = cast(func.ts_rank(self.jobs.c.search_vector, query), DOUBLE_PRECISION)
+        matches = select([
+            self.jobs.c.id,
+            self.jobs.c.title,
+            self.jobs.c.salary,
+            self.jobs.c.description,
+            rank.label("rank"),
+        ]).select_from(self.jobs.table).where(self.jobs.c.search_vector.op("@@")(query))
+        matches = paging.page_ranked_statement(
+            self._filter_jobs(matches, filters), rank, self.jobs.c.id, limit, cursor).subquery("matches")
+        return select([
+            *matches.c,
+            func.ts_headline(
+                literal_column(f"'{tables.Jobs.SEARCH_CONFIG}'"),
+                func.coalesce(matches.c.description, ""),
+                query,
+                self.HEADLINE_OPTIONS,
+            ).label("snippet"),
+        ]).order_by(matches.c.rank.desc(), matches.c.id)
+
+    # PROJECTIONS
+    def _projection_statement(
+            self,
+            default_stm,
+            projection: Optional[v.projection.Projection],
+            default_expand=(),
+            by_id=False):
+        """
+        Statement responding with fields and relations asked for by projection
+        Statements are built once per selection, by_id ones select one row by parameter <resource>_id.
+        :param default_stm: statement of the endpoint, returned if the client did not ask for other fields
+        :param default_expand: relations embedded by default_stm
+        """
+        if projection is None or not projection.requested:
+            return default_stm
+        key = (projection.resource, projection.selection(default_expand), by_id)
+        stm = self._projection_statements.get_many([key]).get(key)
+        if stm is None:
+            resource, selection, _ = key
+            table = self._projection_tables[resource]
+            stm = select(self._projected_columns(resource, selection)).select_from(table.table)
+            if by_id:
+                stm = stm.where(table.c.id == bindparam(f"{resource}_id"))
+            self._projection_statements.update({key: stm})
+        return stm
+
+    def _projected_columns(self, resource: str, selection: v.projection.Selection):
+        """
+        Selected columns of resource, relations as JSON arrays of their objects
+        Relations are correlated subqueries rather than joins of the enclosing statement, so they nest and only
+        tables of selected relations are read.
+        """
+        table = self._projection_tables[resource]
+        columns = []
+        for name, nested in selection:
+            if nested is None:
+                columns.append(table.c[name])
+                continue
+            links, owner_column, target_column, target = self._projection_relations[resource, name]
+            target_table = self._projection_tables[target]
+            objects = select([
+                self._json_agg(self._projected_columns(target, nested), target_table.c.id),
+            ]).select_from(links.table.join(target_table.table, target_column == target_table.c.id)). \
+                where(owner_column == table.c.id). \
+                scalar_subquery()
+            columns.append(objects.label(name))
+        return columns
+
+    # STATEMENT DECLARATIONS
+    @staticmethod
+    def _json_agg(columns, order_by):
+        """
+        Aggregate joined rows into a JSON array of objects, NULL rows of an outer join are skipped
+        :param columns: columns to be placed into every object, keyed by column name
+        :param order_by: column defining order of objects in array
+        :return: column expression, empty JSON array if there is nothing to aggregate
+        """
+        # keys are rendered inline, as untyped parameters they could not be prepared by asyncpg
+        json_object = func.json_build_object(
+            *[arg for column in columns for arg in (literal_column(f"'{column.name}'"), column)])
+        return func.coalesce(
+            func.json_agg(aggregate_order_by(json_object, order_by)).filter(order_by.isnot(None)),
+            literal_column("'[]'::json")
+        )
+
+    def _define_statements(self):
+        """
+        Statements of the app, built once with values as parameters
+        Requests execute these as they are instead of composing a new statement each time, so SQLAlchemy finds
+        them compiled in the compiled cache of the engine and asyncpg in its prepared statement cache.
+        Lists are bound as arrays rather than expanded, so the SQL is the same for any number of values.
+        """
+        # JOINS
+        candidates_skills_join = self.candidates.table. \
+            outerjoin(self.candidates_skills.table, self.candidates.c.id == self.candidates_skills.c.candidate_id). \
+            outerjoin(self.skills.table, self.candidates_skills.c.skill_id == self.skills.c.id)
+
+        jobs_skills_join = self.jobs_skills.table. \
+            join(self.skills.table, self.jobs_skills.c.skill_id == self.skills.c.id)
+
+        jobs_candidates_join = self.jobs.table. \
+            outerjoin(self.jobs_candidates.table, self.jobs.c.id == self.jobs_candidates.c.job_id). \
+            outerjoin(self.candidates.table, self.jobs_candidates.c.candidate_id == self.candidates.c.id)
+
+        # STATEMENTS
+        self.jobs_stm = select([
+            self.jobs.c.id,
+            self.jobs.c.title,
+            self.jobs.c.salary,
+            self.jobs.c.description,
+        ]).select_from(self.jobs.table)
+
+        self.candidates_stm = select([
+            self.candidates.c.id,
+            self.candidates.c.full_name,
+            self.candidates.c.expected_salary,
+        ]).select_from(self.candidates.table)
+
+        self.skills_stm = select([
+            self.skills.c.id,
+            self.skills.c.title,
+        ]).select_from(self.skills.table)
+
+        # candidates with their skills embedded, one row per candidate
+        self.candidates_skills_stm = select([
+            self.candidates.c.id,
+            self.candidates.c.full_name,
+            self.candidates.c.expected_salary,
+            self._json_agg([self.skills.c.id, self.skills.c.title], self.skills.c.id).label("skills"),
+        ]).select_from(candidates_skills_join). \
+            group_by(self.candidates.c.id)
+
+        self.candidate_detail_stm = self.candidates_skills_stm. \
+            where(self.candidates.c.id == bindparam("candidate_id"))
+
+        self.candidates_by_ids_stm = self.candidates_skills_stm. \
+            where(self.candidates.c.id.in_(bindparam("candidate_ids", expanding=True)))
+
+        # skills of the job in the enclosing statement
+        job_skills = select([
+            self._json_agg([self.skills.c.id, self.skills.c.title], self.skills.c.id),
+        ]).select_from(jobs_skills_join). \
+            where(self.jobs_skills.c.job_id == self.jobs.c.id). \
+            scalar_subquery()
+
+        # job with its skills and candidates embedded, one row per job
+        self.job_detail_stm = select([
+            self.jobs.c.id,
+            self.jobs.c.title,
+            self.jobs.c.salary,
+            self.jobs.c.description,
+            job_skills.label("skills"),
+            self._json_agg(
+                [self.candidates.c.id, self.candidates.c.full_name, self.candidates.c.expected_salary],
+                self.candidates.c.id
+            ).label("candidates"),
+        ]).select_from(jobs_candidates_join). \
+            where(self.jobs.c.id == bindparam("job_id")). \
+            group_by(self.jobs.c.id)
+
+        # skill ids of a job, one row with NULL skill if the job has none, no row if it does not exist
+        self.job_skill_ids_stm = select([
+            self.jobs.c.id,
+            self.jobs_skills.c.skill_id,
+        ]).select_from(self.jobs.table.outerjoin(self.jobs_skills.table)). \
+            where(self.jobs.c.id == bindparam("job_id"))
+
+        # rows the skill index is built from
+        self.candidate_salaries_stm = select([
+            self.candidates.c.id,
+            self.candidates.c.expected_salary,
+        ]).select_from(self.candidates.table)
+
+        self.skill_links_stm = select([
+            self.candidates_skills.c.candidate_id,
+            self.candidates_skills.c.skill_id,
+        ]).select_from(self.candidates_skills.table)
+
+        self.candidate_salaries_by_ids_stm = self.candidate_salaries_stm. \
+            where(self.candidates.c.id.in_(bindparam("candidate_ids", expanding=True)))
+
+        self.skill_links_by_ids_stm = self.skill_links_stm. \
+            where(self.candidates_skills.c.candidate_id.in_(bindparam("candidate_ids", expanding=True)))
+
+        self.next_candidate_ids_stm = select([
+            func.nextval(f"{self.candidates.name}_id_seq").label("id"),
+        ]).select_from(func.generate_series(1, bindparam("count")))
+
+        # candidates are joined to report missing ones instead of failing the whole batch on foreign key,
+        # the job foreign key still guards against a job deleted meanwhile
+        requested = select([
+            func.unnest(cast(bindparam("candidate_ids"), ARRAY(Integer))).label("candidate_id"),
+        ]).distinct().cte("requested")
+        job_found = select([self.jobs.c.id]).where(self.jobs.c.id == cast(bindparam("job_id"), Integer)).exists()
+        assignment_columns = [self.jobs_candidates.c.job_id, self.jobs_candidates.c.candidate_id]
+        inserted = pg_insert(self.jobs_candidates.table).from_select(
+            assignment_columns,
+            select([cast(bindparam("job_id"), Integer), requested.c.candidate_id]). \
+            select_from(requested.join(self.candidates.table, self.candidates.c.id == requested.c.candidate_id)). \
+            where(job_found)
+        ). \
+            on_conflict_do_nothing(index_elements=assignment_columns). \
+            returning(self.jobs_candidates.c.candidate_id). \
+            cte("inserted")
+        assigned_join = requested. \
+            outerjoin(inserted, inserted.c.candidate_id == requested.c.candidate_id). \
+            outerjoin(self.candidates.table, self.candidates.c.id == requested.c.candidate_id)
+        self.assign_candidates_stm = select([
+            requested.c.candidate_id,
+            inserted.c.candidate_id.isnot(None).label("added"),
+            self.candidates.c.id.isnot(None).label("found"),
+            job_found.label("job_found"),
+        ]).select_from(assigned_join)
+
+        self.notify_stm = select([func.pg_notify(bindparam("channel"), bindparam("payload"))])
+
+        self.skills_by_titles_stm = self.skills_stm. \
+            where(self.skills.c.title == any_(cast(bindparam("titles"), ARRAY(String))))
+
+        # titles are inserted in given order, existing ones are skipped and not returned
+        self.insert_skills_stm = pg_insert(self.skills.table).from_select(
+            [self.skills.c.title],
+            select([func.unnest(cast(bindparam("titles"), ARRAY(String)))])
+        ). \
+            on_conflict_do_nothing(index_elements=[self.skills.c.title]). \
+            returning(self.skills.c.id, self.skills.c.title)
+
+        # inserts take column values as parameters of the same names
+        self.insert_job_stm = self.jobs.table.insert()
+        self.insert_candidate_stm = self.candidates.table.insert()
+
+        # deletes return ids, no row tells the job or candidate did not exist
+        self.delete_job_stm = self.jobs.table.delete(). \
+            where(self.jobs.c.id == bindparam("job_id")). \
+            returning(self.jobs.c.id)
+        self.delete_job_skills_stm = self.jobs_skills.table.delete(). \
+            where(self.jobs_skills.c.job_id == bindparam("job_id"))
+        self.delete_candidate_stm = self.candidates.table.delete(). \
+            where(self.candidates.c.id == bindparam("candidate_id")). \
+            returning(self.candidates.c.id)
+        self.delete_candidate_skills_stm = self.candidates_skills.table.delete(). \
+            where(self.candidates_skills.c.candidate_id == bindparam("candidate_id"))
+
+        # upserts keep id of an existing row and take a new one from sequence otherwise
+        upsert_job_stm = pg_insert(self.jobs.table).from_select(
+            [self.jobs.c.id, self.jobs.c.title, self.jobs.c.salary, self.jobs.c.description],
+            select([
+                func.coalesce(
+                    select([self.jobs.c.id]).where(self.jobs.c.id == bindparam("job_id")).scalar_subquery(),
+                    func.nextval(f"{self.jobs.name}_id_seq"),
+                ),
+                bindparam("title"),
+                bindparam("salary"),
+                bindparam("description"),
+            ])
+        )
+        self.upsert_job_stm = upsert_job_stm.on_conflict_do_update(
+            index_elements=[self.jobs.c.id],
+            set_={
+                "title": upsert_job_stm.excluded.title,
+                "salary": upsert_job_stm.excluded.salary,
+                "description": upsert_job_stm.excluded.description,
+            }
+        ).returning(self.jobs.c.id)
+
+        upsert_candidate_stm = pg_insert(self.candidates.table).from_select(
+            [self.candidates.c.id, self.candidates.c.full_name, self.candidates.c.expected_salary],
+            select([
+                func.coalesce(
+                    select([self.candidates.c.id]). \
+                        where(self.candidates.c.id == bindparam("candidate_id")). \
+                        scalar_subquery(),
+                    func.nextval(f"{self.candidates.name}_id_seq"),
+                ),
+                bindparam("full_name"),
+                bindparam("expected_salary"),
+            ])
+        )
+        self.upsert_candidate_stm = upsert_candidate_stm.on_conflict_do_update(
+            index_elements=[self.candidates.c.id],
+            set_={
+                "full_name": upsert_candidate_stm.excluded.full_name,
+                "expected_salary": upsert_candidate_stm.excluded.expected_salary,
+            }
+        ).returning(self.candidates.c.id)
+
+        # tables of resources of v.projection.RESOURCES, and link table, its columns and target of every relation
+        self._projection_tables = {"job": self.jobs, "candidate": self.candidates, "skill": self.skills}
+        self._projection_relations = {
+            ("job", "skills"): (self.jobs_skills, self.jobs_skills.c.job_id, self.jobs_skills.c.skill_id, "skill"),
+            ("job", "candidates"): (
+                self.jobs_candidates, self.jobs_candidates.c.job_id, self.jobs_candidates.c.candidate_id, "candidate"),
+            ("candidate", "skills"): (
+                self.candidates_skills, self.candidates_skills.c.candidate_id, self.candidates_skills.c.skill_id,
+                "skill"),
+        }
+        self._projection_statements = cache.LRUCache(self.PROJECTION_CACHE_SIZE)
+
+        self.insert_skill_links_stm, self.delete_skill_links_stm = self._skill_link_statements(
+            self.candidates_skills, self.candidates_skills.c.candidate_id)
+        self.insert_job_skill_links_stm, self.delete_job_skill_links_stm = self._skill_link_statements(
+            self.jobs_skills, self.jobs_skills.c.job_id)
+
+    @staticmethod
+    def _skill_link_statements(links: tables.BaseTable, owner_column):
+        """
+        Statements replacing skills of one candidate or job, parameters are owner_column name and skill_ids
+        Insert adds links to skill_ids, existing links are kept untouched. Delete drops links to skills not in skill_ids.
+        Parameters are cast explicitly as asyncpg needs to know their types upfront.
+        """
+        insert_stm = pg_insert(links.table).from_select(
+            [owner_column, links.c.skill_id],
+            select([
+                cast(bindparam(owner_column.name), Integer),
+                func.unnest(cast(bindparam("skill_ids"), ARRAY(Integer))),
+            ])
+        ).on_conflict_do_nothing()
+
+        delete_stm = links.table.delete(). \
+            where(owner_column == bindparam(owner_column.name)). \
+            where(links.c.skill_id != all_(cast(bindparam("skill_ids"), ARRAY(Integer))))
+        return insert_stm, delete_stm
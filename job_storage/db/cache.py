@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+
+
+class LRUCache(object):
+    """
+    Bounded mapping which evicts least recently used entries, safe to share between threads
+    Keeps hit/miss/eviction counters to allow tuning of its size
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get_many(self, keys: Iterable[Any]) -> Dict[Any, Any]:
+        """
+        Look up many keys at once
+        :return: cached values by key, keys which are not cached are missing
+        """
+        found = {}
+        with self._lock:
+            for key in keys:
+                try:
+                    found[key] = self._data[key]
+                except KeyError:
+                    self.misses += 1
+                else:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+        return found
+
+    def update(self, mapping: Mapping[Any, Any]) -> None:
+        with self._lock:
+            for key, value in mapping.items():
+                self._data[key] = value
+                self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, keys: Optional[Iterable[Any]] = None) -> None:
+        """Drop given keys, everything if keys is None"""
+        with self._lock:
+            if keys is None:
+                self._data.clear()
+                return
+            for key in keys:
+                self._data.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class DataVersions(object):
+    """
+    Per table counters of committed writes, cached data read at some versions is valid until they change
+    Versions are local to the process, token tells them apart from versions of other processes.
+    """
+
+    def __init__(self) -> None:
+        self._token = None
+        self._token_pid = None
+        self._versions = {}
+        self._bumped = {}
+        self._lock = threading.Lock()
+
+    @property
+    def token(self) -> str:
+        """
+        Token of the current process
+        Made on first use in every process, workers forked from a master which already made one get their own.
+        """
+        if self._token_pid != os.getpid():
+            with self._lock:
+                if self._token_pid != os.getpid():
+                    self._token = uuid.uuid4().hex[:12]
+                    self._token_pid = os.getpid()
+        return self._token
+
+    def bump(self, *tables: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+                self._bumped[table] = now
+
+    def get(self, tables: Iterable[str]) -> Tuple[int, ...]:
+        return tuple(self._versions.get(table, 0) for table in tables)
+
+    def age(self, tables: Iterable[str]) -> Optional[float]:
+        """Seconds since the latest change of any of tables, None if none of them changed"""
+        bumped = [self._bumped[table] for table in tables if table in self._bumped]
+        return time.monotonic() - max(bumped) if bumped else None
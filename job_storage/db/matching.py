@@ -0,0 +1,220 @@
+import functools
+import heapq
+import itertools
+import operator
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    from pyroaring import BitMap as Bitmap
+except ImportError:  # compressed bitmaps, plain sets are used without it
+    Bitmap = set
+
+
+class SkillIndex(object):
+    """
+    Candidates in memory, to rank candidates of a job by number of skills they share with it
+    Every skill has a bitmap of its candidates. Expected salaries are kept bit-sliced, one bitmap per salary bit,
+    so a salary limit is evaluated by a few bitmap operations as well. Negative salaries are indexed as 0.
+
+    Index is filled on a fresh instance by add_candidates/add_links and swapped in by replace.
+    Changes are applied by set_candidates/remove_candidates, those done while the index is loading are replayed
+    on top of the loaded data, so writes committed during load are not lost.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.loaded = False
+        self._loading = False
+        self._pending = []
+        self._candidates = Bitmap()
+        self._with_salary = Bitmap()
+        self._salary_bits: List[Bitmap] = []
+        self._skills: Dict[int, Bitmap] = {}
+
+    # LOADING
+    def add_candidates(self, rows: Sequence[Tuple[int, Optional[int]]]) -> None:
+        """
+        Add batch of candidates while the index is built, not thread safe
+        :param rows: candidate id, expected salary
+        """
+        self._candidates.update([candidate_id for candidate_id, _ in rows])
+        rows = [(candidate_id, max(salary, 0)) for candidate_id, salary in rows if salary is not None]
+        self._with_salary.update([candidate_id for candidate_id, _ in rows])
+        bit_length = max((salary.bit_length() for _, salary in rows), default=0)
+        while len(self._salary_bits) < bit_length:
+            self._salary_bits.append(Bitmap())
+        for bit, bitmap in enumerate(self._salary_bits):
+            bitmap.update([candidate_id for candidate_id, salary in rows if salary >> bit & 1])
+
+    def add_links(self, rows: Sequence[Tuple[int, int]]) -> None:
+        """
+        Add batch of candidate skills while the index is built, not thread safe
+        :param rows: candidate id, skill id
+        """
+        by_skill = {}
+        for candidate_id, skill_id in rows:
+            by_skill.setdefault(skill_id, []).append(candidate_id)
+        for skill_id, candidate_ids in by_skill.items():
+            if skill_id in self._skills:
+                self._skills[skill_id].update(candidate_ids)
+            else:
+                self._skills[skill_id] = Bitmap(candidate_ids)
+
+    @property
+    def active(self) -> bool:
+        """Index is loaded or loading, so it has to be kept up to date"""
+        return self.loaded or self._loading
+
+    def start_loading(self) -> None:
+        """Record changes from now on, until loaded data is passed to replace"""
+        with self._lock:
+            self._loading = True
+            self._pending = []
+
+    def replace(self, index: "SkillIndex") -> None:
+        """
+        Take data of freshly built index and apply changes recorded since start_loading
+        Loaded data is dropped if the index was invalidated meanwhile, as it may miss changes.
+        """
+        with self._lock:
+            if not self._loading:
+                return
+            self._candidates = index._candidates
+            self._with_salary = index._with_salary
+            self._salary_bits = index._salary_bits
+            self._skills = index._skills
+            for change, args in self._pending:
+                change(*args)
+            self._pending = []
+            self._loading = False
+            self.loaded = True
+
+    def invalidate(self) -> None:
+        """Drop all data, index has to be loaded again"""
+        with self._lock:
+            self.loaded = False
+            self._loading = False
+            self._pending = []
+            self._candidates = Bitmap()
+            self._with_salary = Bitmap()
+            self._salary_bits = []
+            self._skills = {}
+
+    # CHANGES
+    def set_candidates(self, rows: Iterable[Tuple[int, Optional[int], Iterable[int]]]) -> None:
+        """
+        Insert or replace candidates, no-op if index is not loaded
+        :param rows: candidate id, expected salary, skill ids
+        """
+        rows = [(candidate_id, salary, list(skill_ids)) for candidate_id, salary, skill_ids in rows]
+        self._apply(self._set_candidates, rows)
+
+    def remove_candidates(self, candidate_ids: Iterable[int]) -> None:
+        self._apply(self._remove_candidates, list(candidate_ids))
+
+    def _apply(self, change, *args) -> None:
+        with self._lock:
+            if self.loaded:
+                change(*args)
+            elif self._loading:
+                self._pending.append((change, args))
+
+    def _set_candidates(self, rows) -> None:
+        self._remove_candidates([candidate_id for candidate_id, _, _ in rows])
+        self.add_candidates([(candidate_id, salary) for candidate_id, salary, _ in rows])
+        self.add_links([(candidate_id, skill_id) for candidate_id, _, skill_ids in rows for skill_id in skill_ids])
+
+    def _remove_candidates(self, candidate_ids) -> None:
+        candidate_ids = [candidate_id for candidate_id in candidate_ids if candidate_id in self._candidates]
+        if not candidate_ids:
+            return
+        removed = Bitmap(candidate_ids)
+        self._candidates -= removed
+        self._with_salary -= removed
+        for bitmap in self._salary_bits:
+            bitmap -= removed
+        for bitmap in self._skills.values():
+            bitmap -= removed
+
+    # QUERIES
+    def match(
+            self,
+            skill_ids: Iterable[int],
+            min_overlap: int = 1,
+            max_salary: Optional[int] = None,
+            limit: int = 100,
+    ) -> List[Tuple[int, int]]:
+        """
+        Candidates sharing most skills with given ones
+        Skill bitmaps are summed up by a bit-sliced adder, so the count of shared skills of every candidate
+        is held by a few bitmaps and candidates of each count are selected by bitmap operations only.
+        :param skill_ids: skills to match
+        :param min_overlap: min number of shared skills
+        :param max_salary: max expected salary, candidates without expected salary are skipped if set
+        :param limit: max number of returned candidates
+        :return: (candidate id, number of shared skills), most shared skills first, then by candidate id
+        """
+        with self._lock:
+            bitmaps = [self._skills[skill_id] for skill_id in set(skill_ids) if skill_id in self._skills]
+            # count_bits[i] holds candidates having bit i set in their count of shared skills
+            count_bits = []
+            for bitmap in bitmaps:
+                carry = bitmap
+                for bit, count_bitmap in enumerate(count_bits):
+                    count_bits[bit] = count_bitmap ^ carry
+                    carry = count_bitmap & carry
+                    if not carry:
+                        break
+                else:
+                    if carry:
+                        count_bits.append(carry)
+            if not count_bits:
+                return []
+            matched = functools.reduce(operator.or_, count_bits)
+            if max_salary is not None:
+                matched = matched & self._salary_at_most(max_salary)
+
+            found = []
+            max_overlap = min(len(bitmaps), 2 ** len(count_bits) - 1)
+            for overlap in range(max_overlap, max(min_overlap, 1) - 1, -1):
+                if len(found) >= limit or not matched:
+                    break
+                with_overlap = matched
+                for bit, count_bitmap in enumerate(count_bits):
+                    with_overlap = with_overlap & count_bitmap if overlap >> bit & 1 else with_overlap - count_bitmap
+                found.extend((candidate_id, overlap) for candidate_id in _smallest(with_overlap, limit - len(found)))
+        return found
+
+    def _salary_at_most(self, max_salary: int) -> Bitmap:
+        """Candidates with expected salary up to max_salary, bit by bit comparison of bit-sliced salaries"""
+        if max_salary < 0:
+            return Bitmap()
+        if max_salary.bit_length() > len(self._salary_bits):
+            return self._with_salary.copy()
+        lower = Bitmap()
+        equal = self._with_salary
+        for bit in reversed(range(len(self._salary_bits))):
+            if max_salary >> bit & 1:
+                lower = lower | (equal - self._salary_bits[bit])
+                equal = equal & self._salary_bits[bit]
+            else:
+                equal = equal - self._salary_bits[bit]
+        return lower | equal
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "loaded": self.loaded,
+                "candidates": len(self._candidates),
+                "skills": len(self._skills),
+                "links": sum(len(bitmap) for bitmap in self._skills.values()),
+            }
+
+
+def _smallest(bitmap: Bitmap, count: int) -> List[int]:
+    if count < 1:
+        return []
+    if isinstance(bitmap, set):
+        return heapq.nsmallest(count, bitmap)
+    return list(itertools.islice(bitmap, count))
@@ -0,0 +1,106 @@
+"""
+Versioned schema migrations, applied by `python -m job_storage.migrate`, never on import of the app
+
+A database without versions is brought to the tables of tables.py by the baseline, which creates missing tables,
+columns and indexes, and is stamped with all versions. Later migrations run in order on databases stamped before
+them. New migrations are appended to MIGRATIONS with the next version, tables.py is changed along with them.
+All pending migrations run in one transaction holding an advisory lock, so concurrent runs of several deployments
+wait for each other and a failed migration leaves the schema as it was.
+"""
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import MetaData, exc, inspect, select, func
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy_utils import database_exists, create_database
+
+from . import tables
+from .base import StorageBase
+
+# key of the advisory lock, arbitrary but equal for all runs against a database
+LOCK_KEY = 0x6a6f6273
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    upgrade: Callable[[Connection, StorageBase], None]
+
+
+def baseline(con: Connection, storage: StorageBase) -> None:
+    """Create missing tables, then columns and indexes declared after their table was created"""
+    storage.metadata.create_all(con)
+    inspector = inspect(con)
+    for table in storage.metadata.sorted_tables:
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                con.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {CreateColumn(column).compile(con)}")
+        for index in table.indexes:
+            index.create(con, checkfirst=True)
+
+
+MIGRATIONS = [
+    Migration(1, "Baseline: tables, columns and indexes bootstrapped on app start before versioning", baseline),
+]
+
+
+def latest_version() -> int:
+    return MIGRATIONS[-1].version
+
+
+def _version_table(storage: StorageBase) -> tables.SchemaVersion:
+    return tables.SchemaVersion(MetaData(naming_convention=storage.convention))
+
+
+def _current_version(con: Connection, version_table: tables.SchemaVersion) -> Optional[int]:
+    if not inspect(con).has_table(version_table.name):
+        return None
+    return con.execute(select([func.max(version_table.c.version)])).scalar()
+
+
+def status(storage) -> Dict[str, Any]:
+    """Current version of the database schema, None if it is not versioned, and versions not applied yet"""
+    if not database_exists(storage.client.url):
+        return {"current": None, "latest": latest_version(), "pending": [m.version for m in MIGRATIONS]}
+    with storage.connect() as con:
+        current = _current_version(con, _version_table(storage))
+    return {
+        "current": current,
+        "latest": latest_version(),
+        "pending": [migration.version for migration in MIGRATIONS if current is None or migration.version > current],
+    }
+
+
+def upgrade(storage) -> List[Migration]:
+    """
+    Create the database if it does not exist and apply pending migrations
+    :return: migrations recorded as applied, empty if the schema was up to date
+    """
+    if not database_exists(storage.client.url):
+        try:
+            create_database(storage.client.url)
+        except exc.DBAPIError:
+            # created by a concurrent run in the meantime
+            if not database_exists(storage.client.url):
+                raise
+    version_table = _version_table(storage)
+    with storage.connect() as con:
+        # every statement sees changes committed by a run that held the lock before, unlike in repeatable read
+        con = con.execution_options(isolation_level="READ COMMITTED")
+        with con.begin():
+            con.execute(select([func.pg_advisory_xact_lock(LOCK_KEY)]))
+            version_table.table.create(con, checkfirst=True)
+            current = _current_version(con, version_table)
+            if current is None:
+                # the baseline reaches tables.py, which includes changes of all later migrations
+                baseline(con, storage)
+                applied = MIGRATIONS
+            else:
+                applied = [migration for migration in MIGRATIONS if migration.version > current]
+                for migration in applied:
+                    migration.upgrade(con, storage)
+            if applied:
+                con.execute(version_table.table.insert(), [
+                    {"version": migration.version, "description": migration.description} for migration in applied])
+    return applied
@@ -0,0 +1,65 @@
+import json
+import logging
+import os
+import select
+import threading
+import time
+from typing import Callable, Optional, Dict, Any
+
+import psycopg2
+
+
+class ChangeListener(threading.Thread):
+    """
+    Background thread receiving change notifications of other processes
+    Uses its own connection outside of the pool, the connection is kept open in autocommit mode.
+    Callback gets decoded payload of every notification, or None after (re)connect as notifications may have been missed.
+    """
+    LOG_NAME = "flask.app"
+
+    def __init__(
+            self,
+            uri: str,
+            channel: str,
+            callback: Callable[[Optional[Dict[str, Any]]], None],
+            poll_timeout: float = 5.0,
+            reconnect_delay: float = 1.0,
+    ) -> None:
+        super(ChangeListener, self).__init__(name="change-listener", daemon=True)
+        self.uri = uri
+        self.channel = channel
+        self.callback = callback
+        self.poll_timeout = poll_timeout
+        self.reconnect_delay = reconnect_delay
+        self.pid = os.getpid()
+        self.logger = logging.getLogger(self.LOG_NAME)
+
+    def run(self) -> None:
+        while True:
+            try:
+                self._listen()
+            except Exception as e:
+                self.logger.warning(f'Change listener error - {e}')
+            time.sleep(self.reconnect_delay)
+
+    def _listen(self) -> None:
+        con = psycopg2.connect(self.uri)
+        try:
+            con.autocommit = True
+            with con.cursor() as cur:
+                cur.execute(f'LISTEN "{self.channel}"')
+            self.callback(None)
+            while True:
+                if select.select([con], [], [], self.poll_timeout) == ([], [], []):
+                    continue
+                con.poll()
+                while con.notifies:
+                    notification = con.notifies.pop(0)
+                    try:
+                        change = json.loads(notification.payload)
+                    except ValueError:
+                        self.logger.warning(f'Change listener got malformed payload - {notification.payload}')
+                        continue
+                    self.callback(change)
+        finally:
+            con.close()
@@ -0,0 +1,91 @@
+import base64
+import binascii
+import json
+from typing import List, Dict, Any, Optional, Tuple
+
+from sqlalchemy import or_, and_
+
+from job_storage import custom_exceptions as j_exc
+
+
+def encode_cursor(*keys) -> str:
+    """
+    Encode keyset values of the last returned row into an opaque cursor
+    :param keys: JSON serializable values of columns the rows are ordered by
+    :return: url-safe cursor string
+    """
+    raw = json.dumps(keys, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types) -> list:
+    """
+    Decode cursor created by encode_cursor
+    :param cursor: cursor string
+    :param types: expected type of every keyset value
+    :return: keyset values
+    :raise InvalidCursorError: if cursor is malformed or does not match expected types
+    """
+    try:
+        keys = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        raise j_exc.InvalidCursorError
+    if not isinstance(keys, list) or len(keys) != len(types) or \
+            not all(isinstance(key, key_type) and not isinstance(key, bool) for key, key_type in zip(keys, types)):
+        raise j_exc.InvalidCursorError
+    return keys
+
+
+def page_statement(stm, key, limit: Optional[int] = None, cursor: Optional[str] = None):
+    """
+    Restrict select statement to one page after cursor, one row more than limit is selected to detect next page
+    :param key: unique integer column rows are ordered and paged by
+    """
+    if cursor is not None:
+        last_key, = decode_cursor(cursor, int)
+        stm = stm.where(key > last_key)
+    stm = stm.order_by(key)
+    if limit is not None:
+        stm = stm.limit(limit + 1)
+    return stm
+
+
+def split_page(rows: List[Dict[str, Any]], key, limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Cut rows selected by page_statement to limit
+    :return: rows, cursor of the next page or None if there are no more rows
+    """
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][key.name])
+    return rows, next_cursor
+
+
+def page_ranked_statement(stm, rank, key, limit: Optional[int] = None, cursor: Optional[str] = None):
+    """
+    Restrict select statement to one page after cursor, rows are ordered by rank, highest first, then by key
+    :param rank: float expression rows are ranked by, also selected by the statement
+    :param key: unique integer column breaking ties of rank
+    """
+    if cursor is not None:
+        last_rank, last_key = decode_cursor(cursor, float, int)
+        stm = stm.where(or_(rank < last_rank, and_(rank == last_rank, key > last_key)))
+    stm = stm.order_by(rank.desc(), key)
+    if limit is not None:
+        stm = stm.limit(limit + 1)
+    return stm
+
+
+def split_ranked_page(
+        rows: List[Dict[str, Any]], rank_name: str, key_name: str, limit: Optional[int] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Cut rows selected by page_ranked_statement to limit
+    :return: rows, cursor of the next page or None if there are no more rows
+    """
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(float(rows[-1][rank_name]), rows[-1][key_name])
+    return rows, next_cursor
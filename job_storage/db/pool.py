@@ -0,0 +1,104 @@
+import os
+import threading
+import time
+from typing import Dict, Any, Callable, List, Tuple
+
+from sqlalchemy import exc, event, create_engine
+from sqlalchemy.engine import Engine, Connection
+
+
+class LazyEngine(object):
+    """
+    Engine created on first use in every process
+    An engine inherited from the master process over fork is replaced, so workers never share its connections.
+    Connection checkouts are timed to tell pool starvation from slow queries.
+    """
+
+    def __init__(self, uri: str, name: str = "primary", **engine_kwargs) -> None:
+        self.uri = uri
+        self.name = name
+        self.engine_kwargs = engine_kwargs
+        self._engine = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._listeners: List[Tuple[str, Callable]] = []
+        self._checkout_observers: List[Callable[[str, float], None]] = []
+        self._reset_counters()
+
+    def _reset_counters(self) -> None:
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    @property
+    def engine(self) -> Engine:
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    # the app does not connect on import, an inherited engine has no connections to close
+                    self._engine = create_engine(self.uri, **self.engine_kwargs)
+                    for event_name, listener in self._listeners:
+                        event.listen(self._engine, event_name, listener)
+                    self._pid = os.getpid()
+                    self._reset_counters()
+        return self._engine
+
+    def listen(self, event_name: str, listener: Callable) -> None:
+        """Register engine event listener, applied to engines of all processes"""
+        self._listeners.append((event_name, listener))
+        if self._engine is not None and self._pid == os.getpid():
+            event.listen(self._engine, event_name, listener)
+
+    def observe_checkouts(self, observer: Callable[[str, float], None]) -> None:
+        """Register callable getting name of this engine and seconds waited for every connection checkout"""
+        self._checkout_observers.append(observer)
+
+    def connect(self) -> Connection:
+        engine = self.engine
+        start = time.perf_counter()
+        try:
+            return engine.connect()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            wait = time.perf_counter() - start
+            self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            for observer in self._checkout_observers:
+                observer(self.name, wait)
+
+    def checked_out(self) -> int:
+        """Number of connections of this process in use"""
+        if self._engine is not None and self._pid == os.getpid():
+            return self._engine.pool.checkedout()
+        return 0
+
+    def dispose(self) -> None:
+        """Close all checked in connections of this process"""
+        if self._engine is not None and self._pid == os.getpid():
+            self._engine.dispose()
+
+    def stats(self) -> Dict[str, Any]:
+        result = {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_total_ms": round(self.wait_total * 1000, 3),
+            "wait_avg_ms": round(self.wait_total * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+        }
+        if self._engine is not None and self._pid == os.getpid():
+            pool = self._engine.pool
+            result.update({
+                "size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": max(pool.overflow(), 0),
+            })
+            # compiled statements held by the engine, a cache kept full evicts statements reused by requests
+            compiled_cache = getattr(self._engine, "_compiled_cache", None)
+            if compiled_cache is not None:
+                result["compiled_statements"] = len(compiled_cache)
+        return result
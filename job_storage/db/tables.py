@@ -1,8 +1,9 @@
 import abc
 
-from sqlalchemy import String, Integer
-from sqlalchemy import UniqueConstraint, ForeignKey
+from sqlalchemy import String, Integer, DateTime, func
+from sqlalchemy import UniqueConstraint, ForeignKey, Index, Computed
 from sqlalchemy import Table, Column, MetaData
+from sqlalchemy.dialects.postgresql import TSVECTOR
 
 
 class BaseTable(abc.ABC):
@@ -32,7 +33,7 @@ class Candidates(BaseTable):
             meta_data,
             Column("id", Integer(), primary_key=True),
             Column("full_name", String()),
-            Column("expected_salary", Integer())
+            Column("expected_salary", Integer(), index=True)
         )
 
 
@@ -60,11 +61,15 @@ class CandidatesSkills(BaseTable):
             Column("candidate_id", Integer(), ForeignKey("candidates.id"), nullable=False),
             Column("skill_id", Integer(), ForeignKey("skills.id"), nullable=False),
             UniqueConstraint("candidate_id", "skill_id"),
+            # candidates by skill, the unique constraint serves skills by candidate
+            Index("ix_candidates_skills_skill_id_candidate_id", "skill_id", "candidate_id"),
         )
 
 
 class Jobs(BaseTable):
     __table_name__ = "jobs"
+    # text search configuration of search_vector, queries have to use the same one
+    SEARCH_CONFIG = "english"
 
     def __init__(self, meta_data: MetaData) -> None:
         super().__init__(meta_data)
@@ -73,8 +78,17 @@ class Jobs(BaseTable):
             meta_data,
             Column("id", Integer(), primary_key=True),
             Column("title", String(), unique=True),
-            Column("salary", Integer()),
+            Column("salary", Integer(), index=True),
             Column("description", String(), server_default=None),
+            # prefix search by LIKE, index of the unique constraint serves equality only unless collation is C
+            Index("ix_jobs_title_pattern", "title", postgresql_ops={"title": "text_pattern_ops"}),
+            # lexemes of title and description, title ones weigh more in ranking
+            Column("search_vector", TSVECTOR(), Computed(
+                f"setweight(to_tsvector('{self.SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+                f"setweight(to_tsvector('{self.SEARCH_CONFIG}', coalesce(description, '')), 'B')",
+                persisted=True,
+            )),
+            Index("ix_jobs_search_vector", "search_vector", postgresql_using="gin"),
         )
 
 
@@ -90,3 +104,32 @@ class JobsCandidates(BaseTable):
             Column("candidate_id", Integer(), ForeignKey("candidates.id"), nullable=False),
             UniqueConstraint("job_id", "candidate_id"),
         )
+
+
+class JobsSkills(BaseTable):
+    __table_name__ = "jobs_skills"
+
+    def __init__(self, meta_data: MetaData) -> None:
+        super().__init__(meta_data)
+        self.table = Table(
+            type(self).__table_name__,
+            meta_data,
+            Column("job_id", Integer(), ForeignKey("jobs.id"), nullable=False),
+            Column("skill_id", Integer(), ForeignKey("skills.id"), nullable=False),
+            UniqueConstraint("job_id", "skill_id"),
+        )
+
+
+class SchemaVersion(BaseTable):
+    """Versions of applied migrations, kept apart from metadata of Storage"""
+    __table_name__ = "schema_version"
+
+    def __init__(self, meta_data: MetaData) -> None:
+        super().__init__(meta_data)
+        self.table = Table(
+            type(self).__table_name__,
+            meta_data,
+            Column("version", Integer(), primary_key=True, autoincrement=False),
+            Column("description", String(), nullable=False),
+            Column("applied_at", DateTime(timezone=True), server_default=func.now(), nullable=False),
+        )
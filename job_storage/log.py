@@ -1,6 +1,12 @@
 # in flask app: flask_app.logger.addFilter(RequestFilter())
 import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
 import uuid
+from typing import Dict, List, Tuple
 
 from flask import request
 
@@ -8,6 +14,7 @@ from flask import request
 class RequestFilter(logging.Filter):
     """
     This is a filter which injects contextual information into the log.
+    Context is computed on the first record of a request and reused by the following ones.
     """
     DEFAULT = 'n-a'
     REQUEST_HEADER = 'X-Request-ID'
@@ -16,18 +23,100 @@ class RequestFilter(logging.Filter):
 
     def filter(self, record):
         if request:
-            record.request_id = request.headers.get(
-                self.REQUEST_HEADER,
-                request.headers.get(
-                    self.CORRELATION_HEADER,
-                    uuid.uuid4()
-                )
-            )
-            record.client_ip = record.client_ip = request.headers.get(
-                self.FORWARD_HEADER,
-                request.remote_addr
-            ) or self.DEFAULT
+            context = getattr(request, 'log_context', None)
+            if context is None:
+                context = request.log_context = self.request_context()
+            record.request_id, record.client_ip = context
         else:
             record.client_ip = self.DEFAULT
             record.request_id = self.DEFAULT
         return True
+
+    def request_context(self) -> Tuple[str, str]:
+        """Request id and client address of the current request, the id is stored for the app to reuse"""
+        if not getattr(request, 'request_id', None):
+            request.request_id = request.headers.get(
+                self.REQUEST_HEADER,
+                request.headers.get(self.CORRELATION_HEADER)
+            ) or str(uuid.uuid4())
+        client_ip = request.headers.get(self.FORWARD_HEADER, request.remote_addr) or self.DEFAULT
+        return request.request_id, client_ip
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a share of records of every level, e.g. {"INFO": 0.1} keeps about every tenth INFO record"""
+
+    def __init__(self, rates: Dict[str, float]) -> None:
+        super().__init__()
+        self.rates = {logging.getLevelName(level): rate for level, rate in rates.items()}
+        self.sampled_out = 0
+
+    def filter(self, record):
+        rate = self.rates.get(record.levelno, 1.0)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class BackgroundHandler(logging.handlers.QueueHandler):
+    """
+    Hands records over to a thread writing them to handlers, so slow handlers do not delay requests
+    The thread is started on the first record of every process, threads do not survive fork of workers.
+    Records are dropped and counted when the queue is full, logging never blocks.
+    """
+
+    def __init__(self, handlers: List[logging.Handler], max_size: int = 10000) -> None:
+        super().__init__(queue.SimpleQueue())
+        self.targets = handlers
+        self.max_size = max_size
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            self._start()
+        # the bound is checked here rather than by the queue, so the sentinel stopping the thread always fits
+        if self.queue.qsize() >= self.max_size:
+            self.dropped += 1
+            return
+        self.queue.put_nowait(record)
+
+    def _start(self):
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # queue inherited over fork may hold records the parent wrote already
+            self.queue = queue.SimpleQueue()
+            self._listener = logging.handlers.QueueListener(self.queue, *self.targets, respect_handler_level=True)
+            self._listener.start()
+            self._pid = os.getpid()
+
+    def close(self):
+        """Write records left in the queue and stop the thread"""
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+        super().close()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self.queue.qsize() if self._pid == os.getpid() else 0,
+            "max_size": self.max_size,
+            "dropped": self.dropped,
+            "sampled_out": sum(getattr(f, "sampled_out", 0) for f in self.filters),
+        }
+
+
+def log_in_background(logger: logging.Logger, max_size: int, sampling: Dict[str, float]) -> BackgroundHandler:
+    """Move handlers of logger behind a BackgroundHandler sampling records by level"""
+    handlers = list(logger.handlers)
+    for handler in handlers:
+        logger.removeHandler(handler)
+    background = BackgroundHandler(handlers, max_size)
+    if sampling:
+        background.addFilter(SamplingFilter(sampling))
+    logger.addHandler(background)
+    return background
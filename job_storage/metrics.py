@@ -0,0 +1,69 @@
+"""
+Prometheus metrics of the app
+
+Multiple worker processes share metrics through files in PROMETHEUS_MULTIPROC_DIR,
+the directory has to exist and be emptied before workers start (see uwsgi.ini).
+Without the variable metrics are kept in memory of every process.
+"""
+import os
+import time
+
+from prometheus_client import Histogram, CollectorRegistry, REGISTRY, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+
+from .db import Storage
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+REQUEST_DURATION = Histogram(
+    "job_storage_request_duration_seconds",
+    "Time spent handling a request",
+    ["namespace", "route", "method", "status"],
+)
+SQL_DURATION = Histogram(
+    "job_storage_sql_duration_seconds",
+    "Time spent executing a SQL statement",
+    ["engine", "statement"],
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1.0, 2.5, float("inf")),
+)
+POOL_WAIT = Histogram(
+    "job_storage_pool_wait_seconds",
+    "Time spent waiting for a database connection from pool",
+    ["engine"],
+    buckets=(.0001, .0005, .001, .005, .01, .05, .1, .5, 1.0, 5.0, 10.0, float("inf")),
+)
+
+
+def instrument_storage(storage: Storage) -> None:
+    """Time SQL statements and connection checkouts of all storage engines"""
+    for lazy_engine in storage.engines:
+        lazy_engine.listen("before_cursor_execute", _before_cursor_execute)
+        lazy_engine.listen("after_cursor_execute", _sql_timer(lazy_engine.name))
+        lazy_engine.observe_checkouts(lambda name, wait: POOL_WAIT.labels(name).observe(wait))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["metrics_start"] = time.perf_counter()
+
+
+def _sql_timer(engine_name):
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info.pop("metrics_start", None)
+        if start is None:
+            return
+        duration = time.perf_counter() - start
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "EMPTY"
+        SQL_DURATION.labels(engine_name, verb).observe(duration)
+    return after_cursor_execute
+
+
+def observe_request(namespace: str, route: str, method: str, status: int, duration: float) -> None:
+    REQUEST_DURATION.labels(namespace, route, method, str(status)).observe(duration)
+
+
+def render() -> bytes:
+    """Metrics in Prometheus text format, aggregated over all worker processes if multiprocess mode is on"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
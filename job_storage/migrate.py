@@ -0,0 +1,32 @@
+"""
+Schema management of the configured database
+
+    python -m job_storage.migrate            # create database if missing and apply pending migrations
+    python -m job_storage.migrate status     # print current and latest schema version
+
+Run it once per deployment before workers start, the app never changes the schema.
+"""
+import argparse
+
+from . import app
+from .db import migrations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", nargs="?", choices=["upgrade", "status"], default="upgrade")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        result = migrations.status(app.db)
+        print(f"current {result['current']}, latest {result['latest']}, "
+              f"pending {', '.join(map(str, result['pending'])) or '-'}")
+        return
+    applied = migrations.upgrade(app.db)
+    for migration in applied:
+        print(f"applied {migration.version}: {migration.description}")
+    print(f"schema at version {migrations.latest_version()}")
+
+
+if __name__ == "__main__":
+    main()
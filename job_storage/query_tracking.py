@@ -0,0 +1,196 @@
+"""
+SQL statements executed per request, for development and staging, enabled by QUERY_TRACKING
+
+Statements are recorded by engine events, so every path to the database is seen, not just Storage.execute.
+Identical statement fingerprints repeated at least QUERY_REPEAT_THRESHOLD times in one request are logged
+as suspected N+1 queries, statements slower than SLOW_QUERY_MS are logged with their EXPLAIN ANALYZE.
+EXPLAIN ANALYZE executes the statement again in a transaction that is rolled back, writes included.
+"""
+import contextvars
+import hashlib
+import logging
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, exc
+
+EXPLAINED_VERBS = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+PLACEHOLDER = r"(?:%\(\w+\)s|%s|\$\d+|\?)"
+PLACEHOLDER_LIST = re.compile(rf"\(\s*{PLACEHOLDER}(?:\s*,\s*{PLACEHOLDER})+\s*\)")
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+
+
+@dataclass(frozen=True)
+class TrackedStatement:
+    engine: Any  # engine the statement ran on, its EXPLAIN ANALYZE runs there as well
+    statement: str
+    parameters: Any
+    executemany: bool
+    fingerprint: str
+    duration: float  # seconds
+
+
+class RequestQueries(object):
+    """Statements of one request"""
+
+    def __init__(self) -> None:
+        self.statements: List[TrackedStatement] = []
+        self.token: Optional[contextvars.Token] = None
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def duration(self) -> float:
+        return sum(tracked.duration for tracked in self.statements)
+
+    def repeated(self, threshold: int) -> List[Tuple[TrackedStatement, int]]:
+        """First statement and count of every fingerprint executed at least threshold times"""
+        counts = Counter(tracked.fingerprint for tracked in self.statements)
+        first = {}
+        for tracked in self.statements:
+            first.setdefault(tracked.fingerprint, tracked)
+        return [(first[fingerprint], count) for fingerprint, count in counts.most_common() if count >= threshold]
+
+    def slower_than(self, seconds: float) -> List[TrackedStatement]:
+        return [tracked for tracked in self.statements if tracked.duration >= seconds]
+
+    def headers(self) -> Dict[str, str]:
+        """Summary of the request for response headers, Server-Timing shows up in browser dev tools"""
+        return {
+            "X-DB-Queries": str(self.count),
+            "Server-Timing": f'db;dur={self.duration * 1000:.2f};desc="{self.count} queries"',
+        }
+
+
+_current: contextvars.ContextVar[Optional[RequestQueries]] = contextvars.ContextVar("request_queries", default=None)
+
+
+def start() -> RequestQueries:
+    """Record statements of the current context, threads and asyncio tasks have contexts of their own"""
+    queries = RequestQueries()
+    queries.token = _current.set(queries)
+    return queries
+
+
+def stop(queries: RequestQueries) -> None:
+    _current.reset(queries.token)
+
+
+def fingerprint(statement: str) -> str:
+    """
+    Short hash of statement text with literals replaced and placeholder lists collapsed
+    Statements differing only in values or in length of IN lists share a fingerprint.
+    """
+    normalized = " ".join(statement.split())
+    normalized = STRING_LITERAL.sub("?", normalized)
+    normalized = NUMBER_LITERAL.sub("?", normalized)
+    normalized = PLACEHOLDER_LIST.sub("(...)", normalized)
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+def instrument_storage(storage) -> None:
+    """Record statements of all engines of Storage"""
+    for lazy_engine in storage.engines:
+        lazy_engine.listen("before_cursor_execute", _before_cursor_execute)
+        lazy_engine.listen("after_cursor_execute", _recorder(lazy_engine))
+
+
+def instrument_async_storage(storage) -> None:
+    """Record statements of all engines of AsyncStorage, events fire in the task awaiting the statement"""
+    for engine in storage.engines:
+        event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine.sync_engine, "after_cursor_execute", _recorder(engine))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info["tracking_start"] = time.perf_counter()
+
+
+def _recorder(engine):
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start_time = conn.info.pop("tracking_start", None)
+        queries = _current.get()
+        if start_time is None or queries is None:
+            return
+        queries.statements.append(TrackedStatement(
+            engine=engine,
+            statement=statement,
+            parameters=parameters,
+            executemany=executemany,
+            fingerprint=fingerprint(statement),
+            duration=time.perf_counter() - start_time,
+        ))
+    return after_cursor_execute
+
+
+def explainable(tracked: TrackedStatement) -> bool:
+    verb = tracked.statement.lstrip().split(None, 1)[0].upper() if tracked.statement.strip() else ""
+    return not tracked.executemany and verb in EXPLAINED_VERBS
+
+
+def explain(tracked: TrackedStatement) -> str:
+    """EXPLAIN ANALYZE of a statement of Storage, in a transaction that is rolled back"""
+    try:
+        with tracked.engine.connect() as con:
+            trans = con.begin()
+            try:
+                rows = con.exec_driver_sql(f"EXPLAIN ANALYZE {tracked.statement}", tracked.parameters)
+                return "\n".join(row[0] for row in rows)
+            finally:
+                trans.rollback()
+    except exc.SQLAlchemyError as e:
+        return f"EXPLAIN ANALYZE failed: {e}"
+
+
+async def explain_async(tracked: TrackedStatement) -> str:
+    """EXPLAIN ANALYZE of a statement of AsyncStorage, in a transaction that is rolled back"""
+    try:
+        async with tracked.engine.connect() as con:
+            trans = await con.begin()
+            try:
+                rows = await con.exec_driver_sql(f"EXPLAIN ANALYZE {tracked.statement}", tracked.parameters)
+                return "\n".join(row[0] for row in rows)
+            finally:
+                await trans.rollback()
+    except exc.SQLAlchemyError as e:
+        return f"EXPLAIN ANALYZE failed: {e}"
+
+
+def report(queries: RequestQueries, request_name: str, threshold: int, slow_ms: float, explain_slow: bool,
+           logger: logging.Logger) -> None:
+    """Log suspected N+1 statements and slow statements of a finished request of the WSGI app"""
+    _report_repeated(queries, request_name, threshold, logger)
+    for tracked in queries.slower_than(slow_ms / 1000):
+        plan = explain(tracked) if explain_slow and explainable(tracked) else None
+        _report_slow(tracked, request_name, plan, logger)
+
+
+async def report_async(queries: RequestQueries, request_name: str, threshold: int, slow_ms: float,
+                       explain_slow: bool, logger: logging.Logger) -> None:
+    """Log suspected N+1 statements and slow statements of a finished request of the ASGI app"""
+    _report_repeated(queries, request_name, threshold, logger)
+    for tracked in queries.slower_than(slow_ms / 1000):
+        plan = await explain_async(tracked) if explain_slow and explainable(tracked) else None
+        _report_slow(tracked, request_name, plan, logger)
+
+
+def _report_repeated(queries: RequestQueries, request_name: str, threshold: int, logger: logging.Logger) -> None:
+    for tracked, count in queries.repeated(threshold):
+        logger.warning(f"Possible N+1 in {request_name}: statement {tracked.fingerprint} executed {count} times: "
+                       f"{' '.join(tracked.statement.split())}")
+
+
+def _report_slow(tracked: TrackedStatement, request_name: str, plan: Optional[str], logger: logging.Logger) -> None:
+    message = (f"Slow statement in {request_name}: {tracked.duration * 1000:.1f} ms, "
+               f"statement {tracked.fingerprint}: {' '.join(tracked.statement.split())}")
+    if plan is not None:
+        message += f"\n{plan}"
+    logger.warning(message)
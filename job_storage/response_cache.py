@@ -0,0 +1,89 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    content_type: str
+    etag: str
+    version: str  # versions of the data the body was read at, see make_version
+    created: float
+
+
+class ResponseCache(object):
+    """
+    Serialized response bodies bounded by their total size, least recently used are evicted first
+    An entry is valid only for the data versions it was read at. Versions are local to the process, ETag is a hash
+    of the body instead, so every worker and container tags the same data by the same ETag.
+    """
+
+    def __init__(self, max_bytes: int, ttl: Optional[float] = None) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_version(token: str, versions) -> str:
+        return f"{token}:{versions}"
+
+    @staticmethod
+    def make_etag(body: bytes) -> str:
+        return hashlib.sha1(body).hexdigest()[:20]
+
+    def get(self, key: str, version: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry.version != version or self._expired(entry)):
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, entry: CachedResponse) -> None:
+        if len(entry.body) > self.max_bytes:
+            return
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = entry
+            self.size += len(entry.body)
+            while self.size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _expired(self, entry: CachedResponse) -> bool:
+        return self.ttl is not None and time.monotonic() - entry.created > self.ttl
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry.body)
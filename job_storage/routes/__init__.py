@@ -1 +1 @@
-from . import jobs, candidates, skills
+from . import jobs, candidates, skills, stats
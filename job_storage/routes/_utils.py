@@ -0,0 +1,21 @@
+from flask import request
+
+READ_PRIMARY_HEADER = "X-Read-Primary"
+
+read_primary_params = {
+    READ_PRIMARY_HEADER: {
+        "in": "header",
+        "type": "boolean",
+        "description": "Read from primary database instead of a replica, e.g. right after own write",
+    }
+}
+
+
+def read_primary(headers=None) -> bool:
+    """
+    Client asks to read from primary database
+    :param headers: request headers, of the current flask request if None
+    """
+    if headers is None:
+        headers = request.headers
+    return headers.get(READ_PRIMARY_HEADER, "").lower() in ("1", "true", "yes")
@@ -1,8 +1,12 @@
 from flask_restx import Model, fields, Namespace, Resource
-from flask import current_app as app
+from flask import current_app as app, request, Response
 from dataclasses import asdict, fields as d_fields
+from marshmallow import ValidationError
 
 from job_storage import validators as v
+from job_storage import custom_exceptions as j_exc
+from job_storage.serialization import ndjson, loads_ndjson
+from ._utils import read_primary, read_primary_params
 
 api = Namespace(
     'candidates',
@@ -14,25 +18,73 @@ api = Namespace(
 class Candidates(Resource):
     """List/insert candidates"""
 
+    @api.doc(params={
+        **v.paging.PagingSchema.restx_params_dict(),
+        **v.candidates.CandidateFiltersSchema.restx_params_dict(),
+        **v.candidates.CandidateProjectionSchema.restx_params_dict(),
+        **read_primary_params,
+    })
     def get(self):
-        return {"data": app.db.list_candidates()}, 200
+        paging = v.paging.PagingSchema.compiled().load(request.args)
+        filters = v.candidates.CandidateFiltersSchema.compiled().load(request.args)
+        projection = v.candidates.CandidateProjectionSchema.compiled().load(request.args)
+        data, next_cursor = app.db.list_candidates(paging.limit, paging.cursor, read_primary(), filters, projection)
+        return {"data": data, "next_cursor": next_cursor}, 200
 
     @api.expect(api.model('insert_candidate_payload', v.candidates.InsertCandidateSchema.restx_expect_dict()))
     def post(self):
-        payload = v.candidates.InsertCandidateSchema().load(api.payload or {})
+        payload = v.candidates.InsertCandidateSchema.compiled().load(api.payload or {})
         app.db.insert_candidate(payload)
         return {"message": "Candidate added successfully"}, 201
 
 
+@api.route('/bulk')
+class CandidatesBulk(Resource):
+    """Insert many candidates at once, from JSON array or NDJSON body"""
+
+    @api.expect([api.model('insert_candidate_payload', v.candidates.InsertCandidateSchema.restx_expect_dict())])
+    def post(self):
+        if request.mimetype == "application/x-ndjson":
+            rows = list(loads_ndjson(request.get_data(as_text=True)))
+        else:
+            rows = api.payload
+        if not isinstance(rows, list):
+            raise ValidationError({"_schema": ["Expected a list of candidates."]})
+        if len(rows) > app.config["BULK_MAX_ROWS"]:
+            raise j_exc.PayloadTooLargeError(f"At most {app.config['BULK_MAX_ROWS']} candidates can be added at once")
+
+        loaded, errors = v.candidates.InsertCandidateSchema.compiled().load_many(rows)
+        candidate_ids = app.db.bulk_insert_candidates([payload for _, payload in loaded]) if loaded else []
+        inserted = [{"index": index, "id": candidate_id} for (index, _), candidate_id in zip(loaded, candidate_ids)]
+        return {
+            "message": f"{len(inserted)} candidates added successfully",
+            "inserted": inserted,
+            "errors": errors,
+        }, 201 if inserted or not errors else 400
+
+
+@api.route('/export')
+class CandidatesExport(Resource):
+    """Stream all candidates"""
+
+    @api.produces(["application/x-ndjson"])
+    @api.doc(params=read_primary_params)
+    def get(self):
+        rows = app.db.stream_candidates(app.config["EXPORT_BATCH_SIZE"], read_primary())
+        return Response(ndjson(rows), mimetype="application/x-ndjson")
+
+
 @api.route('/<int:candidate_id>')
 class CandidateDetail(Resource):
     """Candidate detail and operations"""
+    @api.doc(params={**v.candidates.CandidateProjectionSchema.restx_params_dict(), **read_primary_params})
     def get(self, candidate_id):
-        return {"data": app.db.find_candidate(candidate_id)}, 200
+        projection = v.candidates.CandidateProjectionSchema.compiled().load(request.args)
+        return {"data": app.db.find_candidate(candidate_id, read_primary(), projection)}, 200
 
     @api.expect(api.model('insert_candidate_payload', v.candidates.InsertCandidateSchema.restx_expect_dict()))
     def put(self, candidate_id):
-        payload = v.candidates.InsertCandidateSchema().load(api.payload or {})
+        payload = v.candidates.InsertCandidateSchema.compiled().load(api.payload or {})
         app.db.force_insert_candidate(candidate_id, payload)
         return {"message": "Candidate updated/added successfully"}, 201
 
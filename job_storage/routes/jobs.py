@@ -1,7 +1,10 @@
 from flask_restx import Namespace, Resource
-from flask import current_app as app
+from flask import current_app as app, request, Response
 
 from job_storage import validators as v
+from job_storage import custom_exceptions as j_exc
+from job_storage.serialization import ndjson
+from ._utils import read_primary, read_primary_params
 
 api = Namespace(
     'jobs',
@@ -12,28 +15,92 @@ api = Namespace(
 @api.route('')
 class JobsList(Resource):
     """List/insert jobs"""
+    @api.doc(params={
+        **v.paging.PagingSchema.restx_params_dict(),
+        **v.jobs.JobFiltersSchema.restx_params_dict(),
+        **v.jobs.JobProjectionSchema.restx_params_dict(),
+        **read_primary_params,
+    })
     def get(self):
-        return {"data": app.db.list_jobs()}, 200
+        paging = v.paging.PagingSchema.compiled().load(request.args)
+        filters = v.jobs.JobFiltersSchema.compiled().load(request.args)
+        projection = v.jobs.JobProjectionSchema.compiled().load(request.args)
+        data, next_cursor = app.db.list_jobs(paging.limit, paging.cursor, read_primary(), filters, projection)
+        return {"data": data, "next_cursor": next_cursor}, 200
 
     @api.expect(api.model('insert_job_payload', v.jobs.InsertJobSchema.restx_expect_dict()))
     def post(self):
-        payload = v.jobs.InsertJobSchema().load(api.payload or {})
+        payload = v.jobs.InsertJobSchema.compiled().load(api.payload or {})
         app.db.insert_job(payload)
         return {"message": "Job added successfully"}, 201
 
 
+@api.route('/export')
+class JobsExport(Resource):
+    """Stream all jobs"""
+    @api.produces(["application/x-ndjson"])
+    @api.doc(params=read_primary_params)
+    def get(self):
+        rows = app.db.stream_jobs(app.config["EXPORT_BATCH_SIZE"], read_primary())
+        return Response(ndjson(rows), mimetype="application/x-ndjson")
+
+
+@api.route('/search')
+class JobsSearch(Resource):
+    """Full-text search of jobs, best matching first"""
+    @api.doc(params={
+        **v.jobs.SearchQuerySchema.restx_params_dict(),
+        **v.paging.PagingSchema.restx_params_dict(),
+        **v.jobs.JobFiltersSchema.restx_params_dict(),
+        **read_primary_params,
+    })
+    def get(self):
+        query = v.jobs.SearchQuerySchema.compiled().load(request.args)
+        paging = v.paging.PagingSchema.compiled().load(request.args)
+        filters = v.jobs.JobFiltersSchema.compiled().load(request.args)
+        data, next_cursor = app.db.search_jobs(query.q, paging.limit, paging.cursor, read_primary(), filters)
+        return {"data": data, "next_cursor": next_cursor}, 200
+
+
 @api.route('/<int:job_id>')
 class JobDetail(Resource):
     """Job detail and operations"""
+    @api.doc(params={**v.jobs.JobProjectionSchema.restx_params_dict(), **read_primary_params})
     def get(self, job_id):
-        return {"data": app.db.find_job(job_id)}, 200
+        projection = v.jobs.JobProjectionSchema.compiled().load(request.args)
+        return {"data": app.db.find_job(job_id, read_primary(), projection)}, 200
 
     @api.expect(api.model('insert_job_payload', v.jobs.InsertJobSchema.restx_expect_dict()))
     def put(self, job_id):
-        payload = v.jobs.InsertJobSchema().load(api.payload or {})
+        payload = v.jobs.InsertJobSchema.compiled().load(api.payload or {})
         app.db.force_insert_job(job_id, payload)
         return {"message": "Job updated/added successfully"}, 201
 
     def delete(self, job_id):
         app.db.delete_job(job_id)
         return {"message": "Job deleted successfully"}, 202
+
+
+@api.route('/<int:job_id>/matches')
+class JobMatches(Resource):
+    """Candidates sharing most skills with the job"""
+    @api.doc(params={**v.jobs.MatchQuerySchema.restx_params_dict(), **read_primary_params})
+    def get(self, job_id):
+        query = v.jobs.MatchQuerySchema.compiled().load(request.args)
+        data = app.db.match_candidates(job_id, query.min_overlap, query.max_salary, query.limit, read_primary())
+        return {"data": data}, 200
+
+
+@api.route('/<int:job_id>/candidates')
+class JobCandidates(Resource):
+    """Assign many candidates to the job at once"""
+    @api.expect(api.model('assign_candidates_payload', v.jobs.AssignCandidatesSchema.restx_expect_dict()))
+    def post(self, job_id):
+        payload = v.jobs.AssignCandidatesSchema.compiled().load(api.payload or {})
+        if len(payload.candidate_ids) > app.config["BULK_MAX_ROWS"]:
+            raise j_exc.PayloadTooLargeError(f"At most {app.config['BULK_MAX_ROWS']} candidates can be assigned at once")
+        outcome = app.db.assign_candidates(job_id, payload.candidate_ids)
+        return {
+            "message": f"{len(outcome['added'])} candidates assigned successfully",
+            **outcome,
+        }, 201 if outcome["added"] else 200
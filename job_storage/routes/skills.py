@@ -1,5 +1,8 @@
 from flask_restx import Namespace, Resource
-from flask import current_app as app
+from flask import current_app as app, request
+
+from job_storage import validators as v
+from ._utils import read_primary, read_primary_params
 
 api = Namespace(
     'skills',
@@ -11,5 +14,8 @@ api = Namespace(
 class SkillsList(Resource):
     """List all jobs"""
 
+    @api.doc(params={**v.paging.PagingSchema.restx_params_dict(), **read_primary_params})
     def get(self):
-        return {"data": app.db.list_skills()}, 200
+        paging = v.paging.PagingSchema.compiled().load(request.args)
+        data, next_cursor = app.db.list_skills(paging.limit, paging.cursor, read_primary())
+        return {"data": data, "next_cursor": next_cursor}, 200
@@ -0,0 +1,51 @@
+import os
+
+from flask_restx import Namespace, Resource
+from flask import current_app as app
+
+api = Namespace(
+    'stats',
+    description='Runtime statistics of the worker serving the request',
+)
+
+
+@api.route('/skill-cache')
+class SkillCacheStats(Resource):
+    """Skill cache counters"""
+
+    def get(self):
+        return {"data": {"pid": os.getpid(), **app.db.skill_cache.stats()}}, 200
+
+
+@api.route('/skill-index')
+class SkillIndexStats(Resource):
+    """Size of skill index used to match candidates to jobs"""
+
+    def get(self):
+        return {"data": {"pid": os.getpid(), **app.db.skill_index.stats()}}, 200
+
+
+@api.route('/pool')
+class PoolStats(Resource):
+    """Connection pool usage and checkout wait times"""
+
+    def get(self):
+        return {"data": {"pid": os.getpid(), **app.db.pool_stats()}}, 200
+
+
+@api.route('/response-cache')
+class ResponseCacheStats(Resource):
+    """Response cache counters"""
+
+    def get(self):
+        return {"data": {"pid": os.getpid(), **app.response_cache.stats()}}, 200
+
+
+@api.route('/logging')
+class LoggingStats(Resource):
+    """Records waiting for the background log writer, dropped and sampled out ones"""
+
+    def get(self):
+        if app.log_handler is None:
+            return {"data": {"pid": os.getpid(), "async": False}}, 200
+        return {"data": {"pid": os.getpid(), "async": True, **app.log_handler.stats()}}, 200
@@ -0,0 +1,99 @@
+import json
+import arrow
+import datetime as dt
+import decimal
+from json import JSONEncoder
+from typing import Iterable, Iterator, Any, Callable
+
+try:
+    import orjson
+except ImportError:  # optional C accelerated encoder, pure python one is used without it
+    orjson = None
+
+
+class ExtendedJSONEncoder(JSONEncoder):
+    """
+    JSON encoder capable to convert datetime object into iso-string
+    """
+
+    def default(self, obj):
+        if isinstance(obj, dt.datetime):
+            return arrow.get(obj).isoformat().replace("+00:00", "Z")
+
+        if isinstance(obj, dt.date):
+            return arrow.get(obj).isoformat().replace("+00:00", "Z")
+
+        if isinstance(obj, decimal.Decimal):
+            return float(obj)
+
+        return JSONEncoder.default(self, obj)
+
+
+def dumps_json(obj: Any) -> bytes:
+    return json.dumps(obj, cls=ExtendedJSONEncoder, separators=(',', ':')).encode()
+
+
+def _orjson_default(obj):
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    raise TypeError
+
+
+def dumps_orjson(obj: Any) -> bytes:
+    """
+    Serialize by orjson, datetime, date and UUID are handled natively
+    Naive datetimes are taken as UTC and UTC offset is written as Z, non-string keys are converted to strings,
+    same as ExtendedJSONEncoder does.
+    """
+    return orjson.dumps(
+        obj,
+        default=_orjson_default,
+        option=orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS,
+    )
+
+
+BACKENDS = {
+    "json": dumps_json,
+    "orjson": dumps_orjson,
+}
+
+_dumps: Callable[[Any], bytes] = dumps_json
+
+
+def set_backend(name: str = "auto") -> str:
+    """
+    Select serializer used by dumps
+    :param name: one of BACKENDS, "auto" takes orjson if it is installed
+    :return: name of selected backend
+    """
+    global _dumps
+    if name == "auto":
+        name = "orjson" if orjson is not None else "json"
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown JSON backend {name}")
+    if name == "orjson" and orjson is None:
+        raise ValueError("JSON backend orjson is not installed")
+    _dumps = BACKENDS[name]
+    return name
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize object into compact single line JSON by selected backend"""
+    return _dumps(obj)
+
+
+def ndjson(rows: Iterable[Any]) -> Iterator[bytes]:
+    """Serialize rows lazily into newline delimited JSON, one line per row"""
+    for row in rows:
+        yield dumps(row) + b"\n"
+
+
+def loads_ndjson(text: str) -> Iterator[Any]:
+    """Parse newline delimited JSON, blank lines are skipped and lines which are not valid JSON yield None"""
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
@@ -1 +1 @@
-from . import jobs, candidates
+from . import jobs, candidates, paging, projection
@@ -0,0 +1,189 @@
+"""
+Validators specialized for one schema, built once per schema class
+
+Schema.load sets up an error store, looks up processors and walks generic field machinery for every payload.
+A compiled validator resolves all of that once and keeps a loader per field: values of the expected type
+(str of String, int of Integer, list of those of List) are taken as they are, any other value is deserialized
+by the marshmallow field itself, so loaded objects and error messages are the ones of Schema.load.
+Schemas using features not compiled here are loaded by marshmallow.
+"""
+import inspect
+from typing import Any, Callable, Iterable, List, Dict, Mapping, Optional, Tuple
+
+from marshmallow import Schema, ValidationError, fields, missing, RAISE, EXCLUDE
+from marshmallow.decorators import PRE_LOAD, POST_LOAD, VALIDATES, VALIDATES_SCHEMA
+from marshmallow.error_store import merge_errors
+from marshmallow.exceptions import SCHEMA
+
+# field classes and the only type of their values taken without deserializing
+FAST_TYPES = {
+    fields.String: str,
+    fields.Integer: int,
+}
+
+
+def load_rows(load: Callable[[Any], Any], rows: Iterable[Any]) -> Tuple[List[Tuple[int, Any]], List[Dict[str, Any]]]:
+    """
+    Validate rows one by one, invalid rows do not stop validation of the others
+    :return: (index, loaded object) of valid rows, errors of invalid rows in the validation error handler shape
+    """
+    loaded = []
+    errors = []
+    for index, row in enumerate(rows):
+        try:
+            loaded.append((index, load(row)))
+        except ValidationError as e:
+            errors.append({"index": index, "error": "Validation error", "fields": e.messages})
+    return loaded, errors
+
+
+def _fast_type(field: fields.Field):
+    """Type of values loaded as they are, None if every value has to be deserialized"""
+    if field.validators:
+        return None
+    return FAST_TYPES.get(type(field))
+
+
+def _field_loader(name: str, field: fields.Field) -> Callable[[Any, Mapping], Any]:
+    if isinstance(field, fields.List) and not field.validators and _fast_type(field.inner) is not None:
+        item_type = _fast_type(field.inner)
+
+        def load_list(value, data):
+            if type(value) is list and all(type(item) is item_type for item in value):
+                return list(value)
+            return field.deserialize(value, name, data)
+        return load_list
+
+    # exact type, bool is an int but not a valid Integer
+    value_type = _fast_type(field)
+
+    def load_value(value, data):
+        if value_type is not None and type(value) is value_type:
+            return value
+        return field.deserialize(value, name, data)
+    return load_value
+
+
+def _hook_config(config: Any) -> Optional[List[Tuple[str, bool, dict]]]:
+    """
+    (tag, pass_many, options) of every hook set on a method by marshmallow decorators
+    Decorators store them in __marshmallow_hook__, keyed by (tag, pass_many) before marshmallow 3.22 and by tag
+    with a list of (pass_many, options) since. None for any other layout.
+    """
+    if not isinstance(config, Mapping):
+        return None
+    hooks = []
+    for key, value in config.items():
+        if isinstance(key, tuple) and len(key) == 2 and isinstance(value, Mapping):
+            hooks.append((key[0], bool(key[1]), dict(value)))
+        elif isinstance(key, str) and isinstance(value, list):
+            for item in value:
+                if not (isinstance(item, tuple) and len(item) == 2 and isinstance(item[1], Mapping)):
+                    return None
+                hooks.append((key, bool(item[0]), dict(item[1])))
+        else:
+            return None
+    return hooks
+
+
+def schema_hooks(schema_class: type) -> Optional[Dict[str, List[Tuple[str, bool, dict]]]]:
+    """
+    (method name, pass_many, options) of hooks of schema_class by tag, in the order marshmallow runs them
+    Found by decorated methods rather than by private attributes of Schema, None if any of them is not understood.
+    """
+    hooks = {}
+    for name in dir(schema_class):
+        config = getattr(inspect.getattr_static(schema_class, name), "__marshmallow_hook__", None)
+        if config is None:
+            continue
+        method_hooks = _hook_config(config)
+        if method_hooks is None:
+            return None
+        for tag, pass_many, options in method_hooks:
+            hooks.setdefault(tag, []).append((name, pass_many, options))
+    return hooks
+
+
+def compilable(schema: Schema) -> bool:
+    """Whether loading of schema is reproduced by CompiledSchema"""
+    hooks = schema_hooks(type(schema))
+    if hooks is None or hooks.get(VALIDATES):
+        return False
+    if any(pass_many for tag_hooks in hooks.values() for _, pass_many, _ in tag_hooks):
+        return False
+    for tag in (PRE_LOAD, POST_LOAD, VALIDATES_SCHEMA):
+        for _, _, options in hooks.get(tag, ()):
+            if options.get("pass_original") or not options.get("skip_on_field_errors", True):
+                return False
+    return (
+        not schema.many and not schema.partial and schema.unknown in (RAISE, EXCLUDE)
+        and all(field.attribute is None for field in schema.load_fields.values())
+    )
+
+
+class CompiledSchema(object):
+    """Loads payloads like schema.load, several times faster"""
+
+    def __init__(self, schema: Schema) -> None:
+        self.schema = schema
+        self.compiled = compilable(schema)
+        hooks = schema_hooks(type(schema)) if self.compiled else {}
+        self.pre_load = [getattr(schema, name) for name, _, _ in hooks.get(PRE_LOAD, ())]
+        self.validators = [getattr(schema, name) for name, _, _ in hooks.get(VALIDATES_SCHEMA, ())]
+        self.post_load = [getattr(schema, name) for name, _, _ in hooks.get(POST_LOAD, ())]
+        # values are read and errors reported under data_key, loaded under the field name
+        self.loaders = [
+            (name, field.data_key or name, _field_loader(field.data_key or name, field))
+            for name, field in schema.load_fields.items()
+        ]
+        self.field_names = frozenset(key for _, key, _ in self.loaders)
+        self.raise_unknown = schema.unknown == RAISE
+
+    def load(self, data: Any) -> Any:
+        """:raise ValidationError: with messages of schema.load"""
+        if not self.compiled:
+            return self.schema.load(data)
+        try:
+            for hook in self.pre_load:
+                data = hook(data, many=False, partial=False)
+        except ValidationError as e:
+            raise ValidationError(e.normalized_messages(), data=data)
+        if not isinstance(data, Mapping):
+            raise ValidationError({SCHEMA: [self.schema.error_messages["type"]]}, data=data)
+
+        result = {}
+        errors = {}
+        for name, key, loader in self.loaders:
+            try:
+                value = loader(data.get(key, missing), data)
+            except ValidationError as e:
+                errors[key] = e.messages
+                continue
+            if value is not missing:
+                result[name] = value
+        if self.raise_unknown:
+            for key in data:
+                if key not in self.field_names:
+                    errors[key] = [self.schema.error_messages["unknown"]]
+        if not errors:
+            for validator in self.validators:
+                try:
+                    validator(result, many=False, partial=False)
+                except ValidationError as e:
+                    if e.field_name == SCHEMA and isinstance(e.messages, dict):
+                        errors = merge_errors(errors, e.messages)
+                    else:
+                        errors = merge_errors(errors, {e.field_name: e.messages})
+        if errors:
+            raise ValidationError(errors, data=data, valid_data=result)
+
+        try:
+            for hook in self.post_load:
+                result = hook(result, many=False, partial=False)
+        except ValidationError as e:
+            raise ValidationError(e.normalized_messages(), data=data)
+        return result
+
+    def load_many(self, rows: Iterable[Any]) -> Tuple[List[Tuple[int, Any]], List[Dict[str, Any]]]:
+        """Validate an array of payloads in one call, see load_rows"""
+        return load_rows(self.load, rows)
@@ -1,6 +1,11 @@
-from marshmallow import Schema
+import functools
+from typing import Iterable, List, Dict, Any, Tuple
+
+from marshmallow import Schema, pre_load
 from flask_restx import fields
 
+from ._compiled import CompiledSchema, load_rows
+
 marshmallow_to_restx_map = {
     "Integer": fields.Integer,
     "String": fields.String,
@@ -9,9 +14,42 @@ marshmallow_to_restx_map = {
     "List": fields.List
 }
 
+marshmallow_to_swagger_type_map = {
+    "Integer": "integer",
+    "String": "string",
+    "DateTime": "string",
+    "Decimal": "number",
+    "List": "array",
+}
+
 
 class JobStorageSchema(Schema):
+    @pre_load
+    def collect_repeated_args(self, data, **kwargs):
+        """Take all values of repeated query parameters for list fields, e.g. ?skill=a&skill=b"""
+        if not hasattr(data, "getlist"):
+            return data
+        list_fields = [name for name, field in self.fields.items() if field.__class__.__name__ == "List"]
+        return {
+            **{key: value for key, value in data.items() if key not in list_fields},
+            **{name: data.getlist(name) for name in list_fields if name in data},
+        }
+
+    def load_many(self, rows: Iterable[Any]) -> Tuple[List[Tuple[int, Any]], List[Dict[str, Any]]]:
+        """
+        Validate rows one by one, invalid rows do not stop validation of the others
+        :return: (index, loaded object) of valid rows, errors of invalid rows in the validation error handler shape
+        """
+        return load_rows(self.load, rows)
+
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def compiled(cls) -> CompiledSchema:
+        """Validator compiled from this schema on first use, shared by all requests"""
+        return CompiledSchema(cls())
+
     @classmethod
+    @functools.lru_cache(maxsize=None)
     def restx_expect_dict(cls):
         schema_fields = cls._declared_fields
         result = {}
@@ -25,3 +63,24 @@ class JobStorageSchema(Schema):
             else:
                 result[field] = marshmallow_to_restx_map[schema_fields[field].__class__.__name__](**restx_field_args)
         return result
+
+    @classmethod
+    def restx_params_dict(cls):
+        """Describe schema fields as query parameters for restx documentation"""
+        schema_fields = cls._declared_fields
+        result = {}
+        for field in schema_fields:
+            # parameter named by data_key, e.g. fields, which can not be the name of a schema field
+            name = schema_fields[field].data_key or field
+            result[name] = {
+                "in": "query",
+                "type": marshmallow_to_swagger_type_map[schema_fields[field].__class__.__name__],
+                **schema_fields[field].metadata
+            }
+            if schema_fields[field].required:
+                result[name]["required"] = True
+            if schema_fields[field].__class__.__name__ == "List":
+                result[name]["items"] = {
+                    "type": marshmallow_to_swagger_type_map[schema_fields[field].inner.__class__.__name__]}
+                result[name]["collectionFormat"] = "multi"
+        return result
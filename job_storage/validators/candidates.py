@@ -1,7 +1,10 @@
-from marshmallow import fields, post_load
+from typing import Optional
+
+from marshmallow import fields, post_load, validate, EXCLUDE
 from dataclasses import dataclass
 
 from ._utils import JobStorageSchema
+from .projection import ProjectionSchema
 
 
 @dataclass(frozen=True)
@@ -19,3 +22,35 @@ class InsertCandidateSchema(JobStorageSchema):
     @post_load
     def load_func(self, data, **kwargs):
         return InsertCandidate(**data)
+
+
+@dataclass(frozen=True)
+class CandidateFilters:
+    expected_salary_max: Optional[int]
+    skill: list
+    skill_match: str
+
+
+class CandidateFiltersSchema(JobStorageSchema):
+    class Meta:
+        unknown = EXCLUDE
+
+    expected_salary_max = fields.Integer(missing=None, metadata={"description": "Max expected salary"})
+    skill = fields.List(
+        fields.String(validate=validate.Length(min=1)),
+        missing=[],
+        metadata={"description": "Skill title, repeat to filter by more skills"}
+    )
+    skill_match = fields.String(
+        missing="all",
+        validate=validate.OneOf(["all", "any"]),
+        metadata={"description": "Candidates having all given skills, or any of them"}
+    )
+
+    @post_load
+    def load_func(self, data, **kwargs):
+        return CandidateFilters(**data)
+
+
+class CandidateProjectionSchema(ProjectionSchema):
+    RESOURCE = "candidate"
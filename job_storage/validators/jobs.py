@@ -1,7 +1,11 @@
-from marshmallow import fields, post_load, ValidationError, validates_schema, validates
+from typing import Optional
+
+from marshmallow import fields, post_load, ValidationError, validates_schema, validates, validate, EXCLUDE
 from dataclasses import dataclass
 
 from ._utils import JobStorageSchema
+from .projection import ProjectionSchema
+from .paging import DEFAULT_LIMIT, MAX_LIMIT
 
 
 @dataclass(frozen=True)
@@ -9,13 +13,118 @@ class InsertJob:
     title: str
     salary: int
     description: str
+    skills: list
 
 
 class InsertJobSchema(JobStorageSchema):
     title = fields.String(required=True, metadata={"example": "Job title"})
     salary = fields.Integer(required=True, metadata={"example": "50000"})
     description = fields.String(required=True, metadata={"example": "This is a (not so) lengthy job description"})
+    skills = fields.List(fields.String, allow_none=True, missing=[], metadata={"example": ["Python", "Flask"]})
 
     @post_load
     def load_func(self, data, **kwargs):
         return InsertJob(**data)
+
+
+@dataclass(frozen=True)
+class AssignCandidates:
+    candidate_ids: list
+
+
+class AssignCandidatesSchema(JobStorageSchema):
+    candidate_ids = fields.List(
+        fields.Integer(strict=True),
+        required=True,
+        validate=validate.Length(min=1),
+        metadata={"example": [1, 2, 3]}
+    )
+
+    @post_load
+    def load_func(self, data, **kwargs):
+        return AssignCandidates(**data)
+
+
+@dataclass(frozen=True)
+class JobFilters:
+    salary_min: Optional[int]
+    salary_max: Optional[int]
+    title_prefix: Optional[str]
+
+
+class JobFiltersSchema(JobStorageSchema):
+    class Meta:
+        unknown = EXCLUDE
+
+    salary_min = fields.Integer(missing=None, metadata={"description": "Min salary"})
+    salary_max = fields.Integer(missing=None, metadata={"description": "Max salary"})
+    title_prefix = fields.String(
+        missing=None,
+        validate=validate.Length(min=1),
+        metadata={"description": "Start of job title, case sensitive"}
+    )
+
+    @validates_schema
+    def validate_salary_range(self, data, **kwargs):
+        if data.get("salary_min") is not None and data.get("salary_max") is not None \
+                and data["salary_min"] > data["salary_max"]:
+            raise ValidationError("Must not be greater than salary_max.", "salary_min")
+
+    @post_load
+    def load_func(self, data, **kwargs):
+        return JobFilters(**data)
+
+
+class JobProjectionSchema(ProjectionSchema):
+    RESOURCE = "job"
+
+
+@dataclass(frozen=True)
+class SearchQuery:
+    q: str
+
+
+class SearchQuerySchema(JobStorageSchema):
+    class Meta:
+        unknown = EXCLUDE
+
+    q = fields.String(
+        required=True,
+        validate=validate.Length(min=1, max=1000),
+        metadata={"description": 'Words to search in title and description, supports "quoted phrases", or, -word'}
+    )
+
+    @post_load
+    def load_func(self, data, **kwargs):
+        return SearchQuery(**data)
+
+
+@dataclass(frozen=True)
+class MatchQuery:
+    min_overlap: int
+    max_salary: Optional[int]
+    limit: int
+
+
+class MatchQuerySchema(JobStorageSchema):
+    class Meta:
+        unknown = EXCLUDE
+
+    min_overlap = fields.Integer(
+        missing=1,
+        validate=validate.Range(min=1),
+        metadata={"description": "Min number of skills a candidate shares with the job, 1 by default"}
+    )
+    max_salary = fields.Integer(
+        missing=None,
+        metadata={"description": "Max expected salary, candidates without expected salary are skipped if set"}
+    )
+    limit = fields.Integer(
+        missing=DEFAULT_LIMIT,
+        validate=validate.Range(min=1, max=MAX_LIMIT),
+        metadata={"description": f"Max number of returned candidates, {DEFAULT_LIMIT} by default"}
+    )
+
+    @post_load
+    def load_func(self, data, **kwargs):
+        return MatchQuery(**data)
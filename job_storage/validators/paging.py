@@ -0,0 +1,34 @@
+from typing import Optional
+
+from marshmallow import fields, post_load, validate, EXCLUDE
+from dataclasses import dataclass
+
+from ._utils import JobStorageSchema
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+@dataclass(frozen=True)
+class Paging:
+    limit: int
+    cursor: Optional[str]
+
+
+class PagingSchema(JobStorageSchema):
+    class Meta:
+        unknown = EXCLUDE
+
+    limit = fields.Integer(
+        missing=DEFAULT_LIMIT,
+        validate=validate.Range(min=1, max=MAX_LIMIT),
+        metadata={"description": f"Max number of returned items, {DEFAULT_LIMIT} by default"}
+    )
+    cursor = fields.String(
+        missing=None,
+        metadata={"description": "Cursor of the next page, as returned in next_cursor"}
+    )
+
+    @post_load
+    def load_func(self, data, **kwargs):
+        return Paging(**data)
@@ -0,0 +1,131 @@
+from typing import Dict, List, Optional, Tuple
+
+from marshmallow import fields, post_load, validates_schema, ValidationError, EXCLUDE
+from dataclasses import dataclass
+
+from ._utils import JobStorageSchema
+
+# columns of every resource and resources embedded by its relations, in order of response fields
+RESOURCES: Dict[str, Tuple[Tuple[str, ...], Dict[str, str]]] = {
+    "job": (("id", "title", "salary", "description"), {"skills": "skill", "candidates": "candidate"}),
+    "candidate": (("id", "full_name", "expected_salary"), {"skills": "skill"}),
+    "skill": (("id", "title"), {}),
+}
+
+# a selection is a tuple of (field name, selection of embedded objects or None for a column),
+# hashable, so statements built for it can be reused
+Selection = Tuple[Tuple[str, Optional[tuple]], ...]
+
+
+def field_names(resource: str) -> List[str]:
+    """Names accepted by fields, columns and relations of resource and columns of embedded objects as relation.column"""
+    columns, relations = RESOURCES[resource]
+    return [
+        *columns,
+        *relations,
+        *(f"{relation}.{column}" for relation, target in relations.items() for column in RESOURCES[target][0]),
+    ]
+
+
+def expand_paths(resource: str, depth: int = 2) -> List[str]:
+    """Names accepted by expand, relations of resource and relations of embedded objects as relation.relation"""
+    if depth < 1:
+        return []
+    _, relations = RESOURCES[resource]
+    return [
+        path
+        for relation, target in relations.items()
+        for path in (relation, *(f"{relation}.{nested}" for nested in expand_paths(target, depth - 1)))
+    ]
+
+
+def _selection(resource: str, names: Optional[Tuple[str, ...]], expand: Tuple[str, ...]) -> Selection:
+    """
+    Fields of resource to respond with
+    :param names: requested fields, None for all columns, id is always selected
+    :param expand: relations to embed, with all their columns unless some are requested by names
+    """
+    columns, relations = RESOURCES[resource]
+    nested_names: Dict[str, List[str]] = {}
+    nested_expand: Dict[str, List[str]] = {}
+    for name in names or ():
+        relation, _, column = name.partition(".")
+        if column:
+            nested_names.setdefault(relation, []).append(column)
+    for path in expand:
+        relation, _, nested = path.partition(".")
+        nested_expand.setdefault(relation, [])
+        if nested:
+            nested_expand[relation].append(nested)
+    top = None if names is None else {"id", *(name.partition(".")[0] for name in names)}
+
+    selection = [(column, None) for column in columns if top is None or column in top]
+    for relation, target in relations.items():
+        if relation in nested_expand or (top is not None and relation in top):
+            names_of_relation = tuple(nested_names[relation]) if relation in nested_names else None
+            selection.append((relation, _selection(target, names_of_relation, tuple(nested_expand.get(relation, ())))))
+    return tuple(selection)
+
+
+@dataclass(frozen=True)
+class Projection:
+    resource: str
+    fields: Optional[tuple]
+    expand: tuple
+
+    @property
+    def requested(self) -> bool:
+        """Client asked for other fields than the endpoint returns by default"""
+        return self.fields is not None or len(self.expand) > 0
+
+    def selection(self, default_expand: Tuple[str, ...] = ()) -> Selection:
+        """
+        Fields to respond with
+        :param default_expand: relations embedded by the endpoint when fields are not requested
+        """
+        if self.fields is None:
+            return _selection(self.resource, None, tuple(dict.fromkeys(default_expand + self.expand)))
+        return _selection(self.resource, self.fields, self.expand)
+
+
+def _names(value: Optional[str]) -> Optional[tuple]:
+    """Comma separated names, without blanks and duplicates, None if there are none"""
+    if value is None:
+        return None
+    names = tuple(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+    return names or None
+
+
+class ProjectionSchema(JobStorageSchema):
+    """Sparse fieldsets and expanded relations of responses of RESOURCE"""
+    RESOURCE = None
+
+    class Meta:
+        unknown = EXCLUDE
+
+    expand = fields.String(
+        missing=None,
+        metadata={"description": "Comma separated relations to embed, e.g. candidates.skills"}
+    )
+    # fields is a Schema attribute, the parameter is mapped by data_key
+    fields_ = fields.String(
+        data_key="fields",
+        missing=None,
+        metadata={"description": "Comma separated fields to return, e.g. id,title, id is always returned"}
+    )
+
+    @validates_schema
+    def validate_names(self, data, **kwargs):
+        errors = {}
+        for key, name, accepted in (
+                ("fields_", "fields", field_names(self.RESOURCE)),
+                ("expand", "expand", expand_paths(self.RESOURCE))):
+            unknown = [value for value in _names(data.get(key)) or () if value not in accepted]
+            if unknown:
+                errors[name] = [f"Unknown {', '.join(unknown)}, must be some of {', '.join(accepted)}."]
+        if errors:
+            raise ValidationError(errors)
+
+    @post_load
+    def load_func(self, data, **kwargs):
+        return Projection(resource=self.RESOURCE, fields=_names(data["fields_"]), expand=_names(data["expand"]) or ())
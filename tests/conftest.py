@@ -0,0 +1,160 @@
+"""
+Tests run against the configured database, point config at a scratch one:
+
+    pip install -r requirements-test.txt
+    python -m pytest
+
+Schema is migrated at the start of the session, rows created by tests are deleted by them. Tests taking backend
+run against sync Storage and AsyncStorage alike.
+"""
+import asyncio
+import contextlib
+import inspect
+import json
+import os
+import time
+import uuid
+
+import pytest
+from sqlalchemy import exc
+
+from job_storage import app as job_storage_app
+from job_storage import query_tracking
+from job_storage import validators as v
+from job_storage.db import migrations
+
+
+def start_change_listener(storage, timeout=5.0):
+    """
+    Start listener of the first request and wait until it is connected
+    Listener bumps all versions once connected, responses cached by tests before that would miss the cache.
+    """
+    if storage.notify_channel is None:
+        return
+    tables = list(storage.metadata.tables)
+    versions = storage.versions.get(tables)
+    storage.start_change_listener()
+    deadline = time.monotonic() + timeout
+    while storage.versions.get(tables) == versions and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+@pytest.fixture(scope="session")
+def app():
+    try:
+        migrations.upgrade(job_storage_app.db)
+    except exc.OperationalError as e:
+        pytest.skip(f"Database is not reachable - {e}")
+    if not job_storage_app.config.get("QUERY_TRACKING"):
+        query_tracking.instrument_storage(job_storage_app.db)
+    start_change_listener(job_storage_app.db)
+    with job_storage_app.app_context():
+        yield job_storage_app
+
+
+class AwaitedStorage(object):
+    """AsyncStorage with coroutine methods run to completion on loop, so tests call it the way they call Storage"""
+    def __init__(self, storage, loop: asyncio.AbstractEventLoop):
+        self.storage = storage
+        self.loop = loop
+
+    def __getattr__(self, name):
+        attr = getattr(self.storage, name)
+        if not inspect.iscoroutinefunction(attr):
+            return attr
+
+        def run(*args, **kwargs):
+            return self.loop.run_until_complete(attr(*args, **kwargs))
+        return run
+
+
+@pytest.fixture(scope="session")
+def async_storage(app):
+    from job_storage.asgi import storage
+    if not app.config.get("QUERY_TRACKING"):
+        query_tracking.instrument_async_storage(storage)
+    loop = asyncio.new_event_loop()
+    yield AwaitedStorage(storage, loop)
+    loop.run_until_complete(storage.dispose())
+    loop.close()
+
+
+@pytest.fixture
+def storage(app):
+    return app.db
+
+
+@pytest.fixture(params=["sync", "async"])
+def backend(request, app):
+    """Storage of either backend, their public methods take the same arguments and return the same data"""
+    if request.param == "async":
+        return request.getfixturevalue("async_storage")
+    return app.db
+
+
+@pytest.fixture
+def track_queries(app):
+    """Context manager recording statements executed within it, see query_tracking.RequestQueries"""
+    @contextlib.contextmanager
+    def track():
+        queries = query_tracking.start()
+        try:
+            yield queries
+        finally:
+            query_tracking.stop(queries)
+    return track
+
+
+@pytest.fixture
+def forked_change(storage):
+    """
+    Makes a change notification payload in a process forked from this one, the way a sibling uwsgi worker does
+    Token of this process is made before, as the master makes it before forking workers.
+    """
+    storage.versions.token
+
+    def make(tables, ids=None):
+        read_end, write_end = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os.close(read_end)
+                os.write(write_end, storage._change_payload(list(tables), ids).encode())
+            finally:
+                os._exit(0)
+        os.close(write_end)
+        with os.fdopen(read_end, "rb") as pipe:
+            payload = pipe.read()
+        os.waitpid(pid, 0)
+        return json.loads(payload)
+    return make
+
+
+@pytest.fixture
+def dataset(storage, backend):
+    """
+    Job with skills and three candidates with skills assigned to it, ids by name, created by backend
+    Candidate of index i has skills up to i, the job the first two.
+    """
+    suffix = uuid.uuid4().hex[:8]
+    skills = [f"Test skill {suffix} {index}" for index in range(3)]
+    candidate_ids = backend.bulk_insert_candidates([
+        v.candidates.InsertCandidate(full_name=f"Test candidate {suffix} {index}", expected_salary=1000 * index,
+                                     skills=skills[:index + 1])
+        for index in range(3)
+    ])
+    title = f"Test job {suffix}"
+    backend.insert_job(v.jobs.InsertJob(title=title, salary=5000, description="Test job", skills=skills[:2]))
+    jobs, _ = backend.list_jobs(primary=True, filters=v.jobs.JobFilters(None, None, title))
+    job_id = jobs[0]["id"]
+    backend.assign_candidates(job_id, candidate_ids)
+    yield {"job_id": job_id, "candidate_ids": candidate_ids, "skills": skills, "title": title, "suffix": suffix}
+    # there is no endpoint removing assignments, jobs and candidates are deleted once they have none
+    with storage.connect() as con:
+        con.execute(storage.jobs_candidates.table.delete().where(storage.jobs_candidates.c.job_id == job_id))
+    backend.delete_job(job_id)
+    for candidate_id in candidate_ids:
+        backend.delete_candidate(candidate_id)
+    with storage.connect() as con:
+        con.execute(storage.skills.table.delete().where(storage.skills.c.title.in_(skills)))
+    backend.skill_cache.invalidate(skills)
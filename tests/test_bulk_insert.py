@@ -0,0 +1,55 @@
+"""Bulk insert of candidates, rows without skills included"""
+import uuid
+
+import pytest
+from sqlalchemy import select
+
+from job_storage import validators as v
+
+
+@pytest.fixture
+def created_candidates(backend):
+    """Ids of candidates created by a test, deleted once it ends"""
+    candidate_ids = []
+    yield candidate_ids
+    for candidate_id in candidate_ids:
+        backend.delete_candidate(candidate_id)
+
+
+def test_bulk_insert_candidates_with_null_skills(backend, created_candidates):
+    suffix = uuid.uuid4().hex[:8]
+    payloads = [
+        v.candidates.InsertCandidate(full_name=f"Test candidate {suffix} 0", expected_salary=1000, skills=None),
+        v.candidates.InsertCandidate(full_name=f"Test candidate {suffix} 1", expected_salary=1000, skills=[]),
+    ]
+    created_candidates.extend(backend.bulk_insert_candidates(payloads))
+    assert [backend.find_candidate(candidate_id, primary=True)["skills"] for candidate_id in created_candidates] == [
+        [], []]
+
+
+def test_insert_candidate_with_null_skills(storage, backend, created_candidates):
+    full_name = f"Test candidate {uuid.uuid4().hex[:8]}"
+    backend.insert_candidate(v.candidates.InsertCandidate(full_name=full_name, expected_salary=1000, skills=None))
+    with storage.connect() as con:
+        candidate_id = con.execute(
+            select([storage.candidates.c.id]).where(storage.candidates.c.full_name == full_name)).scalar()
+    created_candidates.append(candidate_id)
+    backend.force_insert_candidate(
+        candidate_id, v.candidates.InsertCandidate(full_name=full_name, expected_salary=1000, skills=None))
+    assert backend.find_candidate(candidate_id, primary=True)["skills"] == []
+
+
+def test_bulk_route_reports_every_row(app, storage):
+    suffix = uuid.uuid4().hex[:8]
+    response = app.test_client().post("/api/candidates/bulk", json=[
+        {"full_name": f"Test candidate {suffix} 0", "expected_salary": 1000, "skills": None},
+        {"full_name": f"Test candidate {suffix} 1", "expected_salary": 1000},
+        {"full_name": f"Test candidate {suffix} 2"},
+    ])
+    try:
+        assert response.status_code == 201
+        assert [row["index"] for row in response.json["inserted"]] == [0, 1]
+        assert [row["index"] for row in response.json["errors"]] == [2]
+    finally:
+        for row in response.json.get("inserted", []):
+            storage.delete_candidate(row["id"])
@@ -0,0 +1,36 @@
+"""Changes notified by other processes, e.g. sibling workers forked from the same master, are applied"""
+import json
+
+
+def test_forked_process_has_own_token(storage, forked_change):
+    change = forked_change([storage.jobs.name])
+    assert change["origin"] != storage.versions.token
+
+
+def test_change_of_forked_process_bumps_versions(storage, forked_change):
+    tables = [storage.jobs.name, storage.jobs_skills.name]
+    before = storage.versions.get(tables)
+    storage._on_change(forked_change(tables))
+    assert storage.versions.get(tables) == tuple(version + 1 for version in before)
+
+
+def test_own_change_is_ignored(storage):
+    tables = [storage.jobs.name]
+    before = storage.versions.get(tables)
+    storage._on_change(json.loads(storage._change_payload(tables)))
+    assert storage.versions.get(tables) == before
+
+
+def test_change_of_forked_process_refreshes_skill_index(storage, dataset, forked_change):
+    storage.skill_index.invalidate()
+    storage._load_skill_index()
+    job_id, candidate_ids = dataset["job_id"], dataset["candidate_ids"]
+    assert {match["id"] for match in storage.match_candidates(job_id, min_overlap=2)} == set(candidate_ids[1:])
+    # the other process drops the second job skill of the last candidate
+    skill_id = storage.find_candidate(candidate_ids[-1])["skills"][1]["id"]
+    links = storage.candidates_skills
+    with storage.connect() as con:
+        con.execute(links.table.delete().where(links.c.candidate_id == candidate_ids[-1]).where(
+            links.c.skill_id == skill_id))
+    storage._on_change(forked_change([storage.candidates.name, links.name], [candidate_ids[-1]]))
+    assert {match["id"] for match in storage.match_candidates(job_id, min_overlap=2)} == {candidate_ids[1]}
@@ -0,0 +1,70 @@
+"""
+Every list filter is served by its index, the filtered column is a condition of an index scan
+
+Conditions of each filter are explained alone, with sequential scans and nested loops disabled, so the planner
+takes an index whenever one can serve the condition, however few rows the database holds. A dropped index or
+a condition no index can serve leaves the column in a filter of scanned rows and fails the test. Rows of a prefix
+range are still filtered by the LIKE pattern itself, so filters of scanned rows are not checked.
+"""
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql
+
+from job_storage import validators as v
+
+# ids of filtered skills, looked up by the endpoint before the statement is built
+SKILL_IDS = {"Python": 1, "SQL": 2}
+
+
+def job_filters(**values) -> v.jobs.JobFilters:
+    return v.jobs.JobFilters(**{"salary_min": None, "salary_max": None, "title_prefix": None, **values})
+
+
+def candidate_filters(**values) -> v.candidates.CandidateFilters:
+    return v.candidates.CandidateFilters(**{"expected_salary_max": None, "skill": [], "skill_match": "all", **values})
+
+
+# filters, index expected to serve them and the column it is scanned by
+CASES = {
+    "jobs_salary_min": (job_filters(salary_min=50000), "ix_jobs_salary", "salary"),
+    "jobs_salary_range": (job_filters(salary_min=50000, salary_max=51000), "ix_jobs_salary", "salary"),
+    "jobs_title_prefix": (job_filters(title_prefix="Rust_dev%"), "ix_jobs_title_pattern", "title"),
+    "candidates_salary_max": (
+        candidate_filters(expected_salary_max=20500), "ix_candidates_expected_salary", "expected_salary"),
+    "candidates_all_skills": (
+        candidate_filters(skill=["Python", "SQL"]), "ix_candidates_skills_skill_id_candidate_id", "skill_id"),
+    "candidates_any_skill": (
+        candidate_filters(skill=["Python", "SQL"], skill_match="any"),
+        "ix_candidates_skills_skill_id_candidate_id", "skill_id"),
+}
+
+
+def plan_nodes(node: dict):
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def explain(storage, stm) -> list:
+    sql = str(stm.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    with storage.connect() as con:
+        trans = con.begin()
+        try:
+            con.execute(text("SET LOCAL enable_seqscan = off"))
+            con.execute(text("SET LOCAL enable_nestloop = off"))
+            plan, = con.execute(text("EXPLAIN (FORMAT JSON) " + sql.replace("%", "%%"))).scalar()
+        finally:
+            trans.rollback()
+    return list(plan_nodes(plan["Plan"]))
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_filter_is_served_by_index(storage, name):
+    filters, index, column = CASES[name]
+    if isinstance(filters, v.jobs.JobFilters):
+        stm = storage._filter_jobs(select([storage.jobs.c.id]), filters)
+    else:
+        stm = storage._filter_candidates(select([storage.candidates.c.id]), filters, SKILL_IDS)
+    nodes = explain(storage, stm)
+    index_conditions = [node.get("Index Cond", "") for node in nodes if node.get("Index Name") == index]
+    assert any(column in condition for condition in index_conditions), nodes
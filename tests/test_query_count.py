@@ -0,0 +1,51 @@
+"""
+Lists and details are read by one statement, however many rows and embedded objects they return, on both backends
+"""
+import pytest
+
+from job_storage import validators as v
+
+
+@pytest.mark.parametrize("limit, expected", [(1, 1), (3, 3), (100, 3)])
+def test_list_candidates(backend, dataset, track_queries, limit, expected):
+    # candidates of the dataset only, their skills are cached by the insert
+    filters = v.candidates.CandidateFilters(expected_salary_max=None, skill=dataset["skills"], skill_match="any")
+    with track_queries() as queries:
+        candidates, _ = backend.list_candidates(limit=limit, filters=filters)
+    assert [candidate["id"] for candidate in candidates] == dataset["candidate_ids"][:expected]
+    assert len(candidates[0]["skills"]) == 1
+    assert queries.count == 1
+
+
+def test_list_candidates_filtered_by_cached_skills(backend, dataset, track_queries):
+    filters = v.candidates.CandidateFilters(expected_salary_max=None, skill=dataset["skills"][:1], skill_match="all")
+    backend.list_candidates(filters=filters)
+    with track_queries() as queries:
+        candidates, _ = backend.list_candidates(filters=filters)
+    assert sorted(candidate["id"] for candidate in candidates) == sorted(dataset["candidate_ids"])
+    assert queries.count == 1
+
+
+def test_find_candidate(backend, dataset, track_queries):
+    candidate_id = dataset["candidate_ids"][-1]
+    with track_queries() as queries:
+        candidate = backend.find_candidate(candidate_id)
+    assert [skill["title"] for skill in candidate["skills"]] == dataset["skills"]
+    assert queries.count == 1
+
+
+def test_find_job(backend, dataset, track_queries):
+    with track_queries() as queries:
+        job = backend.find_job(dataset["job_id"])
+    assert [candidate["id"] for candidate in job["candidates"]] == sorted(dataset["candidate_ids"])
+    assert [skill["title"] for skill in job["skills"]] == dataset["skills"][:2]
+    assert queries.count == 1
+
+
+@pytest.mark.parametrize("fields, expand", [("title", "candidates.skills"), (None, "candidates.skills")])
+def test_find_job_with_expanded_relations(backend, dataset, track_queries, fields, expand):
+    projection = v.projection.Projection(resource="job", fields=(fields,) if fields else None, expand=(expand,))
+    with track_queries() as queries:
+        job = backend.find_job(dataset["job_id"], projection=projection)
+    assert all(len(candidate["skills"]) > 0 for candidate in job["candidates"])
+    assert queries.count == 1
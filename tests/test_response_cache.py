@@ -0,0 +1,25 @@
+"""Cached responses are served until a table they were read from changes, in another process too"""
+import pytest
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def test_change_of_forked_process_misses_cache(app, storage, client, dataset, forked_change):
+    job_id = dataset["job_id"]
+    path = f"/api/jobs/{job_id}"
+    assert client.get(path).json["data"]["salary"] == 5000
+    # the other process writes, this one still holds the response read before
+    with storage.connect() as con:
+        con.execute(storage.jobs.table.update().where(storage.jobs.c.id == job_id).values(salary=7000))
+    hits = app.response_cache.hits
+    assert client.get(path).json["data"]["salary"] == 5000
+    assert app.response_cache.hits == hits + 1
+
+    storage._on_change(forked_change([storage.jobs.name], [job_id]))
+    misses = app.response_cache.misses
+    assert client.get(path).json["data"]["salary"] == 7000
+    assert app.response_cache.misses == misses + 1
+
@@ -0,0 +1,122 @@
+"""Operations shared by sync Storage and AsyncStorage behave the same on both backends"""
+import pytest
+
+from job_storage import custom_exceptions as j_exc
+from job_storage import validators as v
+
+# id no job or candidate takes
+MISSING_ID = 2 ** 31 - 1
+
+
+def candidate_filters(**values) -> v.candidates.CandidateFilters:
+    return v.candidates.CandidateFilters(**{"expected_salary_max": None, "skill": [], "skill_match": "all", **values})
+
+
+def test_find_job(backend, dataset):
+    job = backend.find_job(dataset["job_id"])
+    assert job["title"] == dataset["title"]
+    assert [skill["title"] for skill in job["skills"]] == dataset["skills"][:2]
+    assert [candidate["id"] for candidate in job["candidates"]] == sorted(dataset["candidate_ids"])
+
+
+def test_find_missing(backend):
+    with pytest.raises(j_exc.ForeignKeyViolationError):
+        backend.find_job(MISSING_ID)
+    with pytest.raises(j_exc.ForeignKeyViolationError):
+        backend.find_candidate(MISSING_ID)
+
+
+def test_delete_missing(backend):
+    with pytest.raises(j_exc.ForeignKeyViolationError):
+        backend.delete_job(MISSING_ID)
+    with pytest.raises(j_exc.ForeignKeyViolationError):
+        backend.delete_candidate(MISSING_ID)
+
+
+def test_force_insert_job_replaces_skills(backend, dataset):
+    job_id = dataset["job_id"]
+    payload = v.jobs.InsertJob(title=dataset["title"], salary=6000, description="Changed", skills=dataset["skills"][1:])
+    backend.force_insert_job(job_id, payload)
+    job = backend.find_job(job_id, primary=True)
+    assert (job["salary"], job["description"]) == (6000, "Changed")
+    assert [skill["title"] for skill in job["skills"]] == dataset["skills"][1:]
+
+
+def test_force_insert_candidate_replaces_skills(backend, dataset):
+    candidate_id = dataset["candidate_ids"][-1]
+    payload = v.candidates.InsertCandidate(full_name="Changed", expected_salary=1, skills=dataset["skills"][:1])
+    backend.force_insert_candidate(candidate_id, payload)
+    candidate = backend.find_candidate(candidate_id, primary=True)
+    assert (candidate["full_name"], candidate["expected_salary"]) == ("Changed", 1)
+    assert [skill["title"] for skill in candidate["skills"]] == dataset["skills"][:1]
+
+
+def test_failed_insert_is_rolled_back(storage, backend, dataset):
+    skill = f"Test skill {dataset['suffix']} rolled back"
+    payload = v.jobs.InsertJob(title=dataset["title"], salary=1, description="Duplicate title", skills=[skill])
+    with pytest.raises(j_exc.DatabaseError):
+        backend.insert_job(payload)
+    assert backend.skill_cache.get_many([skill]) == {}
+    with storage.connect() as con:
+        assert storage._find_skill_ids([skill], con) == {}
+
+
+def test_assign_candidates_outcome(backend, dataset):
+    candidate_ids = dataset["candidate_ids"]
+    outcome = backend.assign_candidates(dataset["job_id"], [candidate_ids[0], MISSING_ID, candidate_ids[0]])
+    assert outcome == {"added": [], "already_assigned": [candidate_ids[0]], "missing": [MISSING_ID]}
+    with pytest.raises(j_exc.ForeignKeyViolationError):
+        backend.assign_candidates(MISSING_ID, candidate_ids)
+
+
+def test_apply_candidate_errors(backend, dataset):
+    with pytest.raises(j_exc.UniqueViolationError):
+        backend.apply_candidate(dataset["candidate_ids"][0], dataset["job_id"])
+    with pytest.raises(j_exc.ForeignKeyViolationError):
+        backend.apply_candidate(MISSING_ID, dataset["job_id"])
+
+
+@pytest.mark.parametrize("skill_match, skills, expected", [
+    ("all", slice(0, 2), [1, 2]),
+    ("any", slice(1, 3), [1, 2]),
+    ("all", slice(2, 3), [2]),
+])
+def test_list_candidates_by_skills(backend, dataset, skill_match, skills, expected):
+    filters = candidate_filters(skill=dataset["skills"][skills], skill_match=skill_match)
+    candidates, cursor = backend.list_candidates(filters=filters)
+    assert [candidate["id"] for candidate in candidates] == [dataset["candidate_ids"][index] for index in expected]
+    assert cursor is None
+
+
+def test_list_candidates_pages(backend, dataset):
+    filters = candidate_filters(skill=dataset["skills"][:1], expected_salary_max=2000)
+    first, cursor = backend.list_candidates(limit=2, filters=filters)
+    second, last_cursor = backend.list_candidates(limit=2, cursor=cursor, filters=filters)
+    assert [candidate["id"] for candidate in first + second] == dataset["candidate_ids"]
+    assert last_cursor is None
+
+
+def test_search_jobs(backend, dataset):
+    jobs, _ = backend.search_jobs(f'"{dataset["title"]}"')
+    assert [job["id"] for job in jobs] == [dataset["job_id"]]
+    assert "<mark>" in jobs[0]["snippet"]
+
+
+def test_match_candidates(backend, dataset):
+    matches = backend.match_candidates(dataset["job_id"], min_overlap=2)
+    assert {match["id"]: match["overlap"] for match in matches} == {
+        candidate_id: 2 for candidate_id in dataset["candidate_ids"][1:]}
+    with pytest.raises(j_exc.ForeignKeyViolationError):
+        backend.match_candidates(MISSING_ID)
+
+
+def test_backends_read_the_same(storage, async_storage, dataset):
+    # matches are left out, skill index of a process sees writes of the other only by change notifications
+    filters = candidate_filters(skill=dataset["skills"][:1])
+    for read in (
+            lambda db: db.find_job(dataset["job_id"]),
+            lambda db: db.find_candidate(dataset["candidate_ids"][-1]),
+            lambda db: db.list_candidates(limit=2, filters=filters),
+            lambda db: db.search_jobs(dataset["title"]),
+    ):
+        assert read(storage) == read(async_storage)